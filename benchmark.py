@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Motion Benchmark
+Runs the motion stack on a simulated PCA9685 and reports timing and I2C traffic
+
+Usage:
+    python3 benchmark.py [options]
+
+Options:
+    --sequence <name>        Only benchmark this sequence (may be repeated)
+    --i2c-khz <khz>          Emulated I2C clock speed (0 = writes take no time)
+    --blend <degrees>        Run sequences with lookahead blending
+    --limbs <file>           Board and limb definitions to benchmark
+    --save-baseline <file>   Save the results as a baseline JSON file
+    --compare <file>         Compare against a baseline; exits 1 on regressions
+    --tolerance <fraction>   Allowed slowdown before a metric counts as a regression
+"""
+
+import sys
+import os
+import argparse
+import bisect
+import json
+import platform
+import time
+
+# Add src directory to path so we can import our modules
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from puppet_arm import PuppetController
+from sequence_controller import SequenceController
+from control_loop import LoopStats
+from metrics import METRICS
+
+# Metrics checked against the baseline, with the absolute change that is
+# always tolerated (timer noise on a desktop machine; write latency also
+# includes the hand-over to the I/O thread)
+COMPARED_METRICS = {
+    'wall_time': 0.005,
+    'i2c_writes': 0,
+    'write_latency_p99': 0.005,
+    'step_latency_max': 0.002,
+    'max_jitter': 0.005,
+}
+
+
+def percentile(values, fraction):
+    """Get a percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Benchmark:
+    def __init__(self, i2c_khz=400, limb_file=None):
+        """
+        Set up a simulated puppet to benchmark
+
+        Args:
+            i2c_khz: Emulated I2C clock speed in kHz (0 = writes take no time)
+            limb_file: Board and limb definitions (default: two arms on one board)
+        """
+        self.i2c_khz = i2c_khz
+        self.puppet = PuppetController(home=False, simulate=True, limb_file=limb_file)
+        self.sequencer = SequenceController(self.puppet)
+        self.servo_controller = self.puppet.servo_controller
+
+        # Boards on one bus are written one after another by the same writer
+        self.pcas = [kit.pca for kit in self.servo_controller.kits]
+        if i2c_khz:
+            # 9 clocks per byte, plus start, address byte and stop per transaction
+            bit_time = 1 / (i2c_khz * 1000)
+            for pca in self.pcas:
+                pca.transaction_time = 11 * bit_time
+                pca.byte_time = 9 * bit_time
+
+        # time.monotonic() of every frame passed to write_frame(), and
+        # (deadline, end) of every sequence step span
+        self.frame_times = []
+        self.step_slots = []
+        self.servo_controller.add_frame_listener(
+            lambda frame, now: self.frame_times.append(now))
+        METRICS.add_span_hook(self._record_step)
+
+    def _record_step(self, span):
+        """Keep the time slot of every finished sequence step"""
+        if span.name == 'step' and 'deadline' in span.attributes:
+            self.step_slots.append((span.attributes['deadline'], span.end))
+
+    def run_all(self, sequence_names=None):
+        """
+        Run every benchmark case
+
+        Args:
+            sequence_names: Sequences to run (default: all of them)
+
+        Returns:
+            Dictionary mapping case name to its metrics
+        """
+        results = {}
+        results['smooth_move'] = self.measure(self._smooth_moves)
+        results['move_to_pose'] = self.measure(self._arm_poses)
+        for name in sequence_names or list(self.sequencer.sequences):
+            results[f'sequence:{name}'] = self.measure(lambda: self._sequence(name))
+        return results
+
+    def measure(self, case):
+        """
+        Home the puppet, run one case and collect its metrics
+
+        Args:
+            case: Callable that runs the motion and returns its LoopStats
+        """
+        self.puppet.reset_all_arms()
+        self.servo_controller.flush()
+        for pca in self.pcas:
+            pca.clear_log()
+        self.frame_times = []
+        self.step_slots = []
+
+        began = time.monotonic()
+        stats = case()
+        wall_time = time.monotonic() - began
+        self.servo_controller.flush()
+
+        writes = sorted(write for pca in self.pcas for write in pca.log)
+        write_times = [timestamp for timestamp, _, _ in writes]
+        write_latencies = []
+        for i, timestamp in enumerate(self.frame_times):
+            # Latency from write_frame() to the frame's first register write on
+            # the bus; frames that were superseded or unchanged never get one
+            index = bisect.bisect_left(write_times, timestamp)
+            following = self.frame_times[i + 1] if i + 1 < len(self.frame_times) else None
+            if index < len(write_times) and (following is None
+                                             or write_times[index] < following):
+                write_latencies.append(write_times[index] - timestamp)
+
+        step_latencies = []
+        for deadline, end in self.step_slots:
+            # Latency from the step's deadline to its first frame
+            index = bisect.bisect_left(self.frame_times, deadline)
+            if index < len(self.frame_times) and self.frame_times[index] < end:
+                step_latencies.append(self.frame_times[index] - deadline)
+
+        metrics = {
+            'wall_time': wall_time,
+            'i2c_writes': len(writes),
+            'i2c_writes_per_second': len(writes) / wall_time if wall_time else 0.0,
+            'bytes_written': sum(pca.bytes_written for pca in self.pcas),
+            'frames': len(self.frame_times),
+            'write_latency_mean': (sum(write_latencies) / len(write_latencies)
+                                   if write_latencies else None),
+            'write_latency_p99': percentile(write_latencies, 0.99),
+            'step_latency_mean': (sum(step_latencies) / len(step_latencies)
+                                  if step_latencies else None),
+            'step_latency_max': max(step_latencies, default=None),
+        }
+        metrics.update(stats.as_dict())
+        return metrics
+
+    def _smooth_moves(self):
+        """Sweep one channel through ServoController._smooth_move()"""
+        stats = LoopStats()
+        for angle in (0, 180, 90):
+            self.servo_controller.move_servo(0, angle, speed=10)
+            stats.merge(self.servo_controller.loop.last_stats)
+        return stats
+
+    def _arm_poses(self):
+        """Move one arm through every pose with PuppetArm.move_to_pose()"""
+        stats = LoopStats()
+        arm = self.puppet.get_arm('left_arm')
+        for pose in self.sequencer.poses.values():
+            if 'left_arm' in pose:
+                arm.move_to_pose(pose['left_arm'], speed=10)
+                stats.merge(self.servo_controller.loop.last_stats)
+        return stats
+
+    def _sequence(self, name):
+        """Run one sequence with SequenceController.execute_sequence()"""
+        self.sequencer.execute_sequence(name)
+        return self.sequencer.last_run_stats
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline
+
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    regressions = []
+    for case, metrics in results.items():
+        if case not in baseline:
+            continue
+        for metric, slack in COMPARED_METRICS.items():
+            old = baseline[case].get(metric)
+            new = metrics.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) + slack:
+                regressions.append(f"{case} {metric}: {old:.6g} -> {new:.6g}")
+    return regressions
+
+
+def print_results(results):
+    """Print a results table"""
+    print(f"\n{'case':<32} {'wall s':>8} {'writes/s':>9} {'write p99 us':>13} "
+          f"{'step max ms':>12} {'jitter max ms':>14}")
+    for case, metrics in results.items():
+        write_p99 = metrics['write_latency_p99']
+        step_max = metrics['step_latency_max']
+        print(f"{case:<32} {metrics['wall_time']:>8.3f} {metrics['i2c_writes_per_second']:>9.1f} "
+              f"{'-' if write_p99 is None else f'{write_p99 * 1e6:.0f}':>13} "
+              f"{'-' if step_max is None else f'{step_max * 1e3:.2f}':>12} "
+              f"{metrics['max_jitter'] * 1e3:>14.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the puppet motion stack')
+    parser.add_argument('--sequence', action='append', help='Only benchmark this sequence')
+    parser.add_argument('--i2c-khz', type=float, default=400,
+                        help='Emulated I2C clock speed (0 = writes take no time)')
+    parser.add_argument('--blend', type=float,
+                        help='Run sequences with lookahead blending at this tolerance')
+    parser.add_argument('--limbs', type=str, help='Board and limb definitions to benchmark')
+    parser.add_argument('--save-baseline', type=str, help='Save the results as a baseline')
+    parser.add_argument('--compare', type=str, help='Compare against a baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed relative slowdown before a metric regresses')
+
+    args = parser.parse_args()
+
+    print("⏱️  Puppet Motion Benchmark (simulated PCA9685)")
+    print("==============================================")
+
+    benchmark = Benchmark(args.i2c_khz, args.limbs)
+    benchmark.sequencer.blend_tolerance = args.blend
+    results = benchmark.run_all(args.sequence)
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'i2c_khz': args.i2c_khz,
+                'blend': args.blend,
+                'results': results,
+            }, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline['i2c_khz'] != args.i2c_khz:
+            print(f"\n⚠️  Baseline was recorded at {baseline['i2c_khz']} kHz")
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
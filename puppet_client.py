@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Command Client
+Sends commands to a puppet started with `puppet_demo.py --serve`
+
+Usage:
+    python3 puppet_client.py [options] <command> [<command> ...]
+
+Commands use the short text form, e.g.:
+    python3 puppet_client.py "pose wave_right" "sequence greeting" stop reset estop
+
+Options:
+    --socket <path>   Unix socket of the server (default /tmp/puppet.sock)
+    --tcp <host:port> Connect over TCP instead
+    --wait            Wait for each motion to finish before sending the next
+    --priority <n>    Priority of the motion commands (default 0)
+    --mode <mode>     preempt, replace or append (default preempt)
+"""
+
+import sys
+import os
+import argparse
+import json
+import socket
+import time
+
+# Add src directory to path so we can import our modules
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from command_queue import MODES
+from command_server import DEFAULT_SOCKET_PATH
+
+
+def connect(args):
+    """Open a connection to the server"""
+    if args.tcp:
+        host, port = args.tcp.rsplit(':', 1)
+        connection = socket.create_connection((host, int(port)))
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(args.socket)
+    return connection
+
+
+def read_until(replies, wanted):
+    """Read messages until one matches, printing motion events on the way"""
+    while True:
+        message = json.loads(replies.readline())
+        if 'event' in message:
+            print(f"  {message}")
+        if wanted(message):
+            return message
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send commands to a puppet server')
+    parser.add_argument('commands', nargs='+', help='Commands such as "pose rest"')
+    parser.add_argument('--socket', type=str, default=DEFAULT_SOCKET_PATH, help='Unix socket')
+    parser.add_argument('--tcp', type=str, help='host:port to connect to over TCP')
+    parser.add_argument('--wait', action='store_true',
+                        help='Wait for each motion to finish before the next command')
+    parser.add_argument('--priority', type=int, default=0, help='Priority of motion commands')
+    parser.add_argument('--mode', type=str, default='preempt', choices=MODES,
+                        help='How motion commands treat running and queued ones')
+
+    args = parser.parse_args()
+
+    connection = connect(args)
+    replies = connection.makefile('r')
+
+    for request_id, command in enumerate(args.commands, 1):
+        words = command.split()
+        message = {'id': request_id, 'cmd': words[0]}
+        if len(words) > 1:
+            message['name'] = words[1]
+        if words[0] in ('pose', 'sequence', 'reset'):
+            message.update(priority=args.priority, mode=args.mode)
+
+        sent = time.monotonic()
+        connection.sendall(json.dumps(message).encode() + b'\n')
+        reply = read_until(replies, lambda reply: 'ok' in reply and reply['id'] == request_id)
+        print(f"{command}: {reply} ({(time.monotonic() - sent) * 1000:.2f} ms)")
+
+        if args.wait and reply['ok'] and words[0] in ('pose', 'sequence', 'reset'):
+            read_until(replies, lambda event: event.get('id') == request_id)
+
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,18 +11,40 @@ Options:
     --demo          Run demo sequences
     --sequence <name>  Run specific sequence
     --pose <name>     Execute specific pose
+    --fast-start      Skip homing by trusting the last saved servo angles
+    --simulate        Run without hardware on a simulated PCA9685
+    --limbs <file>    Board and limb definitions (e.g. limbs/large_puppet.json)
+    --power-budget <amps>  Stagger and slow moves to keep the servo current under this
+    --idle-release <seconds>  Release servos that have held still this long
+    --log-level <level>  Logging verbosity (debug, info, warning, error, off)
+    --metrics-file <path>  Write Prometheus metrics to a file after each sequence
+    --no-metrics      Turn off metrics and tracing
+    --blend <degrees>  Blend sequence steps together within this tolerance
+    --serve           Accept commands over a Unix socket and TCP (see puppet_client.py)
+    --socket <path>   Unix socket for --serve (default /tmp/puppet.sock)
+    --port <port>     TCP port for --serve (default 7777, 0 to disable)
+    --stream <source>  Play live joint frames from - (stdin), udp:PORT or a named pipe
+    --stream-delay <s>  Jitter buffer delay for --stream (default 0.05)
+    --show <file>     Play a binary show file
+    --export-show <sequence> <file>  Convert a sequence into a binary show file
+    --import-show <file> <sequence>  Convert a binary show file into a sequence
 """
 
 import sys
 import os
 import argparse
+import asyncio
+import logging
 import time
 
 # Add src directory to path so we can import our modules
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from puppet_arm import PuppetController
+from puppet_arm import PuppetController, STATE_FILE
 from sequence_controller import SequenceController
+from metrics import METRICS, PrometheusFileExporter
+from command_server import CommandServer, DEFAULT_SOCKET_PATH, DEFAULT_PORT
+from joint_stream import JointStream
 
 def main():
     parser = argparse.ArgumentParser(description='Motorized String Puppet Controller')
@@ -31,39 +53,112 @@ def main():
     parser.add_argument('--sequence', type=str, help='Run specific sequence')
     parser.add_argument('--pose', type=str, help='Execute specific pose')
     parser.add_argument('--list', choices=['poses', 'sequences'], help='List available poses or sequences')
+    parser.add_argument('--watch', action='store_true', help='Hot-reload poses and sequences when edited')
+    parser.add_argument('--fast-start', action='store_true',
+                        help='Skip homing by trusting the last saved servo angles')
+    parser.add_argument('--simulate', action='store_true',
+                        help='Run without hardware on a simulated PCA9685')
+    parser.add_argument('--block-writes', action='store_true',
+                        help='Write whole frames as PCA9685 block transfers instead of via ServoKit')
+    parser.add_argument('--state-path', type=str,
+                        help='Memory-map the live joint state to this file for other processes')
+    parser.add_argument('--limbs', type=str,
+                        help='JSON file mapping limbs to PCA9685 boards and channels')
+    parser.add_argument('--power-budget', type=float,
+                        help='Servo supply current in amps to keep moves under')
+    parser.add_argument('--idle-release', type=float,
+                        help='Seconds a servo holds still before its PWM is released')
+    parser.add_argument('--log-level', default='info',
+                        choices=['debug', 'info', 'warning', 'error', 'off'],
+                        help='Logging verbosity (off skips logging entirely)')
+    parser.add_argument('--metrics-file', type=str,
+                        help='Write Prometheus metrics to this file after each sequence')
+    parser.add_argument('--no-metrics', action='store_true', help='Turn off metrics and tracing')
+    parser.add_argument('--blend', type=float,
+                        help='Blend sequence steps together within this tolerance in degrees')
+    parser.add_argument('--serve', action='store_true',
+                        help='Accept commands over a Unix socket and TCP')
+    parser.add_argument('--socket', type=str, default=DEFAULT_SOCKET_PATH,
+                        help='Unix socket for --serve')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='TCP port for --serve (0 to disable)')
+    parser.add_argument('--stream', type=str,
+                        help='Play live joint frames from - (stdin), udp:PORT or a named pipe')
+    parser.add_argument('--stream-delay', type=float, default=0.05,
+                        help='Jitter buffer delay in seconds for --stream')
+    parser.add_argument('--show', type=str, help='Play a binary show file')
+    parser.add_argument('--export-show', nargs=2, metavar=('SEQUENCE', 'FILE'),
+                        help='Convert a sequence into a binary show file')
+    parser.add_argument('--import-show', nargs=2, metavar=('FILE', 'SEQUENCE'),
+                        help='Convert a binary show file into a sequence')
     
     args = parser.parse_args()
     
+    if args.log_level == 'off':
+        logging.disable(logging.CRITICAL)
+    else:
+        logging.basicConfig(level=args.log_level.upper(), format='%(message)s')
+    
+    METRICS.enabled = not args.no_metrics
+    if args.metrics_file:
+        METRICS.add_exporter(PrometheusFileExporter(args.metrics_file))
+    
     print("🎭 Motorized String Puppet Controller")
     print("====================================")
     
+    # Listing only reads the JSON files, so it never touches the hardware
+    if args.list:
+        sequencer = SequenceController(None)
+        if args.list == 'poses':
+            sequencer.list_poses()
+        elif args.list == 'sequences':
+            sequencer.list_sequences()
+        return
+    
+    # Converting only needs the joint layout, never the hardware
+    if args.export_show or args.import_show:
+        puppet = PuppetController(home=False, simulate=True, limb_file=args.limbs)
+        sequencer = SequenceController(puppet)
+        if args.export_show:
+            sequence_name, path = args.export_show
+            count = sequencer.export_show(sequence_name, path)
+            print(f"💾 Wrote {count} records to {path}")
+        else:
+            path, sequence_name = args.import_show
+            sequencer.import_show(path, sequence_name)
+            print(f"📥 Added sequence '{sequence_name}' to {sequencer.sequences_file}")
+        return
+    
+    puppet = None
     try:
-        # Initialize the puppet controller
+        started = time.monotonic()
+        
+        # Initialize the puppet controller (homes all arms once, unless
+        # --fast-start finds a saved state to trust)
         print("Initializing puppet controller...")
-        puppet = PuppetController()
+        # A simulated run must not overwrite the real servos' saved angles
+        state_file = None if args.simulate else STATE_FILE
+        puppet = PuppetController(state_file=state_file, restore_state=args.fast_start,
+                                  simulate=args.simulate, limb_file=args.limbs,
+                                  power_budget=args.power_budget,
+                                  idle_timeout=args.idle_release,
+                                  block_writes=args.block_writes,
+                                  state_path=args.state_path)
         
         # Initialize sequence controller
         print("Loading poses and sequences...")
         sequencer = SequenceController(puppet)
+        sequencer.blend_tolerance = args.blend
+        if args.watch:
+            sequencer.watch()
         
-        print("✅ Puppet ready!")
+        print(f"✅ Puppet ready in {(time.monotonic() - started) * 1000:.0f} ms!")
         print(f"📍 Servo channels configured:")
-        for arm_name, config in puppet.arm_configs.items():
-            print(f"   {arm_name}: {config}")
-        
-        # Reset puppet to center position
-        print("\\n🔄 Resetting puppet to center position...")
-        puppet.reset_all_arms()
-        time.sleep(1)
+        for arm_name, arm in puppet.arms.items():
+            print(f"   {arm_name}: {arm.config}")
         
         # Handle different modes
-        if args.list:
-            if args.list == 'poses':
-                sequencer.list_poses()
-            elif args.list == 'sequences':
-                sequencer.list_sequences()
-        
-        elif args.pose:
+        if args.pose:
             print(f"\\n🎭 Executing pose: {args.pose}")
             sequencer.execute_pose(args.pose)
         
@@ -77,6 +172,20 @@ def main():
         elif args.interactive:
             sequencer.interactive_mode()
         
+        elif args.serve:
+            print(f"\\n📡 Serving commands on {args.socket} and 127.0.0.1:{args.port}")
+            server = CommandServer(sequencer, args.socket, port=args.port or None)
+            asyncio.run(server.serve_forever())
+        
+        elif args.show:
+            print(f"\\n🎞️  Playing show: {args.show}")
+            sequencer.play_show(args.show)
+        
+        elif args.stream:
+            print(f"\\n🎛️  Streaming joint frames from {args.stream}")
+            stream = JointStream(puppet, args.stream_delay)
+            asyncio.run(stream.run(args.stream))
+        
         else:
             # Default behavior - show help and run a quick demo
             print("\\n" + "="*50)
@@ -102,11 +211,15 @@ def main():
         print(f"\\n❌ Error: {e}")
         print("Make sure your PCA9685 is connected and powered on!")
     finally:
-        print("\\n🔄 Resetting puppet to safe position...")
-        try:
-            puppet.reset_all_arms()
-        except:
-            pass
+        if puppet is not None:
+            print("\\n🔄 Resetting puppet to safe position...")
+            try:
+                puppet.reset_all_arms()
+                puppet.servo_controller.close()
+                puppet.save_state()
+                METRICS.export()
+            except:
+                pass
         print("👋 Goodbye!")
 
 def run_demo_sequences(sequencer):
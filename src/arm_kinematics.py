@@ -0,0 +1,327 @@
+"""
+Arm Kinematics
+Inverse kinematics for planar shoulder/elbow/wrist chains, with a lookup grid cached on disk
+"""
+
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '.cache', 'kinematics')
+# Grid points along each axis, spanning the arm's full reach
+GRID_SIZE = 201
+# Hand orientations tried for a chain with a wrist (3 degrees apart)
+ORIENTATION_SAMPLES = 120
+# Grid points solved at once, to bound the memory of the candidate arrays
+SOLVE_CHUNK = 2048
+# Largest difference in degrees between a joint's angles at the corners of a
+# grid cell for interpolating across it; larger means the cell straddles a
+# switch between elbow branches, so the target is solved exactly instead
+MAX_CELL_SPREAD = 20.0
+# Servo angle every joint can reach
+SERVO_MIN = 0.0
+SERVO_MAX = 180.0
+
+
+class Link:
+    def __init__(self, joint, length, zero=90.0, reverse=False):
+        """
+        One joint of the chain and the link it turns
+
+        Args:
+            joint: Joint name in the arm config
+            length: Distance from this joint to the next one (or to the
+                    hand), in the unit of the hand targets, e.g. mm
+            zero: Servo angle at which the link lines up with the link
+                  before it (for the first joint: with the +x axis)
+            reverse: The link turns clockwise as the servo angle grows
+        """
+        self.joint = joint
+        self.length = float(length)
+        self.zero = float(zero)
+        self.reverse = reverse
+
+    @classmethod
+    def from_config(cls, joint, config):
+        """Build a link from a joint config dictionary with a "length" """
+        return cls(joint, config['length'], config.get('zero', 90.0), config.get('reverse', False))
+
+    def to_servo(self, radians):
+        """Convert joint angles in radians (arrays allowed) to servo angles"""
+        sign = -1.0 if self.reverse else 1.0
+        servo = self.zero + sign * np.degrees(radians)
+        # The same joint angle plus or minus a full turn: take the one
+        # nearest the middle of the servo's range
+        return (servo - 90.0 + 180.0) % 360.0 - 180.0 + 90.0
+
+    def to_joint(self, servo):
+        """Convert servo angles (arrays allowed) to joint angles in radians"""
+        sign = -1.0 if self.reverse else 1.0
+        return np.radians(sign * (np.asarray(servo, dtype=float) - self.zero))
+
+
+class ArmKinematics:
+    def __init__(self, links, grid_size=GRID_SIZE, cache_dir=CACHE_DIR):
+        """
+        Kinematics of a planar chain of two or three joints
+
+        Positions are (x, y) in the plane the arm moves in, with the first
+        joint (the shoulder) at the origin. With a third joint (the wrist)
+        the chain can reach a point in many ways; the solution whose servos
+        are nearest the middle of their range is used, which with the
+        default zero angles keeps the arm as straight as it can.
+
+        Args:
+            links: List of Link from the shoulder out
+            grid_size: Lookup grid points along each axis
+            cache_dir: Directory for cached lookup grids (None disables the cache)
+
+        Raises:
+            ValueError: If there are not two or three links
+        """
+        if not 2 <= len(links) <= 3:
+            raise ValueError(f"Inverse kinematics needs 2 or 3 links, got {len(links)}")
+        self.links = links
+        self.joints = [link.joint for link in links]
+        self.lengths = [link.length for link in links]
+        self.reach = sum(self.lengths)
+        self.grid_size = grid_size
+        self.cache_dir = cache_dir
+        # Grid spacing; grid point (i, j) is at (-reach + i * step, -reach + j * step)
+        self.step = 2 * self.reach / (grid_size - 1)
+        self._grid = None
+        self._rows = None
+
+    @classmethod
+    def from_arm_config(cls, arm_config, **kwargs):
+        """
+        Build the kinematics of an arm from its config
+
+        The joints that have a "length", in config order, form the chain, e.g.
+            {'shoulder': {'channel': 0, 'length': 100},
+             'elbow': {'channel': 1, 'length': 80, 'reverse': True},
+             'wrist': {'channel': 2, 'length': 40}}
+
+        Returns:
+            ArmKinematics, or None if no joint has a length
+        """
+        links = [Link.from_config(joint, config) for joint, config in arm_config.items()
+                 if isinstance(config, dict) and 'length' in config]
+        if not links:
+            return None
+        return cls(links, **kwargs)
+
+    def forward(self, angles):
+        """
+        Get the hand position for servo angles
+
+        Args:
+            angles: Array-like of shape (..., number of links), in chain order
+
+        Returns:
+            (x, y) arrays
+        """
+        angles = np.asarray(angles, dtype=float)
+        heading = 0.0
+        x = y = 0.0
+        for i, link in enumerate(self.links):
+            heading = heading + link.to_joint(angles[..., i])
+            x = x + link.length * np.cos(heading)
+            y = y + link.length * np.sin(heading)
+        return x, y
+
+    def solve(self, x, y):
+        """
+        Solve exactly for hand targets
+
+        Vectorized over any number of targets: every hand orientation (for
+        a wrist) and both elbow branches are tried at once, and the valid
+        candidate nearest the servos' middle wins.
+
+        Args:
+            x, y: Hand target coordinates (scalars or arrays)
+
+        Returns:
+            Array of shape (..., number of links) of servo angles, NaN
+            where the target is out of reach
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        shape = x.shape
+        x = x.ravel()
+        y = y.ravel()
+        angles = np.empty((len(x), len(self.links)))
+        for start in range(0, len(x), SOLVE_CHUNK):
+            chunk = slice(start, start + SOLVE_CHUNK)
+            angles[chunk] = self._solve_chunk(x[chunk], y[chunk])
+        return angles.reshape(shape + (len(self.links),))
+
+    def _solve_chunk(self, x, y):
+        """Solve flat arrays of targets (see solve())"""
+        upper, fore = self.lengths[:2]
+        if len(self.links) == 3:
+            # Where the wrist must be for each hand orientation
+            orientation = np.linspace(-math.pi, math.pi, ORIENTATION_SAMPLES, endpoint=False)
+            hand = self.lengths[2]
+            wrist_x = x[:, None] - hand * np.cos(orientation)
+            wrist_y = y[:, None] - hand * np.sin(orientation)
+        else:
+            orientation = None
+            wrist_x = x[:, None]
+            wrist_y = y[:, None]
+
+        # Two-link solution for the wrist point; last axis: both elbow branches
+        cosine = ((wrist_x ** 2 + wrist_y ** 2 - upper ** 2 - fore ** 2)
+                  / (2 * upper * fore))
+        reachable = np.abs(cosine) <= 1.0
+        elbow = np.arccos(np.clip(cosine, -1.0, 1.0))[..., None] * np.array([1.0, -1.0])
+        shoulder = (np.arctan2(wrist_y, wrist_x)[..., None]
+                    - np.arctan2(fore * np.sin(elbow), upper + fore * np.cos(elbow)))
+        joints = [shoulder, elbow]
+        if orientation is not None:
+            joints.append(orientation[None, :, None] - shoulder - elbow)
+
+        servos = np.stack([link.to_servo(joint) for link, joint in zip(self.links, joints)],
+                          axis=-1)
+        valid = reachable[..., None] & np.all((servos >= SERVO_MIN) & (servos <= SERVO_MAX),
+                                              axis=-1)
+        cost = np.where(valid, np.sum((servos - 90.0) ** 2, axis=-1), np.inf)
+
+        count = len(x)
+        servos = servos.reshape(count, -1, len(self.links))
+        best = np.argmin(cost.reshape(count, -1), axis=1)
+        angles = servos[np.arange(count), best]
+        angles[~np.isfinite(cost.reshape(count, -1)[np.arange(count), best])] = np.nan
+        return angles
+
+    def cache_key(self):
+        """Hash everything the lookup grid depends on"""
+        digest = hashlib.sha256()
+        links = [(link.length, link.zero, link.reverse) for link in self.links]
+        for part in (links, self.grid_size, ORIENTATION_SAMPLES, SERVO_MIN, SERVO_MAX):
+            digest.update(json.dumps(part).encode())
+        return digest.hexdigest()
+
+    @property
+    def grid(self):
+        """
+        Servo angles at every grid point, shape (grid_size, grid_size, links)
+
+        Solved on first use and cached on disk, so later runs load it in
+        milliseconds. NaN marks points out of reach.
+        """
+        if self._grid is None:
+            self._grid = self._load_grid()
+        return self._grid
+
+    def load(self):
+        """Load or solve the lookup grid now rather than on the first lookup"""
+        # Plain lists index faster than NumPy for one point at a time
+        self._rows = self.grid.tolist()
+
+    def _load_grid(self):
+        """Load the lookup grid from the cache, or solve and cache it"""
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, self.cache_key() + '.npz')
+            if os.path.exists(path):
+                with np.load(path) as cached:
+                    return cached['angles']
+
+        axis = np.linspace(-self.reach, self.reach, self.grid_size)
+        grid = self.solve(axis[:, None], axis[None, :])
+
+        if path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename so a concurrent reader never sees a partial file
+            temp_path = path + '.tmp.npz'
+            np.savez(temp_path, angles=grid)
+            os.replace(temp_path, path)
+        return grid
+
+    def lookup(self, x, y):
+        """
+        Solve one hand target by interpolating the lookup grid
+
+        Costs a few microseconds, so it can run for every control tick.
+        Targets in a grid cell that touches the edge of the reach or a
+        switch between elbow branches are solved exactly instead; a cell
+        with every corner out of reach is taken as out of reach.
+
+        Returns:
+            List of servo angles in chain order, or None if out of reach
+        """
+        if self._rows is None:
+            self.load()
+        # Also rejects NaN
+        if not x * x + y * y <= self.reach * self.reach:
+            return None
+        u = (x + self.reach) / self.step
+        v = (y + self.reach) / self.step
+        last = self.grid_size - 1
+        if 0 <= u <= last and 0 <= v <= last:
+            i = min(int(u), last - 1)
+            j = min(int(v), last - 1)
+            fu = u - i
+            fv = v - j
+            rows = self._rows
+            a, b = rows[i][j], rows[i][j + 1]
+            c, d = rows[i + 1][j], rows[i + 1][j + 1]
+            # Out-of-reach grid points are NaN in every joint
+            missing = [math.isnan(corner[0]) for corner in (a, b, c, d)]
+            if all(missing):
+                # The whole cell is out of reach
+                return None
+            if not any(missing):
+                angles = []
+                for k in range(len(a)):
+                    corners = (a[k], b[k], c[k], d[k])
+                    if max(corners) - min(corners) > MAX_CELL_SPREAD:
+                        break
+                    angles.append((a[k] * (1 - fv) + b[k] * fv) * (1 - fu)
+                                  + (c[k] * (1 - fv) + d[k] * fv) * fu)
+                else:
+                    return angles
+
+        angles = self.solve(x, y)
+        if np.isnan(angles[0]):
+            return None
+        return angles.tolist()
+
+    def lookup_many(self, x, y):
+        """
+        Solve many hand targets by interpolating the lookup grid
+
+        The vectorized version of lookup(), for whole hand paths.
+
+        Args:
+            x, y: Arrays of hand target coordinates
+
+        Returns:
+            Array of shape (..., number of links) of servo angles, NaN
+            where the target is out of reach
+        """
+        grid = self.grid
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        last = self.grid_size - 1
+        u = (x + self.reach) / self.step
+        v = (y + self.reach) / self.step
+        inside = (u >= 0) & (u <= last) & (v >= 0) & (v <= last)
+        i = np.clip(np.floor(u), 0, last - 1).astype(int)
+        j = np.clip(np.floor(v), 0, last - 1).astype(int)
+        fu = np.clip(u - i, 0.0, 1.0)[..., None]
+        fv = np.clip(v - j, 0.0, 1.0)[..., None]
+
+        a, b = grid[i, j], grid[i, j + 1]
+        c, d = grid[i + 1, j], grid[i + 1, j + 1]
+        corners = np.stack([a, b, c, d])
+        with np.errstate(invalid='ignore'):
+            smooth = np.all(np.ptp(corners, axis=0) <= MAX_CELL_SPREAD, axis=-1) & inside
+        angles = (a * (1 - fv) + b * fv) * (1 - fu) + (c * (1 - fv) + d * fv) * fu
+
+        exact = ~smooth
+        if np.any(exact):
+            angles[exact] = self.solve(x[exact], y[exact])
+        return angles
@@ -0,0 +1,183 @@
+"""
+Preemptive Command Queue
+Runs pose, sequence and reset commands one at a time by priority, with
+preemption and an emergency stop
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# How a new command treats the running and queued commands
+MODES = ('append', 'replace', 'preempt')
+
+
+class Command:
+    def __init__(self, kind, name=None, priority=0, mode='append', options=None, command_id=None):
+        """
+        A queued motion command
+
+        Args:
+            kind: 'pose', 'sequence', 'reset' or 'demo'
+            name: Pose or sequence name
+            priority: Higher runs first and may preempt lower
+            mode: 'append' to queue behind equal priorities, 'replace' to
+                  drop queued commands of equal or lower priority first,
+                  'preempt' to also cancel the running one
+            options: Extra keyword arguments (speed, blend, compiled, delay)
+            command_id: Caller's id, echoed back in events
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}'")
+        self.kind = kind
+        self.name = name
+        self.priority = priority
+        self.mode = mode
+        self.options = options or {}
+        self.id = command_id
+        # Resolves to 'done', 'cancelled' or 'failed'
+        self.error = None
+        self.result = asyncio.get_running_loop().create_future()
+
+    def finish(self, result):
+        """Resolve the command's result if it is still open"""
+        if not self.result.done():
+            self.result.set_result(result)
+
+
+class CommandQueue:
+    def __init__(self, sequencer):
+        """
+        Initialize the queue
+
+        Commands run as asyncio tasks on the async API, so cancelling one
+        takes effect at its next control tick (within one loop period).
+
+        Args:
+            sequencer: SequenceController whose puppet is driven
+        """
+        self.sequencer = sequencer
+        self.servo_controller = sequencer.puppet.servo_controller
+        # Heap of (-priority, order, Command)
+        self.pending = []
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.current = None
+        self._task = None
+
+    def submit(self, kind, name=None, priority=0, mode='append', command_id=None, **options):
+        """
+        Add a command
+
+        A 'preempt' command only preempts a running command of equal or
+        lower priority; otherwise it waits at the head of its priority.
+
+        Returns:
+            Command, whose `result` future tells how it ended
+        """
+        command = Command(kind, name, priority, mode, options, command_id)
+        if mode in ('replace', 'preempt'):
+            kept = []
+            for entry in self.pending:
+                if entry[2].priority <= priority:
+                    self._drop(entry[2])
+                else:
+                    kept.append(entry)
+            heapq.heapify(kept)
+            self.pending = kept
+
+        heapq.heappush(self.pending, (-priority, next(self._order), command))
+        if (mode == 'preempt' and self.current is not None
+                and self.current.priority <= priority):
+            self._drop(self.current)
+            self._task.cancel()
+        self._wakeup.set()
+        return command
+
+    def stop(self):
+        """Cancel the running command and everything queued; servos hold where they are"""
+        for _, _, command in self.pending:
+            self._drop(command)
+        self.pending = []
+        if self.current is not None:
+            self._drop(self.current)
+            self._task.cancel()
+
+    def emergency_stop(self):
+        """
+        Stop everything and freeze every servo at its commanded angle right now
+
+        Nothing moves until the next command starts.
+        """
+        self.stop()
+        self.servo_controller.freeze()
+        logger.warning("Emergency stop")
+
+    async def run(self):
+        """Run queued commands until cancelled"""
+        try:
+            while True:
+                while not self.pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                _, _, command = heapq.heappop(self.pending)
+                await self._execute(command)
+        finally:
+            self.stop()
+
+    async def _execute(self, command):
+        """Run one command as a task"""
+        self.current = command
+        # Lift an emergency stop; it dropped everything queued before it
+        self.servo_controller.resume()
+        self._task = asyncio.ensure_future(self._run_command(command))
+        try:
+            # Wait for the task rather than awaiting it, so a CancelledError
+            # here always means we were cancelled ourselves, never just the
+            # command (both can happen before we resume)
+            await asyncio.wait([self._task])
+        except asyncio.CancelledError:
+            self._task.cancel()
+            command.finish('cancelled')
+            raise
+        finally:
+            self.current = None
+            self._task = None
+
+    async def _run_command(self, command):
+        """Carry out a command and record how it ended"""
+        try:
+            await self._coroutine(command)
+            command.finish('done')
+        except asyncio.CancelledError:
+            command.finish('cancelled')
+            raise
+        except Exception as e:
+            logger.error("Command %s %s failed: %s", command.kind, command.name, e)
+            command.error = str(e)
+            command.finish('failed')
+
+    def _coroutine(self, command):
+        """Build the coroutine that carries out a command"""
+        options = command.options
+        if command.kind == 'pose':
+            return self.sequencer.execute_pose_async(command.name, options.get('speed'))
+        if command.kind == 'sequence':
+            return self.sequencer.execute_sequence_async(
+                command.name, options.get('compiled', False), options.get('blend'))
+        if command.kind == 'reset':
+            return self.sequencer.puppet.reset_all_arms_async()
+        if command.kind == 'demo':
+            return self.sequencer.demo_all_poses_async(options.get('delay', 2.0))
+        raise ValueError(f"Unknown command '{command.kind}'")
+
+    def _drop(self, command):
+        """Mark a command as cancelled by another one"""
+        if not command.result.done():
+            METRICS.inc('puppet_commands_preempted_total')
+        command.finish('cancelled')
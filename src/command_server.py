@@ -0,0 +1,230 @@
+"""
+Command Server
+Accepts pose, sequence, stop and reset commands over a Unix socket and TCP
+while motion keeps running
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from command_queue import CommandQueue, MODES
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/tmp/puppet.sock'
+DEFAULT_PORT = 7777
+
+
+def parse_command(line):
+    """
+    Parse one command line
+
+    Lines are either a JSON object, e.g.
+        {"id": 7, "cmd": "pose", "name": "wave_right", "speed": 5,
+         "priority": 1, "mode": "append"}
+    or the short text form "<cmd> [name]", e.g. "sequence greeting".
+
+    Returns:
+        Command dictionary with at least 'cmd'
+
+    Raises:
+        ValueError: If the line is not a valid command
+    """
+    line = line.strip()
+    if line.startswith('{'):
+        message = json.loads(line)
+        if not isinstance(message, dict) or 'cmd' not in message:
+            raise ValueError("Message needs a 'cmd'")
+        return message
+
+    words = line.split()
+    if not words:
+        raise ValueError("Empty command")
+    message = {'cmd': words[0]}
+    if len(words) > 1:
+        message['name'] = words[1]
+    return message
+
+
+class CommandServer:
+    def __init__(self, sequencer, socket_path=DEFAULT_SOCKET_PATH, host='127.0.0.1',
+                 port=DEFAULT_PORT):
+        """
+        Initialize the server
+
+        Every command is acknowledged as soon as it has been checked; motion
+        runs from a CommandQueue on the same event loop, and a "done" event
+        is sent on the same connection when it finishes. By default a new
+        pose, sequence or reset preempts the motion that is running; a
+        message may set "priority" and "mode" ('append', 'replace' or
+        'preempt') instead.
+
+        Args:
+            sequencer: SequenceController whose puppet is driven
+            socket_path: Unix socket to listen on (None to disable)
+            host: TCP address to listen on
+            port: TCP port to listen on (None to disable)
+        """
+        self.sequencer = sequencer
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.servers = []
+        self.queue = None
+        self._worker = None
+
+    async def start(self):
+        """Start the command queue and start listening"""
+        self.queue = CommandQueue(self.sequencer)
+        self._worker = asyncio.ensure_future(self.queue.run())
+        if self.socket_path is not None:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.servers.append(
+                await asyncio.start_unix_server(self._handle_client, self.socket_path))
+            logger.info("Listening on %s", self.socket_path)
+        if self.port is not None:
+            self.servers.append(
+                await asyncio.start_server(self._handle_client, self.host, self.port))
+            logger.info("Listening on %s:%d", self.host, self.port)
+
+    async def serve_forever(self):
+        """Start listening and serve until cancelled"""
+        await self.start()
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in self.servers))
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop the motion and close every listener"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def _handle_client(self, reader, writer):
+        """Serve one persistent connection, one command per line"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.monotonic()
+                reply = self.handle_line(line.decode(errors='replace'), writer)
+                if reply is not None:
+                    self._send(writer, reply)
+                    await writer.drain()
+                    METRICS.observe('puppet_command_ack_seconds', time.monotonic() - received)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def handle_line(self, line, writer=None):
+        """
+        Handle one command line and build its acknowledgement
+
+        Args:
+            line: Command line (see parse_command())
+            writer: Stream to send the "done" event of a motion to (optional)
+
+        Returns:
+            Reply dictionary, or None for blank lines
+        """
+        if not line.strip():
+            return None
+        try:
+            message = parse_command(line)
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+
+        reply = {'id': message.get('id'), 'cmd': message['cmd']}
+        handler = getattr(self, '_cmd_' + str(message['cmd']), None)
+        if handler is None:
+            reply.update(ok=False, error=f"Unknown command '{message['cmd']}'")
+            return reply
+
+        METRICS.inc('puppet_commands_total', cmd=message['cmd'])
+        try:
+            error = handler(message, writer)
+        except Exception as e:
+            # A bad command must not drop the client's connection
+            logger.exception("Command %r failed", message['cmd'])
+            error = f"{type(e).__name__}: {e}"
+        if error is None:
+            reply['ok'] = True
+        else:
+            reply.update(ok=False, error=error)
+        return reply
+
+    def _cmd_pose(self, message, writer):
+        """Move to a named pose"""
+        name = message.get('name')
+        if not isinstance(name, str):
+            return "Pose name must be a string"
+        if name not in self.sequencer.poses:
+            return f"Pose '{name}' not found"
+        return self._submit(message, writer, speed=message.get('speed'))
+
+    def _cmd_sequence(self, message, writer):
+        """Run a named sequence"""
+        name = message.get('name')
+        if not isinstance(name, str):
+            return "Sequence name must be a string"
+        if name not in self.sequencer.sequences:
+            return f"Sequence '{name}' not found"
+        return self._submit(message, writer, compiled=message.get('compiled', False),
+                            blend=message.get('blend'))
+
+    def _cmd_reset(self, message, writer):
+        """Move every arm to center position"""
+        return self._submit(message, writer)
+
+    def _cmd_stop(self, message, writer):
+        """Stop the running motion where it is and drop queued commands"""
+        self.queue.stop()
+
+    def _cmd_estop(self, message, writer):
+        """Emergency stop: freeze every servo at its commanded angle now"""
+        self.queue.emergency_stop()
+
+    def _cmd_ping(self, message, writer):
+        """Check that the server is alive"""
+
+    def _submit(self, message, writer, **options):
+        """Queue a motion command and send its "done" event when it ends"""
+        mode = message.get('mode', 'preempt')
+        if mode not in MODES:
+            return f"Unknown mode '{mode}'"
+        try:
+            priority = int(message.get('priority', 0))
+        except (TypeError, ValueError):
+            return "Priority must be an integer"
+
+        command = self.queue.submit(message['cmd'], message.get('name'), priority, mode,
+                                    message.get('id'), **options)
+        command.result.add_done_callback(
+            lambda result: self._motion_done(command, message, writer))
+
+    def _motion_done(self, command, message, writer):
+        """Send the "done", "cancelled" or "failed" event of a command"""
+        event = {'id': message.get('id'), 'cmd': message['cmd'], 'event': command.result.result()}
+        if command.error is not None:
+            event['error'] = command.error
+        if writer is not None and not writer.is_closing():
+            self._send(writer, event)
+
+    @staticmethod
+    def _send(writer, message):
+        """Write one message as a line of compact JSON"""
+        writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
@@ -0,0 +1,217 @@
+"""
+Fixed-rate Control Loop
+Runs motion on absolute time.monotonic() deadlines so the timeline never drifts
+"""
+
+import asyncio
+import threading
+import time
+
+from metrics import METRICS
+
+
+class LoopStats:
+    """Timing statistics for one or more control loop runs"""
+
+    def __init__(self):
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.overruns = 0
+        self.max_jitter = 0.0
+        self.total_jitter = 0.0
+        self.start = None
+        self.end = None
+        # Stopped early by ControlLoop.cancel()
+        self.cancelled = False
+
+    def record_tick(self, jitter):
+        """Record how late (in seconds) a tick started after its deadline"""
+        self.ticks += 1
+        self.total_jitter += jitter
+        if jitter > self.max_jitter:
+            self.max_jitter = jitter
+
+    @property
+    def mean_jitter(self):
+        """Average tick lateness in seconds"""
+        return self.total_jitter / self.ticks if self.ticks else 0.0
+
+    def merge(self, other):
+        """Add the statistics of another run to this one"""
+        self.ticks += other.ticks
+        self.missed_ticks += other.missed_ticks
+        self.overruns += other.overruns
+        self.total_jitter += other.total_jitter
+        self.max_jitter = max(self.max_jitter, other.max_jitter)
+        self.cancelled = self.cancelled or other.cancelled
+        if self.start is None:
+            self.start = other.start
+        if other.end is not None:
+            self.end = other.end
+
+    def as_dict(self):
+        """Get the statistics as a plain dictionary"""
+        return {
+            'ticks': self.ticks,
+            'missed_ticks': self.missed_ticks,
+            'overruns': self.overruns,
+            'mean_jitter': self.mean_jitter,
+            'max_jitter': self.max_jitter,
+        }
+
+
+class ControlLoop:
+    def __init__(self, rate=50, catch_up=False):
+        """
+        Initialize a fixed-rate control loop
+
+        Args:
+            rate: Tick rate in Hz
+            catch_up: When a tick overruns its period, run the missed ticks
+                      back to back (True) or skip them and resume on the next
+                      future deadline (False). Either way the timeline keeps
+                      its absolute schedule.
+        """
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.catch_up = catch_up
+        self.last_stats = LoopStats()
+        # Set by cancel() and kept until resume(), so a stop that lands
+        # between two runs or during a hold is not lost
+        self.stop_token = threading.Event()
+
+    def cancel(self):
+        """
+        Stop every run and hold in progress, and any started later, until resume()
+
+        Runs stop at their next tick and holds return at once. Safe to call
+        from another thread.
+        """
+        self.stop_token.set()
+
+    def resume(self):
+        """Let runs and holds go ahead again after cancel()"""
+        self.stop_token.clear()
+
+    @property
+    def stopped(self):
+        """Whether cancel() was called and resume() not yet"""
+        return self.stop_token.is_set()
+
+    @staticmethod
+    def wait_until(deadline):
+        """
+        Sleep until an absolute time.monotonic() deadline
+
+        Returns:
+            How late we woke up in seconds (the overrun if the deadline
+            had already passed)
+        """
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        return time.monotonic() - deadline
+
+    @staticmethod
+    async def wait_until_async(deadline):
+        """Asyncio version of wait_until() that yields to the event loop"""
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        return time.monotonic() - deadline
+
+    def hold(self, deadline):
+        """
+        Sleep until an absolute time.monotonic() deadline, or until cancel()
+
+        Returns:
+            How late we woke up in seconds (0 when cut short by cancel())
+        """
+        remaining = deadline - time.monotonic()
+        if remaining > 0 and self.stop_token.wait(remaining):
+            return 0.0
+        return max(0.0, time.monotonic() - deadline)
+
+    async def hold_async(self, deadline):
+        """Asyncio version of hold(), checking for cancel() every period"""
+        while not self.stopped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return -remaining
+            await asyncio.sleep(min(remaining, self.period))
+        return 0.0
+
+    def run(self, tick, duration, start=None):
+        """
+        Call tick(t) at a fixed rate until `duration` seconds have elapsed
+
+        Ticks are scheduled at start + k * period and always receive their
+        scheduled time t, not the time they actually ran. The last tick is
+        always at t == duration, so consecutive runs chained on the returned
+        end time form one continuous timeline. cancel() stops the run while
+        it waits for a tick; a run started after it writes nothing.
+
+        Args:
+            tick: Callable taking the scheduled time since start; returning
+                  False stops the loop early
+            duration: Length of the run in seconds
+            start: Absolute time.monotonic() start deadline (default: now)
+
+        Returns:
+            LoopStats for this run (stats.end is the absolute end deadline)
+        """
+        stats = self._begin(duration, start)
+        k = 0
+        while True:
+            t = min(k * self.period, duration)
+            stats.record_tick(self.hold(stats.start + t))
+            if self.stopped:
+                stats.cancelled = True
+                break
+            if tick(t) is False or t >= duration:
+                break
+            k = self._next_tick(stats, k)
+        return stats
+
+    async def run_async(self, tick, duration, start=None):
+        """
+        Asyncio version of run() that awaits deadlines instead of sleeping
+
+        The tick callable itself is synchronous; other tasks run while the
+        loop waits for the next deadline. Cancelling the awaiting task stops
+        the loop at the next tick.
+        """
+        stats = self._begin(duration, start)
+        k = 0
+        while True:
+            t = min(k * self.period, duration)
+            stats.record_tick(await self.hold_async(stats.start + t))
+            if self.stopped:
+                stats.cancelled = True
+                break
+            if tick(t) is False or t >= duration:
+                break
+            k = self._next_tick(stats, k)
+        return stats
+
+    def _begin(self, duration, start):
+        """Create the statistics for a new run"""
+        stats = LoopStats()
+        stats.start = time.monotonic() if start is None else start
+        stats.end = stats.start + duration
+        self.last_stats = stats
+        return stats
+
+    def _next_tick(self, stats, k):
+        """Get the index of the next tick to run, skipping missed deadlines"""
+        k += 1
+        late = time.monotonic() - (stats.start + k * self.period)
+        if late > 0:
+            stats.overruns += 1
+            METRICS.inc('puppet_missed_deadlines_total', kind='tick')
+            if not self.catch_up:
+                # Resume on the next deadline that is still in the future
+                skipped = int(late / self.period) + 1
+                stats.missed_ticks += skipped
+                k += skipped
+        return k
@@ -0,0 +1,160 @@
+"""
+Hot Reload for Poses and Sequences
+Watches the choreography files and swaps in edited entries without a restart
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WatchedFile:
+    def __init__(self, path, section):
+        """
+        A JSON file whose top-level section is watched for changes
+
+        Args:
+            path: Path to the JSON file
+            section: Top-level key holding the entries ('poses' or 'sequences')
+        """
+        self.path = path
+        self.section = section
+        self.stat = None
+        self.digest = None
+        # Section as last parsed from the file; edits are diffed against it so
+        # entries added in memory (custom poses, imports) are left alone
+        self.entries = {}
+        contents = self._check()
+        if contents is not None:
+            self.entries = self._parse(contents) or {}
+
+    def _check(self):
+        """
+        Check whether the file changed since the last check
+
+        Returns:
+            The file contents if they changed, otherwise None
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self.stat:
+            return None
+        self.stat = signature
+
+        with open(self.path, 'rb') as f:
+            contents = f.read()
+        digest = hashlib.sha256(contents).digest()
+        if digest == self.digest:
+            # Touched but not edited
+            return None
+        self.digest = digest
+        return contents
+
+    def reload(self, current):
+        """
+        Merge the entries edited in the file into a copy of `current`
+
+        Entries are compared with the file as it was last read, so entries
+        that only exist in `current` are kept.
+
+        Args:
+            current: Dictionary of entries currently in use
+
+        Returns:
+            (entries, changed, removed), or None if nothing changed or the
+            file could not be parsed
+        """
+        contents = self._check()
+        if contents is None:
+            return None
+        loaded = self._parse(contents)
+        if loaded is None:
+            return None
+
+        # Only what was edited in the file since it was last read
+        previous = self.entries
+        self.entries = loaded
+        entries = dict(current)
+        changed = [name for name, entry in loaded.items() if previous.get(name) != entry]
+        removed = [name for name in previous if name not in loaded and name in current]
+        for name in changed:
+            entries[name] = loaded[name]
+        for name in removed:
+            del entries[name]
+        return entries, changed, removed
+
+    def _parse(self, contents):
+        """Get the watched section of the file contents (None if they cannot be parsed)"""
+        try:
+            return json.loads(contents).get(self.section, {})
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+            logger.warning("Error reading %s file %s, keeping previous version",
+                           self.section, self.path)
+            return None
+
+
+class ChoreographyWatcher:
+    def __init__(self, sequence_controller, interval=0.5):
+        """
+        Initialize the watcher
+
+        Args:
+            sequence_controller: SequenceController whose poses and sequences to keep fresh
+            interval: Minimum seconds between checks of the files
+        """
+        self.sequencer = sequence_controller
+        self.interval = interval
+        self.poses_file = WatchedFile(sequence_controller.poses_file, 'poses')
+        self.sequences_file = WatchedFile(sequence_controller.sequences_file, 'sequences')
+        self.reloads = 0
+        self._last_check = time.monotonic()
+
+    def poll(self, force=False):
+        """
+        Check the files and swap in any changed entries
+
+        Called between sequence steps and interactive commands; the new
+        dictionaries replace the old ones in a single assignment, so a step
+        always sees one consistent version.
+
+        Args:
+            force: Check even if the interval has not elapsed
+
+        Returns:
+            True if anything was reloaded
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.interval:
+            return False
+        self._last_check = now
+
+        reloaded = False
+        result = self.poses_file.reload(self.sequencer.poses)
+        if result is not None:
+            self.sequencer.poses, changed, removed = result
+            self._report('poses', changed, removed)
+            reloaded = True
+
+        result = self.sequences_file.reload(self.sequencer.sequences)
+        if result is not None:
+            self.sequencer.sequences, changed, removed = result
+            self._report('sequences', changed, removed)
+            reloaded = True
+
+        if reloaded:
+            self.reloads += 1
+        return reloaded
+
+    def _report(self, section, changed, removed):
+        """Log a summary of a reload"""
+        if changed or removed:
+            logger.info("Reloaded %s: %d changed, %d removed %s",
+                        section, len(changed), len(removed), changed + removed)
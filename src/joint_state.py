@@ -0,0 +1,123 @@
+"""
+Joint State Store
+Single source of truth for the commanded angle, target and velocity of every channel
+"""
+
+import math
+import mmap
+import os
+import time
+
+# Rows of the store, each holding one float64 per channel
+COMMANDED = 0
+TARGET = 1
+VELOCITY = 2
+UPDATED = 3
+NUM_ROWS = 4
+
+NAN = float('nan')
+
+
+class JointStateStore:
+    def __init__(self, channels, path=None):
+        """
+        Initialize the store as preallocated float64 arrays indexed by channel
+
+        Unknown values are NaN. When a path is given the arrays live in a
+        memory-mapped file, so other processes can read live joint state
+        with JointStateStore.attach() without touching the I2C bus. The file
+        is NUM_ROWS rows of `channels` native float64 values: commanded
+        angle, target angle, velocity (deg/s) and time.monotonic() of the
+        last write.
+
+        Args:
+            channels: Number of servo channels
+            path: File to memory-map the store to (optional)
+        """
+        self.channels = channels
+        self.path = path
+        size = NUM_ROWS * channels * 8
+
+        if path is None:
+            self._buffer = bytearray(size)
+        else:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                os.ftruncate(fd, size)
+                self._buffer = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+
+        self._setup_views(memoryview(self._buffer).cast('d'))
+        for i in range(NUM_ROWS * channels):
+            self._values[i] = NAN
+
+    @classmethod
+    def attach(cls, path):
+        """
+        Open another process's memory-mapped store read-only
+
+        Args:
+            path: File the owning process passed as `path`
+        """
+        store = cls.__new__(cls)
+        size = os.path.getsize(path)
+        store.channels = size // (NUM_ROWS * 8)
+        store.path = path
+        with open(path, 'rb') as f:
+            store._buffer = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        store._setup_views(memoryview(store._buffer).cast('d'))
+        return store
+
+    def _setup_views(self, values):
+        """Create one view per row over the shared values"""
+        self._values = values
+        n = self.channels
+        self.commanded = values[COMMANDED * n:(COMMANDED + 1) * n]
+        self.target = values[TARGET * n:(TARGET + 1) * n]
+        self.velocity = values[VELOCITY * n:(VELOCITY + 1) * n]
+        self.updated = values[UPDATED * n:(UPDATED + 1) * n]
+
+    def get_angle(self, channel):
+        """Get the commanded angle of a channel (None if unknown or disabled)"""
+        angle = self.commanded[channel]
+        return None if math.isnan(angle) else angle
+
+    def set_commanded(self, channel, angle, now=None):
+        """
+        Record an angle written to a channel and update its velocity
+
+        Args:
+            channel: Servo channel
+            angle: Angle written (None = disabled)
+            now: time.monotonic() of the write (default: now)
+        """
+        if now is None:
+            now = time.monotonic()
+        if angle is None:
+            self.commanded[channel] = NAN
+            self.velocity[channel] = 0.0
+        else:
+            previous = self.commanded[channel]
+            elapsed = now - self.updated[channel]
+            if elapsed > 0 and not math.isnan(previous):
+                self.velocity[channel] = (angle - previous) / elapsed
+            else:
+                self.velocity[channel] = 0.0
+            self.commanded[channel] = angle
+        self.updated[channel] = now
+
+    def set_target(self, channel, angle):
+        """Record the angle a channel is moving towards"""
+        self.target[channel] = NAN if angle is None else angle
+
+    def stop(self, channel):
+        """Mark a channel as at rest"""
+        self.velocity[channel] = 0.0
+
+    def close(self):
+        """Release the memory map (if any)"""
+        self.commanded = self.target = self.velocity = self.updated = None
+        self._values.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
@@ -0,0 +1,319 @@
+"""
+Streaming Joint Frames
+Plays timestamped joint-angle frames from stdin, a named pipe or UDP through a jitter buffer
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Stream columns giving an arm's hand position instead of joint angles
+HAND_COLUMNS = ('hand_x', 'hand_y')
+
+
+class JitterBuffer:
+    def __init__(self, delay=0.05, max_frames=256):
+        """
+        Buffer that replays frames at a fixed delay behind the sender's clock
+
+        Frames are sampled `delay` seconds after the sender stamped them, so
+        frames that arrive unevenly still play out evenly. Between frames,
+        and across frames that never arrived, angles are interpolated.
+
+        Args:
+            delay: Playout delay in seconds (longer = smoother, later)
+            max_frames: Most frames to keep waiting
+        """
+        self.delay = delay
+        # (sender time, angles) in sender time order
+        self.frames = deque(maxlen=max_frames)
+        # Local time.monotonic() minus sender time, for the fastest frame seen
+        self.offset = None
+        self.received = 0
+        self.late = 0
+        self.underruns = 0
+
+    def push(self, t, angles, now):
+        """
+        Add a frame
+
+        Args:
+            t: Sender timestamp in seconds
+            angles: List of angles, one per stream channel
+            now: Local time.monotonic() the frame arrived
+        """
+        offset = now - t
+        if self.offset is None or offset < self.offset:
+            self.offset = offset
+
+        if self.frames and t <= self.frames[-1][0]:
+            # Out of order or duplicate; its moment has already been covered
+            self.late += 1
+            return False
+        self.frames.append((t, angles))
+        self.received += 1
+        return True
+
+    def sample(self, now):
+        """
+        Get the interpolated angles for local time `now`
+
+        Returns:
+            List of angles, or None before the first frame
+        """
+        if not self.frames:
+            return None
+
+        target = now - self.offset - self.delay
+        frames = self.frames
+        while len(frames) >= 2 and frames[1][0] <= target:
+            frames.popleft()
+
+        t0, angles0 = frames[0]
+        if target <= t0:
+            return angles0
+        if len(frames) == 1:
+            # Nothing newer has arrived yet: hold the last frame
+            self.underruns += 1
+            return angles0
+
+        t1, angles1 = frames[1]
+        fraction = (target - t0) / (t1 - t0)
+        return [a + (b - a) * fraction for a, b in zip(angles0, angles1)]
+
+    def drained(self, now):
+        """Check whether the newest frame has been played out"""
+        return not self.frames or now - self.offset - self.delay >= self.frames[-1][0]
+
+
+def parse_frame(line):
+    """
+    Parse one line or datagram of the stream
+
+    Either JSON:
+        {"joints": ["left_arm.shoulder", "left_arm.elbow"]}    (layout header)
+        {"t": 12.34, "angles": [45, 120]}                       (frame)
+    or plain numbers, the timestamp first:
+        12.34 45 120
+
+    Returns:
+        ('joints', names) or ('frame', (t, angles))
+
+    Raises:
+        ValueError: If the line is neither
+    """
+    line = line.strip()
+    if line.startswith('{'):
+        message = json.loads(line)
+        if 'joints' in message:
+            return 'joints', list(message['joints'])
+        return 'frame', (float(message['t']), [float(angle) for angle in message['angles']])
+
+    numbers = [float(value) for value in line.split()]
+    if len(numbers) < 2:
+        raise ValueError("A frame needs a timestamp and at least one angle")
+    return 'frame', (numbers[0], numbers[1:])
+
+
+class JointStream:
+    def __init__(self, puppet_controller, delay=0.05):
+        """
+        Drive the puppet from a live stream of joint frames
+
+        The stream's joint layout is resolved to servo channels once, when
+        the stream opens or sends a "joints" header; frames are then plain
+        lists of angles in that order.
+
+        Args:
+            puppet_controller: PuppetController to drive
+            delay: Jitter buffer playout delay in seconds
+        """
+        self.puppet = puppet_controller
+        self.servo_controller = puppet_controller.servo_controller
+        self.buffer = JitterBuffer(delay)
+        self.closed = False
+        self.set_layout(None)
+
+    def set_layout(self, joints):
+        """
+        Map the stream's joints to servo channels
+
+        Args:
+            joints: List of "arm.joint" names in frame order (None = every
+                    joint of every arm, in arm config order). An arm with
+                    link lengths may instead be given by "arm.hand_x" and
+                    "arm.hand_y" columns; its joints are solved from the
+                    hand position every tick (see PuppetArm.hand_pose()).
+
+        Raises:
+            ValueError: If a joint does not exist or an arm cannot take
+                        hand positions
+        """
+        if joints is None:
+            joints = self.puppet.joint_names()
+
+        columns = []
+        hand_columns = {}
+        for column, name in enumerate(joints):
+            arm_name, _, joint = name.partition('.')
+            if joint in HAND_COLUMNS:
+                hand_columns.setdefault(arm_name, {})[joint] = column
+            else:
+                columns.append(column)
+
+        # (x column, y column, kinematics, channel of each solved joint)
+        hands = []
+        for arm_name, found in hand_columns.items():
+            arm = self.puppet.get_arm(arm_name)
+            kinematics = arm.kinematics if arm is not None else None
+            if kinematics is None or len(found) < 2:
+                raise ValueError(f"'{arm_name}' needs link lengths and both hand columns")
+            # Load the lookup grid now rather than on the first tick
+            kinematics.load()
+            hands.append((found['hand_x'], found['hand_y'], kinematics,
+                          [arm.config[joint] for joint in kinematics.joints]))
+
+        self.channels = self.puppet.joint_channels([joints[column] for column in columns])
+        self.columns = columns
+        self.hands = hands
+        self.joints = joints
+        self.buffer.frames.clear()
+        logger.info("Streaming %d joints: %s", len(joints), ', '.join(joints))
+
+    def feed(self, data, now=None):
+        """Handle received text: one or more lines of the stream"""
+        if now is None:
+            now = time.monotonic()
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                kind, value = parse_frame(line)
+                if kind == 'joints':
+                    self.set_layout(value)
+                    continue
+                t, angles = value
+                if len(angles) != len(self.joints):
+                    raise ValueError(f"Expected {len(self.joints)} angles, got {len(angles)}")
+            except (ValueError, KeyError, TypeError) as e:
+                METRICS.inc('puppet_stream_frames_dropped_total', reason='invalid')
+                logger.debug("Dropped stream line %r: %s", line, e)
+                continue
+
+            if self.buffer.push(t, angles, now):
+                METRICS.inc('puppet_stream_frames_total')
+            else:
+                METRICS.inc('puppet_stream_frames_dropped_total', reason='late')
+
+    async def play(self):
+        """
+        Play the buffered frames on the control loop until the stream closes
+
+        Returns:
+            LoopStats with the timing of the run
+        """
+        def tick(t):
+            now = time.monotonic()
+            # Checked before sampling, so the newest frame is still written
+            drained = self.closed and self.buffer.drained(now)
+            angles = self.buffer.sample(now)
+            if angles is not None:
+                frame = {}
+                for channel, column in zip(self.channels, self.columns):
+                    angle = angles[column]
+                    if not math.isnan(angle):
+                        frame[channel] = min(180.0, max(0.0, angle))
+                for x_column, y_column, kinematics, channels in self.hands:
+                    # An unreachable position leaves the arm where it is
+                    solved = kinematics.lookup(angles[x_column], angles[y_column])
+                    if solved is not None:
+                        frame.update(zip(channels, solved))
+                self.servo_controller.write_frame(frame)
+            if drained:
+                return False
+
+        return await self.servo_controller.loop.run_async(tick, math.inf)
+
+    async def read_pipe(self, path=None):
+        """
+        Feed the stream from stdin or a named pipe until it closes
+
+        Args:
+            path: Named pipe to read (created if missing); None reads stdin
+        """
+        loop = asyncio.get_running_loop()
+        if path is None:
+            pipe = open(os.dup(0), 'rb')
+        else:
+            if not os.path.exists(path):
+                os.mkfifo(path)
+            # Opening a FIFO blocks until a writer connects
+            pipe = await loop.run_in_executor(None, open, path, 'rb')
+
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.feed(line.decode(errors='replace'))
+        finally:
+            transport.close()
+            self.closed = True
+
+    async def read_udp(self, host='0.0.0.0', port=9999):
+        """Feed the stream from UDP datagrams until cancelled"""
+        stream = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, address):
+                stream.feed(data.decode(errors='replace'))
+
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(Protocol, local_addr=(host, port))
+        logger.info("Listening for joint frames on udp://%s:%d", host, port)
+        try:
+            await asyncio.Future()
+        finally:
+            transport.close()
+            self.closed = True
+
+    async def run(self, source):
+        """
+        Open a source and play it until it closes
+
+        Args:
+            source: '-' for stdin, 'udp:PORT' or 'udp:HOST:PORT', or the
+                    path of a named pipe
+
+        Returns:
+            LoopStats with the timing of the run
+        """
+        if source == '-':
+            reading = self.read_pipe()
+        elif source.startswith('udp:'):
+            address = source[4:].rsplit(':', 1)
+            if len(address) == 1:
+                reading = self.read_udp(port=int(address[0]))
+            else:
+                reading = self.read_udp(address[0], int(address[1]))
+        else:
+            reading = self.read_pipe(source)
+
+        reader = asyncio.ensure_future(reading)
+        try:
+            return await self.play()
+        finally:
+            reader.cancel()
+            logger.info("Stream closed: %d frames, %d late, %d underruns",
+                        self.buffer.received, self.buffer.late, self.buffer.underruns)
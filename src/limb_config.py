@@ -0,0 +1,134 @@
+"""
+Limb Configuration
+Maps limb joints to (PCA9685 board, channel) pairs across several boards and I2C buses
+"""
+
+import json
+
+from pca9685_bus import NUM_CHANNELS
+
+DEFAULT_ADDRESS = 0x40
+
+
+def parse_address(value):
+    """Parse an I2C address given as a number or a string such as "0x41" """
+    if isinstance(value, str):
+        return int(value, 0)
+    return int(value)
+
+
+class BoardConfig:
+    def __init__(self, address=DEFAULT_ADDRESS, bus=None):
+        """
+        One PCA9685 board
+
+        Args:
+            address: I2C address of the board (0x40-0x7F)
+            bus: I2C bus number, e.g. 1 for /dev/i2c-1 (None = the default
+                 bus). Boards on different buses are written in parallel.
+        """
+        self.address = address
+        self.bus = bus
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a board from a config dictionary such as {"address": "0x41", "bus": 3}"""
+        return cls(parse_address(config.get('address', DEFAULT_ADDRESS)), config.get('bus'))
+
+    def __repr__(self):
+        bus = 'default' if self.bus is None else self.bus
+        return f"BoardConfig(address={self.address:#04x}, bus={bus})"
+
+
+def resolve_limbs(limbs, boards=None):
+    """
+    Turn limb definitions with (board, channel) joints into flat servo channels
+
+    The servo controller numbers channels across all boards: board i's
+    channel c is channel i * 16 + c.
+
+    Args:
+        limbs: Dictionary mapping limb name to its joints. A joint is a
+            channel on the first board, or a dictionary with a "channel" and
+            optionally a "board" plus the limits and calibration keys of
+            parse_joint_config(), e.g.
+                {"board": "legs", "channel": 2, "max_velocity": 180}
+            The board is a name from `boards`, or an I2C address such as
+            "0x41" (a board at that address on the default bus is added if
+            none is defined).
+        boards: Dictionary mapping board name to BoardConfig or its config
+                dictionary (default: one board at 0x40)
+
+    Returns:
+        (list of BoardConfig, limbs with every joint's channel made flat)
+
+    Raises:
+        ValueError: If a joint's board or channel does not exist
+    """
+    names = []
+    board_list = []
+    for name, board in (boards or {'main': BoardConfig()}).items():
+        if isinstance(board, dict):
+            board = BoardConfig.from_config(board)
+        names.append(name)
+        board_list.append(board)
+
+    def board_index(reference):
+        if reference in names:
+            return names.index(reference)
+        try:
+            address = parse_address(reference)
+        except (TypeError, ValueError):
+            raise ValueError(f"Unknown board '{reference}'") from None
+        matches = [i for i, board in enumerate(board_list) if board.address == address]
+        if len(matches) > 1:
+            raise ValueError(f"Board address {address:#04x} is on several buses; "
+                             "refer to the board by name")
+        if matches:
+            return matches[0]
+        names.append(None)
+        board_list.append(BoardConfig(address))
+        return len(board_list) - 1
+
+    resolved = {}
+    for limb_name, joints in limbs.items():
+        resolved[limb_name] = {}
+        for joint, joint_config in joints.items():
+            if isinstance(joint_config, dict):
+                index = board_index(joint_config['board']) if 'board' in joint_config else 0
+                channel = joint_config['channel']
+            else:
+                index, channel = 0, joint_config
+            if not 0 <= channel < NUM_CHANNELS:
+                raise ValueError(f"Channel {channel} of {limb_name}.{joint} is not 0-15")
+
+            flat = index * NUM_CHANNELS + channel
+            if isinstance(joint_config, dict):
+                joint_config = dict(joint_config, channel=flat)
+                joint_config.pop('board', None)
+            else:
+                joint_config = flat
+            resolved[limb_name][joint] = joint_config
+
+    return board_list, resolved
+
+
+def load_limb_config(path):
+    """
+    Load a limb file
+
+    The file holds optional "boards" and the "limbs" (see resolve_limbs()):
+        {
+          "boards": {"upper": {"address": "0x40"}, "legs": {"address": "0x40", "bus": 3}},
+          "limbs": {
+            "left_arm": {"shoulder": 0, "elbow": 1},
+            "left_leg": {"hip": {"board": "legs", "channel": 0}}
+          }
+        }
+
+    Returns:
+        (list of BoardConfig, limbs with flat channels)
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return resolve_limbs(data['limbs'], data.get('boards'))
@@ -0,0 +1,171 @@
+"""
+Lookahead Blending
+Runs consecutive sequence steps as one continuous path, starting each move
+before the previous one has come to a stop
+"""
+
+import logging
+
+from motion_profiles import plan_move
+
+logger = logging.getLogger(__name__)
+
+# Bisection steps when searching for a blend point
+BLEND_SEARCH_STEPS = 30
+
+
+class BlendedSequence:
+    def __init__(self, blend_tolerance=5.0):
+        """
+        Initialize an empty blended sequence
+
+        Args:
+            blend_tolerance: How close in degrees every joint must be to a
+                             step's pose before the move to the next pose
+                             starts (0 = only blend once the move has ended)
+        """
+        self.blend_tolerance = blend_tolerance
+        self.steps = []
+        self.origin = {}
+        self.segments = []
+        self.end = 0.0
+        self._base = {}
+        self._index = 0
+
+    def add_step(self, frame, step):
+        """
+        Add a step
+
+        Args:
+            frame: Dictionary mapping servo channel to target angle
+            step: Step dictionary with speed or profile, duration and hold:
+                speed: Movement speed in degrees per 50 ms (optional)
+                profile: 'trapezoidal' or 'minimum_jerk' (optional, replaces speed)
+                duration: Longest the move may take in seconds, as in a
+                          fixed slot; only held in full when the step sets
+                          "hold": true or its move is instant
+                hold: Come to a full stop and hold the pose until `duration`
+                      seconds after the move started
+        """
+        self.steps.append((frame, step))
+
+    @property
+    def duration(self):
+        """Length of the path in seconds (known once compiled)"""
+        return self.end
+
+    def compile(self, servo_controller):
+        """
+        Plan the path from the current servo angles
+
+        Every step becomes a segment (start, move_time, deltas, profiles).
+        The angle of a channel at time t is its origin plus the sum of each
+        started segment's delta times its profile fraction, so overlapping
+        moves add up to one smooth path that passes each pose within the
+        blend tolerance.
+        """
+        channels = {channel for frame, _ in self.steps for channel in frame}
+        self.origin = {}
+        for channel in channels:
+            angle = servo_controller.get_servo_angle(channel)
+            self.origin[channel] = 90 if angle is None else angle
+
+        self.segments = []
+        nominal = dict(self.origin)
+        t = 0.0
+        end = 0.0
+        for frame, step in self.steps:
+            target = dict(nominal)
+            target.update(frame)
+            duration = step.get('duration', 1.0)
+            move_time, profiles = plan_move(nominal, target, servo_controller.get_joint_limits,
+                                            step.get('speed'), duration, step.get('profile'))
+            deltas = {channel: target[channel] - nominal[channel]
+                      for channel in frame if target[channel] != nominal[channel]}
+            self.segments.append((t, move_time, deltas, profiles))
+            end = max(end, t + move_time)
+
+            if step.get('hold') or (deltas and move_time == 0):
+                # Full stop: an explicit hold, or an instant jump that would
+                # otherwise never be seen
+                t += max(duration, move_time)
+            else:
+                t += self._blend_time(move_time, deltas, profiles)
+            nominal = target
+
+        self.end = max(end, t)
+        self._base = dict(self.origin)
+        self._index = 0
+        logger.debug("Blended %d steps into %.2f s", len(self.steps), self.end)
+
+    def _blend_time(self, move_time, deltas, profiles):
+        """Earliest time into a move at which every joint is within the blend tolerance"""
+        def remaining(t):
+            return max(abs(delta) * (1 - profiles[channel].fraction(t))
+                       for channel, delta in deltas.items())
+
+        if not deltas or remaining(0.0) <= self.blend_tolerance:
+            return 0.0
+
+        low, high = 0.0, move_time
+        for _ in range(BLEND_SEARCH_STEPS):
+            middle = (low + high) / 2
+            if remaining(middle) <= self.blend_tolerance:
+                high = middle
+            else:
+                low = middle
+        return high
+
+    def sample(self, t):
+        """
+        Get the frame of channel angles at time t
+
+        Times must not go backwards between calls.
+        """
+        # Fold finished segments at the front into the base angles
+        while self._index < len(self.segments):
+            start, move_time, deltas, _ = self.segments[self._index]
+            if start + move_time > t:
+                break
+            for channel, delta in deltas.items():
+                self._base[channel] += delta
+            self._index += 1
+
+        frame = dict(self._base)
+        for start, _, deltas, profiles in self.segments[self._index:]:
+            if start > t:
+                break
+            elapsed = t - start
+            for channel, delta in deltas.items():
+                frame[channel] += delta * profiles[channel].fraction(elapsed)
+
+        # A fast move overtaking a slow one can briefly overshoot by up to the tolerance
+        return {channel: min(180, max(0, angle)) for channel, angle in frame.items()}
+
+    def play(self, servo_controller, start=None):
+        """
+        Play the path on the servo controller's control loop
+
+        Args:
+            servo_controller: ServoController to drive
+            start: Absolute time.monotonic() deadline to start (default: now)
+
+        Returns:
+            LoopStats with the timing of the run
+        """
+        tick = self._prepare(servo_controller)
+        return servo_controller.loop.run(tick, self.duration, start)
+
+    async def play_async(self, servo_controller, start=None):
+        """Asyncio version of play()"""
+        tick = self._prepare(servo_controller)
+        return await servo_controller.loop.run_async(tick, self.duration, start)
+
+    def _prepare(self, servo_controller):
+        """Compile the path and build the control loop tick"""
+        self.compile(servo_controller)
+
+        def tick(t):
+            servo_controller.write_frame(self.sample(t))
+
+        return tick
@@ -0,0 +1,279 @@
+"""
+Metrics and Tracing
+Counters, latency histograms and spans that show where the time goes during a show
+"""
+
+import bisect
+import contextvars
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Help text of the metrics the puppet records
+DESCRIPTIONS = {
+    'puppet_servo_writes_total': 'Servo channel writes sent to the hardware',
+    'puppet_servo_writes_suppressed_total': 'Servo channel writes dropped as unchanged',
+    'puppet_i2c_errors_total': 'Failed I2C writes',
+    'puppet_missed_deadlines_total': 'Control ticks and sequence steps that ran late',
+    'puppet_pose_latency_seconds': 'Time from a pose starting until it completed',
+    'puppet_step_latency_seconds': 'Time from a sequence step starting until its motion finished',
+    'puppet_span_duration_seconds': 'Duration of traced spans',
+    'puppet_commands_total': 'Commands received by the command server',
+    'puppet_command_ack_seconds': 'Time from receiving a command to acknowledging it',
+    'puppet_emergency_stops_total': 'Emergency stops that froze the servos',
+    'puppet_power_limited_moves_total': 'Moves staggered or slowed to stay in the power budget',
+    'puppet_servo_releases_total': 'Idle servos whose PWM was released',
+    'puppet_commands_preempted_total': 'Queued or running commands cancelled by another command',
+    'puppet_stream_frames_total': 'Joint frames received from a stream',
+    'puppet_stream_frames_dropped_total': 'Joint frames dropped as invalid or late',
+}
+
+# Span of the code that is running now (follows threads and asyncio tasks)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Cumulative-bucket histogram of observed values
+
+        Args:
+            buckets: Sorted upper bounds of the buckets (an overflow bucket is added)
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record one value"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Span:
+    def __init__(self, metrics, name, attributes, parent):
+        """
+        A timed region of work, such as one sequence or one step
+
+        Use as a context manager; spans opened inside it become its children.
+        """
+        self.metrics = metrics
+        self.name = name
+        self.attributes = attributes
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = next(metrics._span_ids)
+        self.start = None
+        self.end = None
+        self._token = None
+
+    @property
+    def duration(self):
+        """Length of the span in seconds (None while it is open)"""
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def set_attribute(self, key, value):
+        """Attach a value to the span"""
+        self.attributes[key] = value
+
+    def as_dict(self):
+        """Get the span as a plain dictionary"""
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration': self.duration,
+            'attributes': self.attributes,
+        }
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end = time.monotonic()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.metrics._finish_span(self)
+        return False
+
+
+class _NullSpan:
+    """Span returned while metrics are disabled; does nothing"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    def __init__(self, enabled=True, span_history=1000):
+        """
+        Registry of counters, histograms and finished spans
+
+        Args:
+            enabled: Record anything at all; when False every call returns
+                     immediately
+            span_history: Number of finished spans to keep in `spans`
+        """
+        self.enabled = enabled
+        # (name, sorted label items) -> value / Histogram
+        self.counters = {}
+        self.histograms = {}
+        self.spans = deque(maxlen=span_history)
+        self.span_hooks = []
+        self.exporters = []
+        self._lock = threading.Lock()
+        self._span_ids = itertools.count(1)
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        key = _metric_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record a value (in seconds for latencies) in a histogram"""
+        if not self.enabled:
+            return
+        key = _metric_key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def span(self, name, **attributes):
+        """
+        Open a tracing span
+
+        Example:
+            with METRICS.span('step', pose='wave_right'):
+                ...
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes, _current_span.get())
+
+    def add_span_hook(self, callback):
+        """Call callback(span) whenever a span finishes"""
+        self.span_hooks.append(callback)
+
+    def add_exporter(self, callback):
+        """Call callback(metrics) on every export()"""
+        self.exporters.append(callback)
+
+    def export(self):
+        """Hand the current metrics to every exporter"""
+        if not self.enabled:
+            return
+        for exporter in self.exporters:
+            exporter(self)
+
+    def reset(self):
+        """Forget all recorded values and spans"""
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.spans.clear()
+
+    def _finish_span(self, span):
+        """Record a finished span and pass it to the span hooks"""
+        self.observe('puppet_span_duration_seconds', span.duration, span=span.name)
+        self.spans.append(span)
+        for hook in self.span_hooks:
+            hook(span)
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            lines = []
+            described = set()
+
+            for (name, labels), value in counters:
+                self._describe(lines, described, name, 'counter')
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for (name, labels), histogram in histograms:
+                self._describe(lines, described, name, 'histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    bucket_labels = labels + (('le', str(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return ''.join(line + '\n' for line in lines)
+
+    @staticmethod
+    def _describe(lines, described, name, metric_type):
+        """Add the HELP and TYPE lines the first time a metric appears"""
+        if name in described:
+            return
+        described.add(name)
+        if name in DESCRIPTIONS:
+            lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+
+def _metric_key(name, labels):
+    """Key of a metric in the registry: its name and sorted string labels"""
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    """Format label items as {key="value",...}"""
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class PrometheusFileExporter:
+    def __init__(self, path):
+        """
+        Exporter that writes the metrics to a text file, e.g. for the
+        node_exporter textfile collector
+
+        Args:
+            path: File to write
+        """
+        self.path = path
+
+    def __call__(self, metrics):
+        # Write then rename so a scraper never reads a partial file
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(metrics.to_prometheus())
+        os.replace(temp_path, self.path)
+
+
+# Registry shared by the whole puppet
+METRICS = Metrics()
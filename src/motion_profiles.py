@@ -0,0 +1,196 @@
+"""
+Motion Profiles
+Velocity- and acceleration-limited trajectories in physical units (deg/s, deg/s²)
+"""
+
+import math
+
+# `speed` values are degrees per step of this length (the original 50 ms step)
+SPEED_STEP_TIME = 0.05
+
+# Peak velocity and acceleration of a minimum-jerk move, as multiples of
+# distance / duration and distance / duration²
+MIN_JERK_PEAK_VELOCITY = 1.875
+MIN_JERK_PEAK_ACCELERATION = 10 / math.sqrt(3)
+
+
+class JointLimits:
+    def __init__(self, max_velocity=240.0, max_acceleration=1200.0):
+        """
+        Physical limits of a joint
+
+        Args:
+            max_velocity: Maximum speed in degrees per second
+            max_acceleration: Maximum acceleration in degrees per second²
+        """
+        self.max_velocity = max_velocity
+        self.max_acceleration = max_acceleration
+
+    @classmethod
+    def from_config(cls, config):
+        """Build limits from a joint config dictionary, using defaults for missing keys"""
+        defaults = cls()
+        return cls(config.get('max_velocity', defaults.max_velocity),
+                   config.get('max_acceleration', defaults.max_acceleration))
+
+
+class LinearProfile:
+    """Constant velocity from start to end (the original `speed` ramp)"""
+
+    def __init__(self, duration):
+        self.duration = duration
+
+    def fraction(self, t):
+        """Fraction of the distance covered at time t"""
+        if t >= self.duration:
+            return 1.0
+        return t / self.duration
+
+
+class TrapezoidalProfile:
+    def __init__(self, distance, duration, max_acceleration):
+        """
+        Accelerate, cruise, decelerate: cover `distance` in exactly `duration`
+
+        Uses full acceleration and the lowest cruise velocity that still
+        arrives in time. `duration` must be at least min_duration().
+
+        Args:
+            distance: Absolute distance to travel in degrees
+            duration: Length of the move in seconds
+            max_acceleration: Acceleration in degrees per second²
+        """
+        self.distance = distance
+        self.duration = duration
+        if distance == 0 or duration == 0:
+            self.velocity = 0.0
+            self.ramp_time = 0.0
+            return
+
+        a = max_acceleration
+        # Solve distance = v * (duration - v / a) for the cruise velocity v
+        discriminant = max(0.0, (a * duration) ** 2 - 4 * a * distance)
+        self.velocity = (a * duration - math.sqrt(discriminant)) / 2
+        self.ramp_time = self.velocity / a
+
+    @staticmethod
+    def min_duration(distance, limits):
+        """Fastest time to cover `distance` within the joint limits"""
+        v = limits.max_velocity
+        a = limits.max_acceleration
+        if distance <= v * v / a:
+            # Never reaches full speed: triangular profile
+            return 2 * math.sqrt(distance / a)
+        return distance / v + v / a
+
+    def fraction(self, t):
+        """Fraction of the distance covered at time t"""
+        if t >= self.duration or self.distance == 0:
+            return 1.0
+        if t <= 0:
+            return 0.0
+
+        v = self.velocity
+        ramp = self.ramp_time
+        if t < ramp:
+            covered = 0.5 * v / ramp * t * t
+        elif t <= self.duration - ramp:
+            covered = v * (t - ramp / 2)
+        else:
+            remaining = self.duration - t
+            covered = self.distance - 0.5 * v / ramp * remaining * remaining
+        return covered / self.distance
+
+
+class MinimumJerkProfile:
+    """Smooth 5th-order polynomial with zero velocity and acceleration at both ends"""
+
+    def __init__(self, distance, duration):
+        self.distance = distance
+        self.duration = duration
+
+    @staticmethod
+    def min_duration(distance, limits):
+        """Fastest time to cover `distance` within the joint limits"""
+        return max(MIN_JERK_PEAK_VELOCITY * distance / limits.max_velocity,
+                   math.sqrt(MIN_JERK_PEAK_ACCELERATION * distance / limits.max_acceleration))
+
+    def fraction(self, t):
+        """Fraction of the distance covered at time t"""
+        if t >= self.duration:
+            return 1.0
+        if t <= 0:
+            return 0.0
+        tau = t / self.duration
+        return tau ** 3 * (10 - 15 * tau + 6 * tau * tau)
+
+
+PROFILES = {
+    'trapezoidal': TrapezoidalProfile,
+    'minimum_jerk': MinimumJerkProfile,
+}
+
+
+def plan_synchronized(moves, profile='trapezoidal'):
+    """
+    Plan the fastest synchronized move that keeps every joint within its limits
+
+    Every joint gets its own profile stretched to the duration of the
+    slowest joint, so all joints start and finish together.
+
+    Args:
+        moves: Dictionary mapping channel to (distance, JointLimits)
+        profile: 'trapezoidal' or 'minimum_jerk'
+
+    Returns:
+        (duration, profiles) where profiles maps channel to a profile object
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown motion profile '{profile}'")
+    profile_class = PROFILES[profile]
+
+    duration = max((profile_class.min_duration(abs(distance), limits)
+                    for distance, limits in moves.values()), default=0.0)
+
+    profiles = {}
+    for channel, (distance, limits) in moves.items():
+        if profile_class is TrapezoidalProfile:
+            profiles[channel] = TrapezoidalProfile(abs(distance), duration, limits.max_acceleration)
+        else:
+            profiles[channel] = MinimumJerkProfile(abs(distance), duration)
+    return duration, profiles
+
+
+def plan_move(origin, frame, limits_for, speed=None, max_duration=None, profile=None):
+    """
+    Work out how each channel moves from `origin` to `frame`
+
+    Args:
+        origin: Dictionary mapping channel to its starting angle
+        frame: Dictionary mapping channel to its target angle
+        limits_for: Callable returning the JointLimits of a channel
+        speed: Degrees per 50 ms for the channel with the longest travel
+               (if None, and no profile, the move is instant)
+        max_duration: Longest a `speed` move may take; it is sped up to fit
+        profile: 'trapezoidal' or 'minimum_jerk' for the fastest move within
+                 the joint limits (replaces speed, ignores max_duration)
+
+    Returns:
+        (duration, profiles) where profiles maps channel to an object whose
+        fraction(t) gives the share of the distance covered at time t
+    """
+    if profile is not None:
+        return plan_synchronized({
+            channel: (frame[channel] - origin[channel], limits_for(channel))
+            for channel in frame
+        }, profile)
+
+    distance = max((abs(frame[ch] - origin[ch]) for ch in frame), default=0)
+    if speed is None or speed <= 0 or distance == 0:
+        duration = 0.0
+    else:
+        duration = distance / speed * SPEED_STEP_TIME
+        if max_duration is not None:
+            duration = min(duration, max_duration)
+    linear = LinearProfile(duration)
+    return duration, {channel: linear for channel in frame}
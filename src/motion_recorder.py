@@ -0,0 +1,165 @@
+"""
+Motion Recording
+Captures every commanded frame and reduces it to error-bounded keyframes
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+from timeline import linear_track_steps
+
+logger = logging.getLogger(__name__)
+
+# Default largest angle error in degrees a simplified recording may have
+DEFAULT_TOLERANCE = 0.5
+
+
+def simplify(times, angles, tolerance):
+    """
+    Pick the keyframes of one channel's curve with Ramer-Douglas-Peucker
+
+    The error of a dropped sample is its angle's distance from the line
+    between the kept keyframes around it, at the same time, so playing the
+    keyframes back with linear interpolation is never off by more than
+    `tolerance` degrees at any recorded moment.
+
+    Args:
+        times: Array of sample times, ascending
+        angles: Array of angles at those times
+        tolerance: Largest angle error in degrees
+
+    Returns:
+        Array of the indices to keep, first and last included
+    """
+    count = len(times)
+    if count <= 2:
+        return np.arange(count)
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    spans = [(0, count - 1)]
+    while spans:
+        first, last = spans.pop()
+        if last - first < 2:
+            continue
+        inner = slice(first + 1, last)
+        slope = (angles[last] - angles[first]) / (times[last] - times[first])
+        line = angles[first] + slope * (times[inner] - times[first])
+        errors = np.abs(angles[inner] - line)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            spans.append((first, split))
+            spans.append((split, last))
+    return np.flatnonzero(keep)
+
+
+class MotionRecorder:
+    def __init__(self, puppet_controller):
+        """
+        Initialize a recorder for a puppet
+
+        Every frame written to the servo controller is captured, whatever
+        wrote it: poses, sequences, interactive jogging or a joint stream.
+
+        Args:
+            puppet_controller: PuppetController to record
+        """
+        self.puppet = puppet_controller
+        self.servo_controller = puppet_controller.servo_controller
+        # Channel -> ([times], [angles]) captured since start()
+        self.samples = {}
+        self.started = None
+        self.recording = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start capturing frames, discarding any earlier recording"""
+        with self._lock:
+            self.samples = {}
+            self.started = time.monotonic()
+        if not self.recording:
+            self.servo_controller.add_frame_listener(self._capture)
+            self.recording = True
+        logger.info("Recording")
+
+    def stop(self):
+        """Stop capturing frames"""
+        if self.recording:
+            self.servo_controller.remove_frame_listener(self._capture)
+            self.recording = False
+
+    @property
+    def sample_count(self):
+        """Number of channel angles captured"""
+        return sum(len(times) for times, _ in self.samples.values())
+
+    def _capture(self, frame, now):
+        """Frame listener: store each channel's angle"""
+        t = now - self.started
+        with self._lock:
+            for channel, angle in frame.items():
+                if angle is None:
+                    continue
+                times, angles = self.samples.setdefault(channel, ([], []))
+                if times and times[-1] == t:
+                    angles[-1] = angle
+                else:
+                    times.append(t)
+                    angles.append(angle)
+
+    def keyframes(self, tolerance=DEFAULT_TOLERANCE):
+        """
+        Simplify every channel's curve
+
+        Returns:
+            Dictionary mapping channel to (times, angles) arrays of its keyframes
+        """
+        with self._lock:
+            samples = {channel: (np.array(times), np.array(angles))
+                       for channel, (times, angles) in self.samples.items()}
+
+        keyframes = {}
+        for channel, (times, angles) in samples.items():
+            keep = simplify(times, angles, tolerance)
+            keyframes[channel] = (times[keep], angles[keep])
+        return keyframes
+
+    def to_sequence(self, tolerance=DEFAULT_TOLERANCE, description='Recorded motion'):
+        """
+        Build a sequence for movement_sequences.json from the recording
+
+        Each arm gets a track whose steps are its joints' keyframes, so the
+        sequence replays the recording within `tolerance` degrees. Time
+        starts at the first captured frame.
+
+        Returns:
+            Sequence dictionary with "description" and "tracks"
+        """
+        keyframes = self.keyframes(tolerance)
+        if not keyframes:
+            return {'description': description, 'tracks': {}}
+        offset = min(times[0] for times, _ in keyframes.values())
+
+        tracks = {}
+        for arm_name, arm in self.puppet.arms.items():
+            joints = [(joint, channel) for joint, channel in arm.config.items()
+                      if channel in keyframes]
+            if not joints:
+                continue
+            times = np.unique(np.concatenate([keyframes[channel][0] for _, channel in joints]))
+            # Interpolating a joint between its own keyframes adds no error
+            columns = {joint: np.interp(times, *keyframes[channel]).tolist()
+                       for joint, channel in joints}
+            poses = [{joint: columns[joint][i] for joint, _ in joints}
+                     for i in range(len(times))]
+            tracks[arm_name] = linear_track_steps((times - offset).tolist(), poses)
+
+        kept = sum(len(times) for times, _ in keyframes.values())
+        logger.info("Reduced %d samples to %d keyframes (within %.2f degrees)",
+                    self.sample_count, kept, tolerance)
+        return {'description': description, 'tracks': tracks}
@@ -0,0 +1,181 @@
+"""
+Register-level PCA9685 access
+Writes whole frames of servo pulses in a single auto-increment I2C block transfer
+"""
+
+import time
+
+# PCA9685 registers
+MODE1 = 0x00
+LED0_ON_L = 0x06
+PRESCALE = 0xFE
+
+# MODE1 bits
+MODE1_RESTART = 0x80
+MODE1_AI = 0x20
+MODE1_SLEEP = 0x10
+MODE1_ALLCALL = 0x01
+
+# Bit 12 of an OFF count switches the output fully off
+FULL_OFF = 0x1000
+
+NUM_CHANNELS = 16
+REFERENCE_CLOCK = 25000000
+
+# Marker for a channel this driver has not written yet
+UNKNOWN = object()
+
+
+def prescale_for(frequency):
+    """Get the PRESCALE register value for a PWM frequency"""
+    return round(REFERENCE_CLOCK / (4096 * frequency)) - 1
+
+
+def actual_frequency(frequency):
+    """
+    Get the PWM frequency the PCA9685 really produces when asked for `frequency`
+
+    The prescaler is an integer, so the real frequency differs slightly.
+    """
+    return REFERENCE_CLOCK / (4096 * (prescale_for(frequency) + 1))
+
+
+def pulse_to_count(pulse_us, frequency):
+    """Convert a pulse width in microseconds to a 12-bit OFF count"""
+    count = round(pulse_us * frequency * 4096 / 1000000)
+    return max(0, min(4095, count))
+
+
+class PCA9685Bus:
+    """I2C bus backend for a real PCA9685 board"""
+
+    def __init__(self, i2c=None, address=0x40):
+        """
+        Open the PCA9685 on the I2C bus
+
+        Args:
+            i2c: busio.I2C instance (if None, uses the board's default I2C bus)
+            address: I2C address of the PCA9685
+        """
+        from adafruit_bus_device.i2c_device import I2CDevice
+
+        if i2c is None:
+            import board
+            i2c = board.I2C()
+        self.device = I2CDevice(i2c, address)
+
+    def write_registers(self, register, data):
+        """Write consecutive bytes starting at a register in one transaction"""
+        with self.device as i2c:
+            i2c.write(bytes([register]) + bytes(data))
+
+    def read_register(self, register):
+        """Read a single register"""
+        result = bytearray(1)
+        with self.device as i2c:
+            i2c.write_then_readinto(bytes([register]), result)
+        return result[0]
+
+
+class FakePCA9685:
+    """In-memory PCA9685 register file for testing without hardware"""
+
+    def __init__(self):
+        self.registers = bytearray(256)
+        # Power-on defaults: oscillator asleep, all outputs fully off
+        self.registers[MODE1] = MODE1_SLEEP | MODE1_ALLCALL
+        self.registers[PRESCALE] = 0x1E
+        for channel in range(NUM_CHANNELS):
+            self.registers[LED0_ON_L + 4 * channel + 3] = FULL_OFF >> 8
+        self.transactions = 0
+        self.bytes_written = 0
+
+    def write_registers(self, register, data):
+        """Write consecutive bytes, honouring the MODE1 auto-increment bit"""
+        self.transactions += 1
+        for offset, value in enumerate(data):
+            if self.registers[MODE1] & MODE1_AI:
+                target = (register + offset) & 0xFF
+            else:
+                target = register
+            self.registers[target] = value
+            self.bytes_written += 1
+
+    def read_register(self, register):
+        """Read a single register"""
+        self.transactions += 1
+        return self.registers[register]
+
+    def channel_counts(self, channel):
+        """Get the (on, off) counts currently programmed for a channel"""
+        base = LED0_ON_L + 4 * channel
+        on = self.registers[base] | (self.registers[base + 1] << 8)
+        off = self.registers[base + 2] | (self.registers[base + 3] << 8)
+        return on, off
+
+
+class PCA9685:
+    """PCA9685 driver that writes channel pulses as whole frames"""
+
+    def __init__(self, bus, frequency=50):
+        """
+        Initialize the driver
+
+        Args:
+            bus: Bus backend with write_registers() and read_register()
+            frequency: PWM frequency in Hz (50 Hz for standard servos)
+        """
+        self.bus = bus
+        self.prescale = prescale_for(frequency)
+        self.frequency = actual_frequency(frequency)
+        # Last OFF count written to each channel (None = fully off); a
+        # channel never written may hold a servo set up before we started
+        self.counts = [UNKNOWN] * NUM_CHANNELS
+
+    def configure(self):
+        """Program the PWM frequency and enable register auto-increment"""
+        old_mode = self.bus.read_register(MODE1) & ~MODE1_RESTART
+        self.bus.write_registers(MODE1, [old_mode | MODE1_SLEEP])
+        self.bus.write_registers(PRESCALE, [self.prescale])
+        awake = (old_mode & ~MODE1_SLEEP) | MODE1_AI
+        self.bus.write_registers(MODE1, [awake])
+        time.sleep(0.0005)  # Oscillator needs 500us to stabilise
+        self.bus.write_registers(MODE1, [awake | MODE1_RESTART])
+
+    def write_channels(self, counts):
+        """
+        Write OFF counts for several channels in as few block transfers as possible
+
+        A block spans the lowest to the highest channel given; channels in
+        between that are not in `counts` are rewritten with their last value.
+        Channels never written split the block instead, since they may hold
+        a servo positioned before this driver started (e.g. a fast-start
+        restore), so one transfer is made per run of known channels.
+
+        Args:
+            counts: Dictionary mapping channel to OFF count (None = fully off)
+        """
+        if not counts:
+            return
+
+        for channel, count in counts.items():
+            self.counts[channel] = count
+
+        # Runs of consecutive channels with known counts
+        runs = []
+        for channel in range(min(counts), max(counts) + 1):
+            if self.counts[channel] is UNKNOWN:
+                continue
+            if runs and runs[-1][-1] == channel - 1:
+                runs[-1].append(channel)
+            else:
+                runs.append([channel])
+
+        for run in runs:
+            data = bytearray()
+            for channel in run:
+                count = self.counts[channel]
+                off = FULL_OFF if count is None else count
+                # Every pulse starts at count 0 and ends at the OFF count
+                data += bytes([0, 0, off & 0xFF, off >> 8])
+            self.bus.write_registers(LED0_ON_L + 4 * run[0], data)
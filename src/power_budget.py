@@ -0,0 +1,190 @@
+"""
+Power Budget Scheduling
+Staggers and slows simultaneous moves so the estimated servo current stays under the supply's budget
+"""
+
+import logging
+
+from motion_profiles import LinearProfile
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Slow-down factors tried between no slow-down and slowing every move enough
+# to run them all at once
+SLOWDOWN_CANDIDATES = 8
+# Bisection steps when searching for that largest slow-down
+SLOWDOWN_SEARCH_STEPS = 10
+
+
+class ScheduledProfile:
+    def __init__(self, profile, delay=0.0, stretch=1.0):
+        """
+        A channel's motion profile started late and slowed down
+
+        Args:
+            profile: Planned profile with fraction(t)
+            delay: Seconds to wait before the move starts
+            stretch: Factor to slow the move by (1 = as planned)
+        """
+        self.profile = profile
+        self.delay = delay
+        self.stretch = stretch
+
+    def fraction(self, t):
+        """Fraction of the distance covered at time t"""
+        if t <= self.delay:
+            return 0.0
+        return self.profile.fraction((t - self.delay) / self.stretch)
+
+
+class PowerBudget:
+    def __init__(self, budget, rate, calibration_for, channels):
+        """
+        Initialize the scheduler
+
+        Args:
+            budget: Current in amps the servo supply can deliver without
+                    browning out
+            rate: Control loop rate in Hz; current is estimated per tick
+            calibration_for: Callable returning a channel's ServoCalibration
+            channels: Powered servo channels (all of them draw holding current)
+        """
+        self.budget = budget
+        self.period = 1.0 / rate
+        self.calibration_for = calibration_for
+        self.channels = list(channels)
+
+    def idle_current(self):
+        """Estimated current in amps with every servo holding still"""
+        return sum(self.calibration_for(channel).hold_current for channel in self.channels)
+
+    def schedule(self, origin, frame, duration, profiles):
+        """
+        Fit a planned synchronized move under the budget
+
+        Every moving servo is estimated to draw its holding current plus a
+        share of its moving current that grows with its velocity (see
+        ServoCalibration.current()). An instant move is taken to turn at the
+        servo's slew rate. If the estimated total stays under the budget the
+        plan is returned unchanged. Otherwise a set of slow-down factors is
+        tried; for each, the moves are started in order of their peak
+        current, each as early as the budget allows, and the plan that
+        finishes first is kept. This covers everything from slowing all
+        moves just enough to run them together to running them one after
+        another at full speed.
+
+        Args:
+            origin: Dictionary mapping channel to its starting angle
+            frame: Dictionary mapping channel to its target angle
+            duration: Planned length of the move in seconds
+            profiles: Dictionary mapping channel to its planned profile
+
+        Returns:
+            (duration, profiles) to use instead
+        """
+        moves = {}
+        for channel, target in frame.items():
+            distance = abs(target - origin[channel])
+            if distance == 0:
+                continue
+            profile = profiles[channel]
+            length = duration
+            if duration == 0:
+                # The servo turns at its own slew rate
+                length = distance / self.calibration_for(channel).slew_rate
+                profile = LinearProfile(length)
+            moves[channel] = (distance, profile, length)
+
+        available = self.budget - self.idle_current()
+        if not moves or self._peak(moves, 1.0) <= available:
+            return duration, profiles
+        if available <= 0:
+            logger.warning("Holding current alone exceeds the %.2f A power budget", self.budget)
+            return duration, profiles
+
+        # Slowest slow-down needed: every move at once
+        low, high = 1.0, 2.0
+        while self._peak(moves, high) > available:
+            high *= 2
+        for _ in range(SLOWDOWN_SEARCH_STEPS):
+            middle = (low + high) / 2
+            if self._peak(moves, middle) > available:
+                low = middle
+            else:
+                high = middle
+
+        best = None
+        for i in range(SLOWDOWN_CANDIDATES + 1):
+            stretch = 1.0 + (high - 1.0) * i / SLOWDOWN_CANDIDATES
+            plan = self._stagger(moves, stretch, available)
+            if plan is not None and (best is None or plan[0] < best[0]):
+                best = plan
+
+        end, delays, stretch = best
+        scheduled = dict(profiles)
+        for channel, (_, profile, _) in moves.items():
+            scheduled[channel] = ScheduledProfile(profile, delays[channel], stretch)
+
+        METRICS.inc('puppet_power_limited_moves_total')
+        logger.debug("Power budget: move takes %.2f s instead of %.2f s (slowed %.2fx)",
+                     end, duration, stretch)
+        return end, scheduled
+
+    def _currents(self, channel, distance, profile, length, stretch):
+        """Estimated current above holding of one move, per tick"""
+        # Inlined ServoCalibration.current(): this runs for every tick of
+        # every move at every slow-down tried
+        calibration = self.calibration_for(channel)
+        span = calibration.moving_current - calibration.hold_current
+        # Fraction covered in one tick -> share of the slew rate
+        scale = distance / (self.period * calibration.slew_rate)
+        step = self.period / stretch
+        ticks = max(1, int(length * stretch / self.period + 0.999999))
+        covered = [profile.fraction(k * step) for k in range(ticks + 1)]
+        covered[0] = 0.0
+        return [span * min(1.0, scale * abs(after - before))
+                for before, after in zip(covered, covered[1:])]
+
+    def _peak(self, moves, stretch):
+        """Highest total current above holding with every move started at once"""
+        total = []
+        for channel, (distance, profile, length) in moves.items():
+            currents = self._currents(channel, distance, profile, length, stretch)
+            if len(currents) > len(total):
+                total.extend([0.0] * (len(currents) - len(total)))
+            for k, current in enumerate(currents):
+                total[k] += current
+        return max(total, default=0.0)
+
+    def _stagger(self, moves, stretch, available):
+        """
+        Start each move as early as the budget allows, largest first
+
+        Returns:
+            (end time, delays by channel, stretch), or None if a single
+            move draws more than the budget at this slow-down
+        """
+        currents = {channel: self._currents(channel, *move, stretch)
+                    for channel, move in moves.items()}
+        order = sorted(currents, key=lambda channel: max(currents[channel]), reverse=True)
+
+        load = []
+        delays = {}
+        end = 0.0
+        for channel in order:
+            move_currents = currents[channel]
+            if max(move_currents) > available:
+                return None
+            start = 0
+            while any(used + current > available
+                      for used, current in zip(load[start:], move_currents)):
+                start += 1
+            finish = start + len(move_currents)
+            if finish > len(load):
+                load.extend([0.0] * (finish - len(load)))
+            for k, current in enumerate(move_currents, start):
+                load[k] += current
+            delays[channel] = start * self.period
+            end = max(end, start * self.period + moves[channel][2] * stretch)
+        return end, delays, stretch
@@ -3,11 +3,44 @@ Puppet Arm Controller
 Manages arm movements with multiple servos per arm
 """
 
-import time
+import os
+import json
+import logging
 from servo_controller import ServoController
+from timeline import Timeline
+from motion_profiles import JointLimits
+from settle_model import ServoCalibration
+from limb_config import load_limb_config, resolve_limbs
+
+logger = logging.getLogger(__name__)
+
+# Last-known servo angles, saved on exit so the next start can skip homing
+STATE_FILE = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), '..', '.cache', 'last_state.json'))
+
+def parse_joint_config(joint_config):
+    """
+    Split a joint's config entry into its channel, limits and calibration
+    
+    Args:
+        joint_config: Either a servo channel number, or a dictionary like
+            {'channel': 0, 'max_velocity': 240, 'max_acceleration': 1200,
+             'slew_rate': 250, 'settle_time': 0.05}
+            with the limits in deg/s and deg/s² and the servo's measured
+            slew rate under load (deg/s) and settle time (s), plus its
+            load class and whether it may relax when idle (see ServoCalibration)
+    
+    Returns:
+        (channel, JointLimits or None, ServoCalibration or None)
+    """
+    if isinstance(joint_config, dict):
+        return (joint_config['channel'], JointLimits.from_config(joint_config),
+                ServoCalibration.from_config(joint_config))
+    return joint_config, None, None
+
 
 class PuppetArm:
-    def __init__(self, servo_controller, arm_config):
+    def __init__(self, servo_controller, arm_config, home=True):
         """
         Initialize a puppet arm
         
@@ -19,46 +52,165 @@ class PuppetArm:
                     'elbow': 1,         # Servo channel for elbow  
                     'wrist': 2          # Servo channel for wrist (optional)
                 }
+                A joint may also be a dictionary with its channel and
+                physical limits for profiled moves and its servo calibration, e.g.
+                {'channel': 0, 'max_velocity': 240, 'max_acceleration': 1200,
+                 'slew_rate': 250, 'settle_time': 0.05}
+                Joints with a link 'length' (and optionally 'zero' and
+                'reverse', see arm_kinematics.Link) can be moved by hand
+                position with move_hand_to().
+            home: Move the arm to center position now
         """
         self.servo_controller = servo_controller
-        self.config = arm_config
-        self.current_pose = {}
+        # Joint name -> servo channel
+        self.config = {}
+        # Joint configs with link lengths, for the inverse kinematics
+        self.links = {joint: joint_config for joint, joint_config in arm_config.items()
+                      if isinstance(joint_config, dict) and 'length' in joint_config}
+        self._kinematics = None
+        for joint, joint_config in arm_config.items():
+            channel, limits, calibration = parse_joint_config(joint_config)
+            self.config[joint] = channel
+            if limits is not None:
+                servo_controller.set_joint_limits(channel, limits)
+            if calibration is not None:
+                servo_controller.set_calibration(channel, calibration)
         
         # Initialize all servos to center position
-        self.reset_to_center()
+        if home:
+            self.reset_to_center()
     
     def reset_to_center(self):
         """Reset all arm servos to center position"""
-        for joint, channel in self.config.items():
-            self.servo_controller.move_servo(channel, 90)
-            self.current_pose[joint] = 90
-        time.sleep(0.5)
+        self.servo_controller.move_frame({channel: 90 for channel in self.config.values()})
+        self.servo_controller.wait_until_settled(self.config.values())
     
-    def move_to_pose(self, pose, speed=None):
+    def move_to_pose(self, pose, speed=None, profile=None):
         """
         Move arm to a specific pose
         
+        Returns when the joints that moved are expected to have physically
+        arrived, from their calibrated slew rates (see ServoCalibration).
+        
         Args:
             pose: Dictionary with joint angles
                 Example: {'shoulder': 45, 'elbow': 120, 'wrist': 90}
             speed: Movement speed for smooth motion
+            profile: 'trapezoidal' or 'minimum_jerk' for the fastest move
+                     within the joint limits (replaces speed)
+        """
+        logger.debug("Moving to pose: %s", pose)
+        
+        frame = self.pose_to_frame(pose)
+        self.servo_controller.move_frame(frame, speed, profile=profile)
+        self.servo_controller.wait_until_settled(frame)
+    
+    async def move_to_pose_async(self, pose, speed=None, profile=None):
         """
-        print(f"Moving to pose: {pose}")
+        Asyncio version of move_to_pose()
         
+        Args:
+            pose: Dictionary with joint angles
+            speed: Movement speed for smooth motion
+            profile: Motion profile (see move_to_pose())
+        """
+        logger.debug("Moving to pose: %s", pose)
+        
+        frame = self.pose_to_frame(pose)
+        await self.servo_controller.move_frame_async(frame, speed, profile=profile)
+        await self.servo_controller.wait_until_settled_async(frame)
+    
+    def pose_to_frame(self, pose):
+        """
+        Convert a pose into a frame of servo channel targets
+        
+        Args:
+            pose: Dictionary with joint angles
+        
+        Returns:
+            Dictionary mapping servo channel to target angle
+        """
+        frame = {}
         for joint, angle in pose.items():
             if joint in self.config:
-                channel = self.config[joint]
-                self.servo_controller.move_servo(channel, angle, speed)
-                self.current_pose[joint] = angle
+                frame[self.config[joint]] = angle
             else:
-                print(f"Warning: Joint '{joint}' not found in arm configuration")
+                logger.warning("Joint '%s' not found in arm configuration", joint)
+        return frame
+    
+    @property
+    def kinematics(self):
+        """ArmKinematics of the joints with link lengths (None if there are none)"""
+        if self._kinematics is None and self.links:
+            # NumPy is only needed for hand targets, so keep it out of startup
+            from arm_kinematics import ArmKinematics
+            self._kinematics = ArmKinematics.from_arm_config(self.links)
+        return self._kinematics
+    
+    def hand_pose(self, x, y):
+        """
+        Solve the joint angles that put the hand at a position
+        
+        Uses the kinematics' cached lookup grid, so this costs microseconds
+        once the grid is loaded.
+        
+        Args:
+            x, y: Hand position in the arm's plane, from the shoulder, in
+                  the unit of the link lengths
+        
+        Returns:
+            Dictionary with joint angles
+        
+        Raises:
+            ValueError: If the arm has no link lengths or cannot reach the position
+        """
+        kinematics = self.kinematics
+        if kinematics is None:
+            raise ValueError("The arm config has no link lengths")
+        angles = kinematics.lookup(x, y)
+        if angles is None:
+            raise ValueError(f"Hand position ({x:g}, {y:g}) is out of reach")
+        return dict(zip(kinematics.joints, angles))
+    
+    def move_hand_to(self, x, y, speed=None, profile=None):
+        """
+        Move the hand to a position (see hand_pose())
         
-        # Small delay to ensure movement completes
-        time.sleep(0.5)
+        Args:
+            x, y: Hand position in the arm's plane
+            speed: Movement speed for smooth motion
+            profile: Motion profile (see move_to_pose())
+        """
+        self.move_to_pose(self.hand_pose(x, y), speed, profile)
+    
+    async def move_hand_to_async(self, x, y, speed=None, profile=None):
+        """Asyncio version of move_hand_to()"""
+        await self.move_to_pose_async(self.hand_pose(x, y), speed, profile)
+    
+    @property
+    def hand_position(self):
+        """(x, y) of the hand at the commanded angles, or None if unknown"""
+        kinematics = self.kinematics
+        pose = self.current_pose
+        if kinematics is None or any(joint not in pose for joint in kinematics.joints):
+            return None
+        x, y = kinematics.forward([pose[joint] for joint in kinematics.joints])
+        return float(x), float(y)
+    
+    @property
+    def current_pose(self):
+        """Commanded joint angles, read from the servo controller's joint state store"""
+        state = self.servo_controller.state
+        pose = {}
+        for joint, channel in self.config.items():
+            angle = state.get_angle(channel)
+            if angle is not None:
+                pose[joint] = angle
+        return pose
     
     def get_current_pose(self):
         """Get current pose of the arm"""
-        return self.current_pose.copy()
+        return self.current_pose
     
     def wave_motion(self, cycles=3, speed=5):
         """
@@ -68,37 +220,49 @@ class PuppetArm:
             cycles: Number of wave cycles
             speed: Speed of the wave motion
         """
-        print(f"Performing wave motion ({cycles} cycles)")
+        logger.info("Performing wave motion (%d cycles)", cycles)
         
         # Store original position
         original_pose = self.get_current_pose()
         
         for _ in range(cycles):
             # Wave up
-            wave_pose = {
-                'shoulder': 45,
-                'elbow': 90
-            }
-            if 'wrist' in self.config:
-                wave_pose['wrist'] = 60
-            
-            self.move_to_pose(wave_pose, speed)
-            time.sleep(0.3)
+            self.move_to_pose(self._wave_pose(60), speed)
             
             # Wave down
-            wave_pose = {
-                'shoulder': 45,
-                'elbow': 90
-            }
-            if 'wrist' in self.config:
-                wave_pose['wrist'] = 120
-            
-            self.move_to_pose(wave_pose, speed)
-            time.sleep(0.3)
+            self.move_to_pose(self._wave_pose(120), speed)
         
         # Return to original position
         self.move_to_pose(original_pose, speed)
     
+    def wave_steps(self, cycles=3, speed=5):
+        """
+        Build the waving motion as timeline track steps
+        
+        Args:
+            cycles: Number of wave cycles
+            speed: Speed of the wave motion
+        
+        Returns:
+            List of step dictionaries for Timeline.add_track()
+        """
+        steps = []
+        for _ in range(cycles):
+            steps.append({'pose': self._wave_pose(60), 'duration': 0.8, 'speed': speed})
+            steps.append({'pose': self._wave_pose(120), 'duration': 0.8, 'speed': speed})
+        steps.append({'pose': self.get_current_pose(), 'duration': 0.8, 'speed': speed})
+        return steps
+    
+    def _wave_pose(self, wrist_angle):
+        """Get the waving pose with the wrist at the given angle"""
+        wave_pose = {
+            'shoulder': 45,
+            'elbow': 90
+        }
+        if 'wrist' in self.config:
+            wave_pose['wrist'] = wrist_angle
+        return wave_pose
+    
     def raise_arm(self, speed=None):
         """Raise the arm up"""
         pose = {
@@ -123,13 +287,38 @@ class PuppetArm:
 
 
 class PuppetController:
-    def __init__(self):
-        """Initialize the main puppet controller"""
-        self.servo_controller = ServoController()
+    def __init__(self, home=True, state_file=None, restore_state=False, simulate=False,
+                 limb_file=None, power_budget=None, idle_timeout=None, block_writes=False,
+                 state_path=None):
+        """
+        Initialize the main puppet controller
+        
+        Args:
+            home: Move all arms to center position at startup
+            state_file: Path to save the last-known servo angles to (see save_state())
+            restore_state: Trust the angles saved in state_file as the current
+                           servo positions and skip homing if they exist
+            simulate: Drive a simulated ServoKit instead of the PCA9685
+            limb_file: JSON file defining the boards and limbs (see
+                       limb_config.load_limb_config()); default: two arms
+                       on channels 0-5 of one board
+            power_budget: Current in amps the servo supply can deliver;
+                          moves are staggered and slowed to stay under it
+                          (see ServoController.set_power_budget())
+            idle_timeout: Seconds a servo holds still before its PWM is
+                          released until its next move (see
+                          ServoController.set_idle_timeout())
+            block_writes: Write whole frames as PCA9685 block transfers
+                          instead of through ServoKit (see
+                          ServoController)
+            state_path: File to memory-map the live joint state to, for
+                        other processes (see JointStateStore.attach())
+        """
         self.arms = {}
+        self.state_file = state_file
         
         # Default arm configurations (you can modify these based on your wiring)
-        self.arm_configs = {
+        arm_configs = {
             'left_arm': {
                 'shoulder': 0,  # Left shoulder servo channel
                 'elbow': 1,     # Left elbow servo channel
@@ -141,26 +330,164 @@ class PuppetController:
                 'wrist': 5      # Right wrist servo channel (optional)
             }
         }
+        if limb_file is not None:
+            self.boards, self.arm_configs = load_limb_config(limb_file)
+        else:
+            self.boards, self.arm_configs = resolve_limbs(arm_configs)
+        
+        # Only the mapped channels need configuring
+        mapped_channels = [parse_joint_config(joint_config)[0]
+                           for config in self.arm_configs.values()
+                           for joint_config in config.values()]
+        self.servo_controller = ServoController(active_channels=mapped_channels,
+                                                simulate=simulate, boards=self.boards,
+                                                block_writes=block_writes,
+                                                state_path=state_path)
         
-        # Initialize arms
+        # Initialize arms, then home them all at once
         for arm_name, config in self.arm_configs.items():
-            self.arms[arm_name] = PuppetArm(self.servo_controller, config)
+            self.arms[arm_name] = PuppetArm(self.servo_controller, config, home=False)
+        # After the arms, which set each servo's calibration
+        self.servo_controller.set_power_budget(power_budget)
+        self.servo_controller.set_idle_timeout(idle_timeout)
+        
+        restored = restore_state and self.load_state()
+        if home and not restored:
+            self.reset_all_arms()
     
     def reset_all_arms(self):
         """Reset all arms to center position"""
-        print("Resetting all arms to center position")
+        logger.info("Resetting all arms to center position")
+        self.move_arms_to_poses({
+            arm_name: {joint: 90 for joint in arm.config}
+            for arm_name, arm in self.arms.items()
+        })
+    
+    async def reset_all_arms_async(self):
+        """Asyncio version of reset_all_arms()"""
+        logger.info("Resetting all arms to center position")
+        await self.move_arms_to_poses_async({
+            arm_name: {joint: 90 for joint in arm.config}
+            for arm_name, arm in self.arms.items()
+        })
+    
+    def save_state(self):
+        """Save the last commanded angle of every mapped servo to the state file"""
+        if self.state_file is None:
+            return
+        
+        angles = {}
         for arm in self.arms.values():
-            arm.reset_to_center()
+            for channel in arm.config.values():
+                angle = self.servo_controller.get_servo_angle(channel)
+                if angle is not None:
+                    angles[str(channel)] = angle
+        
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with open(self.state_file, 'w') as f:
+            json.dump({'angles': angles}, f)
+    
+    def load_state(self):
+        """
+        Trust the angles in the state file as the current servo positions
+        
+        Returns:
+            True if a saved state was loaded
+        """
+        if self.state_file is None:
+            return False
+        
+        try:
+            with open(self.state_file, 'r') as f:
+                data = json.load(f)
+            angles = {int(channel): angle for channel, angle in data['angles'].items()}
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+            return False
+        
+        self.servo_controller.restore_angles(angles)
+        logger.info("Restored last-known servo angles from %s", self.state_file)
+        return True
     
     def get_arm(self, arm_name):
         """Get a specific arm controller"""
         return self.arms.get(arm_name)
     
+    def joint_names(self):
+        """Get every joint as "arm.joint", in arm config order"""
+        return [f"{arm_name}.{joint}" for arm_name, arm in self.arms.items()
+                for joint in arm.config]
+    
+    def joint_channels(self, joints):
+        """
+        Map "arm.joint" names to servo channels
+        
+        Raises:
+            ValueError: If a joint does not exist
+        """
+        channels = []
+        for name in joints:
+            arm_name, _, joint = name.partition('.')
+            arm = self.get_arm(arm_name)
+            if arm is None or joint not in arm.config:
+                raise ValueError(f"Unknown joint '{name}'")
+            channels.append(arm.config[joint])
+        return channels
+    
+    def move_arms_to_poses(self, arm_poses, speed=None, start=None, max_duration=None,
+                           profile=None):
+        """
+        Move several arms to their poses in one synchronized motion
+        
+        Args:
+            arm_poses: Dictionary mapping arm name to joint angles
+                Example: {'left_arm': {'shoulder': 45}, 'right_arm': {'shoulder': 135}}
+            speed: Movement speed for smooth motion
+            start: Absolute time.monotonic() deadline to start the motion.
+                   Unscheduled moves return once the servos should have
+                   physically arrived; scheduled moves return as soon as the
+                   motion ends and leave any waiting to the caller's timeline.
+            max_duration: Longest the motion may take in seconds (optional)
+            profile: 'trapezoidal' or 'minimum_jerk' for the fastest move
+                     within the joint limits (replaces speed)
+        
+        Returns:
+            LoopStats with the timing of the motion
+        """
+        frame = self._arm_poses_to_frame(arm_poses)
+        stats = self.servo_controller.move_frame(frame, speed, start, max_duration, profile)
+        
+        if start is None:
+            self.servo_controller.wait_until_settled(frame)
+        return stats
+    
+    async def move_arms_to_poses_async(self, arm_poses, speed=None, start=None,
+                                       max_duration=None, profile=None):
+        """Asyncio version of move_arms_to_poses()"""
+        frame = self._arm_poses_to_frame(arm_poses)
+        stats = await self.servo_controller.move_frame_async(frame, speed, start, max_duration,
+                                                             profile)
+        
+        if start is None:
+            await self.servo_controller.wait_until_settled_async(frame)
+        return stats
+    
+    def _arm_poses_to_frame(self, arm_poses):
+        """Merge the poses of several arms into one frame of channel targets"""
+        frame = {}
+        for arm_name, pose in arm_poses.items():
+            arm = self.get_arm(arm_name)
+            if arm:
+                frame.update(arm.pose_to_frame(pose))
+            else:
+                logger.warning("Arm '%s' not found", arm_name)
+        return frame
+    
     def both_arms_wave(self, cycles=3):
         """Make both arms wave simultaneously"""
-        print("Both arms waving!")
-        # You could implement this with threading for simultaneous movement
-        # For now, we'll do them sequentially
+        logger.info("Both arms waving!")
         if 'left_arm' in self.arms and 'right_arm' in self.arms:
-            self.arms['left_arm'].wave_motion(cycles)
-            self.arms['right_arm'].wave_motion(cycles)
+            timeline = Timeline()
+            for arm_name in ('left_arm', 'right_arm'):
+                arm = self.arms[arm_name]
+                timeline.add_track(arm, arm.wave_steps(cycles))
+            return timeline.play(self.servo_controller)
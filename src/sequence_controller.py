@@ -6,7 +6,16 @@ Loads and executes predefined movement sequences
 import json
 import time
 import os
+import asyncio
+import logging
 from puppet_arm import PuppetController
+from control_loop import LoopStats
+from timeline import Timeline
+from lookahead import BlendedSequence
+from hot_reload import ChoreographyWatcher
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
 
 class SequenceController:
     def __init__(self, puppet_controller):
@@ -19,6 +28,18 @@ class SequenceController:
         self.puppet = puppet_controller
         self.poses = {}
         self.sequences = {}
+        self.poses_file = None
+        self.sequences_file = None
+        self.watcher = None
+        # MotionRecorder of start_recording()
+        self.recorder = None
+        # Blend tolerance in degrees for lookahead blending of sequence steps
+        # (None = play every step in its own fixed time slot)
+        self.blend_tolerance = None
+        # Timing statistics of the most recent execute_pose() and
+        # execute_sequence() runs
+        self.last_pose_stats = LoopStats()
+        self.last_run_stats = LoopStats()
         
         # Load poses and sequences
         self.load_poses()
@@ -26,91 +47,547 @@ class SequenceController:
     
     def load_poses(self, poses_file="poses/basic_poses.json"):
         """Load poses from JSON file"""
+        self.poses_file = poses_file
         try:
             with open(poses_file, 'r') as f:
                 data = json.load(f)
                 self.poses = data.get('poses', {})
-            print(f"Loaded {len(self.poses)} poses")
+            logger.info("Loaded %d poses", len(self.poses))
         except FileNotFoundError:
-            print(f"Poses file {poses_file} not found")
+            logger.warning("Poses file %s not found", poses_file)
         except json.JSONDecodeError:
-            print(f"Error reading poses file {poses_file}")
+            logger.error("Error reading poses file %s", poses_file)
     
     def load_sequences(self, sequences_file="sequences/movement_sequences.json"):
         """Load sequences from JSON file"""
+        self.sequences_file = sequences_file
         try:
             with open(sequences_file, 'r') as f:
                 data = json.load(f)
                 self.sequences = data.get('sequences', {})
-            print(f"Loaded {len(self.sequences)} sequences")
+            logger.info("Loaded %d sequences", len(self.sequences))
         except FileNotFoundError:
-            print(f"Sequences file {sequences_file} not found")
+            logger.warning("Sequences file %s not found", sequences_file)
         except json.JSONDecodeError:
-            print(f"Error reading sequences file {sequences_file}")
+            logger.error("Error reading sequences file %s", sequences_file)
+    
+    def watch(self, interval=0.5):
+        """
+        Hot-reload the pose and sequence files when they are edited
+        
+        Changed entries are swapped in between sequence steps and between
+        interactive commands, so choreography can be edited while a show runs.
+        
+        Args:
+            interval: Minimum seconds between checks of the files
+        """
+        self.watcher = ChoreographyWatcher(self, interval)
+        logger.info("Watching %s and %s for changes", self.poses_file, self.sequences_file)
+    
+    def check_for_changes(self):
+        """Swap in edited poses and sequences if hot reload is enabled"""
+        if self.watcher is not None:
+            self.watcher.poll()
     
-    def execute_pose(self, pose_name, speed=None):
+    def execute_pose(self, pose_name, speed=None, start=None, max_duration=None, profile=None):
         """
         Execute a single pose
         
         Args:
             pose_name: Name of the pose to execute
             speed: Movement speed (optional)
+            start: Absolute time.monotonic() deadline to start the motion (optional)
+            max_duration: Longest the motion may take in seconds (optional)
+            profile: 'trapezoidal' or 'minimum_jerk' for the fastest move
+                     within the joint limits (replaces speed)
         """
-        if pose_name not in self.poses:
-            print(f"Pose '{pose_name}' not found")
+        began = time.monotonic() if start is None else start
+        arm_poses = self._get_arm_poses(pose_name)
+        if arm_poses is None:
             return False
         
-        pose_data = self.poses[pose_name]
-        print(f"Executing pose: {pose_name} - {pose_data.get('description', '')}")
-        
-        # Move each arm to its pose
-        for arm_name, arm_pose in pose_data.items():
-            if arm_name == 'description':
-                continue
-                
-            arm = self.puppet.get_arm(arm_name)
-            if arm:
-                arm.move_to_pose(arm_pose, speed)
-            else:
-                print(f"Warning: Arm '{arm_name}' not found")
+        # Move all arms to their poses together
+        self.last_pose_stats = self.puppet.move_arms_to_poses(arm_poses, speed, start, max_duration,
+                                                              profile)
+        METRICS.observe('puppet_pose_latency_seconds', time.monotonic() - began, pose=pose_name)
+        return True
+    
+    async def execute_pose_async(self, pose_name, speed=None, start=None, max_duration=None,
+                                 profile=None):
+        """Asyncio version of execute_pose()"""
+        began = time.monotonic() if start is None else start
+        arm_poses = self._get_arm_poses(pose_name)
+        if arm_poses is None:
+            return False
         
+        self.last_pose_stats = await self.puppet.move_arms_to_poses_async(
+            arm_poses, speed, start, max_duration, profile)
+        METRICS.observe('puppet_pose_latency_seconds', time.monotonic() - began, pose=pose_name)
         return True
     
-    def execute_sequence(self, sequence_name):
+    def _get_arm_poses(self, pose_name):
+        """Look up a pose and split it into per-arm joint angles"""
+        if pose_name not in self.poses:
+            logger.warning("Pose '%s' not found", pose_name)
+            return None
+        
+        pose_data = self.poses[pose_name]
+        logger.info("Executing pose: %s - %s", pose_name, pose_data.get('description', ''))
+        
+        return {arm_name: arm_pose for arm_name, arm_pose in pose_data.items()
+                if arm_name != 'description'}
+    
+    def execute_sequence(self, sequence_name, compiled=False, blend=None):
         """
         Execute a complete movement sequence
         
+        Each step occupies exactly `duration` seconds of an absolute timeline:
+        the move starts on the step's deadline (sped up if needed to fit the
+        slot) and the remainder of the slot is held. Deadlines never shift, so
+        the sequence takes the sum of its step durations on the wall clock.
+        Timing statistics are kept in `last_run_stats`.
+        
+        A step may give a "profile" ('trapezoidal' or 'minimum_jerk') instead
+        of a "speed" for the fastest move within the joint limits. Profiled
+        moves are never sped up past the limits; a slot too short for one is
+        lengthened to fit.
+        
+        Sequences with per-arm "tracks" instead of "steps" play every track
+        at the same time and finish in the time of the longest track.
+        
+        With a blend tolerance the steps are played with lookahead blending
+        instead (see BlendedSequence): each move starts as soon as the
+        previous one is within the tolerance of its pose, and `duration` is
+        only held by steps that set "hold": true.
+        
         Args:
             sequence_name: Name of the sequence to execute
+            compiled: Play a precompiled (and disk-cached) trajectory instead
+                      of interpreting the steps during playback
+            blend: Blend tolerance in degrees (default: self.blend_tolerance)
         """
-        if sequence_name not in self.sequences:
-            print(f"Sequence '{sequence_name}' not found")
+        with METRICS.span('sequence', sequence=sequence_name, compiled=compiled):
+            completed = self._run_sequence(sequence_name, compiled, blend)
+        METRICS.export()
+        return completed
+    
+    def _run_sequence(self, sequence_name, compiled, blend):
+        """Body of execute_sequence(), inside its tracing span"""
+        steps = self._get_steps(sequence_name)
+        if steps is None:
             return False
         
-        sequence_data = self.sequences[sequence_name]
-        print(f"\\nExecuting sequence: {sequence_name}")
-        print(f"Description: {sequence_data.get('description', 'No description')}")
-        print(f"Steps: {len(sequence_data.get('steps', []))}")
+        if compiled:
+            trajectory = self.compile_sequence(sequence_name)
+            self.last_run_stats = trajectory.play(self.puppet.servo_controller)
+            return self._finish_run(sequence_name, self.last_run_stats)
         
-        steps = sequence_data.get('steps', [])
+        timeline = self._get_timeline(sequence_name)
+        if timeline is None:
+            timeline = self._get_blended(steps, blend)
+        if timeline is not None:
+            self.last_run_stats = timeline.play(self.puppet.servo_controller)
+            return self._finish_run(sequence_name, self.last_run_stats)
+        
+        loop = self.puppet.servo_controller.loop
+        stats = self._begin_run()
+        deadline = stats.start
         
         for i, step in enumerate(steps):
-            print(f"\\nStep {i+1}/{len(steps)}: {step.get('pose', 'unknown')}")
+            pose_name = step.get('pose')
+            speed = step.get('speed')
+            duration = step.get('duration', 1.0)
+            logger.info("Step %d/%d: %s", i + 1, len(steps), pose_name)
             
+            with METRICS.span('step', sequence=sequence_name, step=i + 1, pose=pose_name,
+                              deadline=deadline):
+                # Execute the pose at the start of its time slot
+                slot_end = deadline + duration
+                if self.execute_pose(pose_name, speed, start=deadline, max_duration=duration,
+                                     profile=step.get('profile')):
+                    stats.merge(self.last_pose_stats)
+                    slot_end = max(slot_end, self.last_pose_stats.end)
+                else:
+                    logger.warning("Failed to execute pose: %s", pose_name)
+                self._record_step(sequence_name, i, deadline)
+                if stats.cancelled:
+                    return self._finish_run(sequence_name, stats)
+                
+                # Hold until the end of the slot
+                deadline = slot_end
+                self.check_for_changes()
+                self._check_deadline(stats, loop.hold(deadline))
+                if loop.stopped:
+                    stats.cancelled = True
+                    return self._finish_run(sequence_name, stats)
+        
+        stats.end = deadline
+        return self._finish_run(sequence_name, stats)
+    
+    async def execute_sequence_async(self, sequence_name, compiled=False, blend=None):
+        """
+        Asyncio version of execute_sequence()
+        
+        Awaits every tick and hold instead of sleeping, so several sequences
+        and arm moves can run as tasks on one event loop. Cancelling the task
+        stops the sequence at the next control tick.
+        """
+        with METRICS.span('sequence', sequence=sequence_name, compiled=compiled):
+            completed = await self._run_sequence_async(sequence_name, compiled, blend)
+        METRICS.export()
+        return completed
+    
+    async def _run_sequence_async(self, sequence_name, compiled, blend):
+        """Body of execute_sequence_async(), inside its tracing span"""
+        steps = self._get_steps(sequence_name)
+        if steps is None:
+            return False
+        
+        if compiled:
+            trajectory = self.compile_sequence(sequence_name)
+            self.last_run_stats = await trajectory.play_async(self.puppet.servo_controller)
+            return self._finish_run(sequence_name, self.last_run_stats)
+        
+        timeline = self._get_timeline(sequence_name)
+        if timeline is None:
+            timeline = self._get_blended(steps, blend)
+        if timeline is not None:
+            self.last_run_stats = await timeline.play_async(self.puppet.servo_controller)
+            return self._finish_run(sequence_name, self.last_run_stats)
+        
+        loop = self.puppet.servo_controller.loop
+        stats = self._begin_run()
+        deadline = stats.start
+        
+        for i, step in enumerate(steps):
             pose_name = step.get('pose')
             speed = step.get('speed')
             duration = step.get('duration', 1.0)
+            logger.info("Step %d/%d: %s", i + 1, len(steps), pose_name)
             
-            # Execute the pose
-            if self.execute_pose(pose_name, speed):
-                # Wait for the specified duration
-                time.sleep(duration)
-            else:
-                print(f"Failed to execute pose: {pose_name}")
+            with METRICS.span('step', sequence=sequence_name, step=i + 1, pose=pose_name,
+                              deadline=deadline):
+                slot_end = deadline + duration
+                if await self.execute_pose_async(pose_name, speed, start=deadline,
+                                                 max_duration=duration,
+                                                 profile=step.get('profile')):
+                    stats.merge(self.last_pose_stats)
+                    slot_end = max(slot_end, self.last_pose_stats.end)
+                else:
+                    logger.warning("Failed to execute pose: %s", pose_name)
+                self._record_step(sequence_name, i, deadline)
+                if stats.cancelled:
+                    return self._finish_run(sequence_name, stats)
+                
+                deadline = slot_end
+                self.check_for_changes()
+                self._check_deadline(stats, await loop.hold_async(deadline))
+                if loop.stopped:
+                    stats.cancelled = True
+                    return self._finish_run(sequence_name, stats)
+        
+        stats.end = deadline
+        return self._finish_run(sequence_name, stats)
+    
+    def compile_sequence(self, sequence_name):
+        """
+        Compile a sequence into a dense array of per-tick channel targets
+        
+        The result is cached on disk, keyed by a hash of the poses, the
+        sequences, the arm configuration and the joint limits, so repeat
+        runs start instantly. It starts from the sequence's first pose;
+        playing it moves the servos there first.
+        
+        Args:
+            sequence_name: Name of the sequence to compile
+        
+        Returns:
+            CompiledTrajectory
+        """
+        return self._get_compiler().compile(sequence_name)
+    
+    def _get_compiler(self):
+        """Build a TrajectoryCompiler for the loaded choreography and arm configs"""
+        # NumPy is only needed here, so keep it out of startup
+        from trajectory_cache import TrajectoryCompiler
+        
+        servo_controller = self.puppet.servo_controller
+        arm_configs = {arm_name: arm.config for arm_name, arm in self.puppet.arms.items()}
+        return TrajectoryCompiler(self.poses, self.sequences, arm_configs,
+                                  servo_controller.loop.rate,
+                                  joint_limits=servo_controller.joint_limits)
+    
+    def play_show(self, path):
+        """
+        Play a binary show file (see show_file.ShowFile)
         
-        print(f"\\nSequence '{sequence_name}' completed!")
+        The file is memory-mapped and streamed into the control loop, so
+        long shows start as fast as short ones.
+        
+        Args:
+            path: Show file to play
+        
+        Returns:
+            True if the show played to the end
+        """
+        show, channels = self._open_show(path)
+        with METRICS.span('show', path=path):
+            self.last_run_stats = show.play(self.puppet.servo_controller, channels)
+        METRICS.export()
+        return not self.last_run_stats.cancelled
+    
+    async def play_show_async(self, path):
+        """Asyncio version of play_show()"""
+        show, channels = self._open_show(path)
+        with METRICS.span('show', path=path):
+            self.last_run_stats = await show.play_async(self.puppet.servo_controller, channels)
+        METRICS.export()
+        return not self.last_run_stats.cancelled
+    
+    def _open_show(self, path):
+        """Open a show file and map its joints to servo channels"""
+        from show_file import ShowFile
+        
+        show = ShowFile(path)
+        channels = self.puppet.joint_channels(show.joints)
+        logger.info("Playing show %s: %d records, %.1f s", path, len(show), show.duration)
+        return show, channels
+    
+    def export_show(self, sequence_name, path):
+        """
+        Convert a sequence into a binary show file, starting from every joint at 90
+        
+        Returns:
+            Number of records written
+        """
+        from show_file import sequence_to_show
+        
+        if sequence_name not in self.sequences:
+            raise ValueError(f"Sequence '{sequence_name}' not found")
+        return sequence_to_show(self._get_compiler(), sequence_name, path)
+    
+    def import_show(self, path, sequence_name, save=True):
+        """
+        Convert a binary show file into a sequence with per-arm tracks
+        
+        Args:
+            path: Show file to convert
+            sequence_name: Name of the new sequence
+            save: Also write it to the sequences file
+        """
+        from show_file import ShowFile, show_to_sequence
+        
+        self.sequences[sequence_name] = show_to_sequence(ShowFile(path))
+        if save:
+            self.save_sequence(sequence_name)
+        logger.info("Imported show %s as sequence '%s'", path, sequence_name)
+    
+    def save_sequence(self, sequence_name, sequences_file=None):
+        """
+        Write a sequence into a sequences file, keeping the others in it
+        
+        Args:
+            sequence_name: Loaded sequence to save
+            sequences_file: File to write (default: the loaded sequences file);
+                            created if missing
+        """
+        if sequences_file is None:
+            sequences_file = self.sequences_file
+        try:
+            with open(sequences_file, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        data.setdefault('sequences', {})[sequence_name] = self.sequences[sequence_name]
+        
+        # Write then rename so the hot-reload watcher never reads a partial file
+        temp_path = sequences_file + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, sequences_file)
+    
+    def start_recording(self):
+        """
+        Record every frame the servos are commanded from now on
+        
+        Poses, sequences, jogging, streams and served commands are all
+        captured. Finish with save_recording().
+        """
+        # NumPy is only needed for recording, so keep it out of startup
+        from motion_recorder import MotionRecorder
+        
+        if self.recorder is None:
+            self.recorder = MotionRecorder(self.puppet)
+        self.recorder.start()
+    
+    def save_recording(self, sequence_name, tolerance=None, sequences_file=None):
+        """
+        Stop recording and save the keyframe-reduced motion as a sequence
+        
+        Args:
+            sequence_name: Name of the new sequence
+            tolerance: Largest angle error in degrees the saved keyframes may
+                       have (default: motion_recorder.DEFAULT_TOLERANCE)
+            sequences_file: File to write (default: the loaded sequences file)
+        
+        Returns:
+            The new sequence dictionary
+        """
+        from motion_recorder import DEFAULT_TOLERANCE
+        
+        if self.recorder is None:
+            raise ValueError("Not recording")
+        self.recorder.stop()
+        if tolerance is None:
+            tolerance = DEFAULT_TOLERANCE
+        self.sequences[sequence_name] = self.recorder.to_sequence(
+            tolerance, f"Recorded motion (within {tolerance:g} degrees)")
+        self.save_sequence(sequence_name, sequences_file)
+        return self.sequences[sequence_name]
+    
+    def jog(self, joint_name, degrees, speed=3):
+        """
+        Move one joint by a relative angle
+        
+        Args:
+            joint_name: Joint as "arm.joint"
+            degrees: Angle to add (negative to subtract)
+            speed: Movement speed in degrees per 50 ms
+        """
+        channel, = self.puppet.joint_channels([joint_name])
+        servo_controller = self.puppet.servo_controller
+        angle = servo_controller.get_servo_angle(channel)
+        target = min(180, max(0, (90 if angle is None else angle) + degrees))
+        servo_controller.move_frame({channel: target}, speed)
+    
+    def start_sequence(self, sequence_name, compiled=False, blend=None):
+        """
+        Start a sequence as a cancellable task on the running event loop
+        
+        Args:
+            sequence_name: Name of the sequence to execute
+            compiled: Play the precompiled trajectory (see compile_sequence())
+            blend: Blend tolerance in degrees (see execute_sequence())
+        
+        Returns:
+            asyncio.Task running execute_sequence_async()
+        """
+        return asyncio.ensure_future(
+            self.execute_sequence_async(sequence_name, compiled, blend))
+    
+    def start_pose(self, pose_name, speed=None):
+        """
+        Start a pose as a cancellable task on the running event loop
+        
+        Returns:
+            asyncio.Task running execute_pose_async()
+        """
+        return asyncio.ensure_future(self.execute_pose_async(pose_name, speed))
+    
+    def _get_steps(self, sequence_name):
+        """Look up the steps of a sequence and print its summary"""
+        self.check_for_changes()
+        if sequence_name not in self.sequences:
+            logger.warning("Sequence '%s' not found", sequence_name)
+            return None
+        
+        sequence_data = self.sequences[sequence_name]
+        logger.info("Executing sequence: %s", sequence_name)
+        logger.info("Description: %s", sequence_data.get('description', 'No description'))
+        if 'tracks' in sequence_data:
+            logger.info("Tracks: %s", ', '.join(sequence_data['tracks']))
+        else:
+            logger.info("Steps: %d", len(sequence_data.get('steps', [])))
+        
+        return sequence_data.get('steps', [])
+    
+    def _get_timeline(self, sequence_name):
+        """
+        Build a Timeline for a sequence with per-arm tracks
+        
+        Each track step's "pose" is either a pose name, of which only this
+        arm's joints are used, or a dictionary of joint angles.
+        
+        Returns:
+            Timeline, or None if the sequence has no tracks
+        """
+        tracks = self.sequences[sequence_name].get('tracks')
+        if tracks is None:
+            return None
+        
+        timeline = Timeline()
+        for arm_name, track_steps in tracks.items():
+            arm = self.puppet.get_arm(arm_name)
+            if arm is None:
+                logger.warning("Arm '%s' not found", arm_name)
+                continue
+            
+            steps = []
+            for step in track_steps:
+                pose = step.get('pose', {})
+                if isinstance(pose, str):
+                    if pose not in self.poses:
+                        logger.warning("Pose '%s' not found", pose)
+                    pose = self.poses.get(pose, {}).get(arm_name, {})
+                steps.append(dict(step, pose=pose))
+            timeline.add_track(arm, steps)
+        
+        return timeline
+    
+    def _get_blended(self, steps, blend):
+        """
+        Build a BlendedSequence for a step-based sequence
+        
+        Returns:
+            BlendedSequence, or None if blending is off
+        """
+        if blend is None:
+            blend = self.blend_tolerance
+        if blend is None:
+            return None
+        
+        blended = BlendedSequence(blend)
+        for step in steps:
+            pose_name = step.get('pose')
+            if pose_name not in self.poses:
+                logger.warning("Pose '%s' not found", pose_name)
+                continue
+            
+            frame = {}
+            for arm_name, arm_pose in self.poses[pose_name].items():
+                arm = self.puppet.get_arm(arm_name)
+                if arm is not None:
+                    frame.update(arm.pose_to_frame(arm_pose))
+            blended.add_step(frame, step)
+        return blended
+    
+    def _begin_run(self):
+        """Start the timing statistics for a sequence run"""
+        stats = LoopStats()
+        stats.start = time.monotonic()
+        self.last_run_stats = stats
+        return stats
+    
+    def _finish_run(self, sequence_name, stats):
+        """Log how a sequence run ended and return whether it completed"""
+        if stats.cancelled:
+            logger.info("Sequence '%s' stopped", sequence_name)
+            return False
+        logger.info("Sequence '%s' completed!", sequence_name)
         return True
     
+    def _check_deadline(self, stats, lateness):
+        """Count a step whose hold ended later than one control period"""
+        if lateness > self.puppet.servo_controller.loop.period:
+            # Running late; later deadlines stay fixed and absorb the delay
+            stats.overruns += 1
+            METRICS.inc('puppet_missed_deadlines_total', kind='step')
+    
+    def _record_step(self, sequence_name, index, deadline):
+        """Record how long a step took from its deadline until its motion finished"""
+        METRICS.observe('puppet_step_latency_seconds', time.monotonic() - deadline,
+                        sequence=sequence_name, step=index + 1)
+    
     def list_poses(self):
         """List all available poses"""
         print("\\nAvailable poses:")
@@ -123,8 +600,12 @@ class SequenceController:
         print("\\nAvailable sequences:")
         for seq_name, seq_data in self.sequences.items():
             description = seq_data.get('description', 'No description')
-            steps = len(seq_data.get('steps', []))
-            print(f"  - {seq_name}: {description} ({steps} steps)")
+            if 'tracks' in seq_data:
+                tracks = len(seq_data['tracks'])
+                print(f"  - {seq_name}: {description} ({tracks} tracks)")
+            else:
+                steps = len(seq_data.get('steps', []))
+                print(f"  - {seq_name}: {description} ({steps} steps)")
     
     def create_custom_pose(self, pose_name, left_arm_angles, right_arm_angles, description="Custom pose"):
         """
@@ -143,7 +624,7 @@ class SequenceController:
         }
         
         self.poses[pose_name] = new_pose
-        print(f"Created custom pose: {pose_name}")
+        logger.info("Created custom pose: %s", pose_name)
     
     def demo_all_poses(self, delay=2.0):
         """
@@ -152,14 +633,30 @@ class SequenceController:
         Args:
             delay: Delay between poses in seconds
         """
-        print("\\nDemonstrating all poses...")
+        logger.info("Demonstrating all poses...")
+        loop = self.puppet.servo_controller.loop
         for pose_name in self.poses.keys():
             self.execute_pose(pose_name)
-            time.sleep(delay)
+            loop.hold(time.monotonic() + delay)
+            if loop.stopped:
+                return
         
         # Return to rest position
         self.execute_pose('rest')
     
+    async def demo_all_poses_async(self, delay=2.0):
+        """Asyncio version of demo_all_poses()"""
+        logger.info("Demonstrating all poses...")
+        loop = self.puppet.servo_controller.loop
+        for pose_name in self.poses.keys():
+            await self.execute_pose_async(pose_name)
+            await loop.hold_async(time.monotonic() + delay)
+            if loop.stopped:
+                return
+        
+        # Return to rest position
+        await self.execute_pose_async('rest')
+    
     def interactive_mode(self):
         """
         Interactive mode for testing poses and sequences
@@ -172,11 +669,16 @@ class SequenceController:
         print("  list sequences  - List all sequences")
         print("  demo poses      - Demo all poses")
         print("  reset           - Reset to center position")
+        print("  jog <arm>.<joint> <degrees> - Nudge one joint")
+        print("  hand <arm> <x> <y> - Move a hand to a position (needs link lengths)")
+        print("  record          - Start recording every movement")
+        print("  save <name> [tolerance] - Save the recording as a sequence")
         print("  quit            - Exit interactive mode")
         
         while True:
             try:
                 command = input("\\n> ").strip().lower()
+                self.check_for_changes()
                 
                 if command == 'quit':
                     break
@@ -194,6 +696,25 @@ class SequenceController:
                 elif command.startswith('seq '):
                     seq_name = command[4:].strip()
                     self.execute_sequence(seq_name)
+                elif command.startswith('jog '):
+                    joint_name, degrees = command[4:].split()
+                    self.jog(joint_name, float(degrees))
+                elif command.startswith('hand '):
+                    arm_name, x, y = command[5:].split()
+                    arm = self.puppet.get_arm(arm_name)
+                    if arm is None:
+                        print(f"Unknown arm '{arm_name}'")
+                    else:
+                        arm.move_hand_to(float(x), float(y), speed=3)
+                elif command == 'record':
+                    self.start_recording()
+                    print("Recording... 'save <name>' when done")
+                elif command.startswith('save '):
+                    words = command[5:].split()
+                    tolerance = float(words[1]) if len(words) > 1 else None
+                    sequence = self.save_recording(words[0], tolerance)
+                    steps = sum(len(track) for track in sequence['tracks'].values())
+                    print(f"Saved sequence '{words[0]}' ({steps} steps) to {self.sequences_file}")
                 else:
                     print("Unknown command. Type 'quit' to exit.")
                     
@@ -5,26 +5,190 @@ Handles individual servo movements and calibration
 
 import time
 import json
-from adafruit_servokit import ServoKit
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pca9685_bus import PCA9685, PCA9685Bus, actual_frequency, pulse_to_count
+from control_loop import ControlLoop
+from joint_state import JointStateStore
+from write_coalescer import WriteCoalescer
+from motion_profiles import JointLimits, plan_move
+from metrics import METRICS
+from settle_model import SettleModel
+from limb_config import BoardConfig
+from power_budget import PowerBudget
+
+logger = logging.getLogger(__name__)
 
 class ServoController:
-    def __init__(self, channels=16, min_pulse=500, max_pulse=2500):
+    def __init__(self, channels=16, min_pulse=500, max_pulse=2500, bus=None, frequency=50,
+                 rate=50, active_channels=None, state_path=None, simulate=False, boards=None,
+                 io_thread=True, block_writes=False):
         """
         Initialize the PCA9685 servo controller
         
+        Channels are numbered across all boards: channel c of board i is
+        channel i * `channels` + c.
+        
         Args:
-            channels: Number of servo channels (default 16 for PCA9685)
+            channels: Number of servo channels per board (default 16 for PCA9685)
             min_pulse: Minimum pulse width in microseconds
             max_pulse: Maximum pulse width in microseconds
+            bus: PCA9685 bus backend (PCA9685Bus or FakePCA9685), or a list
+                 with one per board. When given, frames are written as single
+                 I2C block transfers instead of going through ServoKit one
+                 channel at a time.
+            frequency: PWM frequency in Hz
+            rate: Control loop update rate in Hz for smooth movements
+            active_channels: Channels that have servos wired (default: all).
+                             Only these are configured at startup.
+            state_path: File to memory-map the joint state store to, so other
+                        processes can read live servo state (optional)
+            simulate: Use a simulated ServoKit that records every register
+                      write instead of real hardware (see sim_servokit)
+            boards: List of BoardConfig for each PCA9685 (default: one board
+                    at 0x40 on the default I2C bus). Each I2C bus gets its own
+                    writer thread, so boards on different buses are written
+                    in parallel.
+            io_thread: Write to the hardware from one I/O thread owned by
+                       the controller (see write_frame()). False writes from
+                       whichever thread calls write_frame().
+            block_writes: Without `bus`, open a PCA9685Bus for every board
+                          (a SimulatedPCA9685 when simulating) and write
+                          block transfers instead of going through ServoKit
         """
-        self.kit = ServoKit(channels=channels)
-        self.channels = channels
+        if boards is None:
+            boards = [BoardConfig()]
+        self.boards = boards
+        self.board_channels = channels
+        self.channels = channels * len(boards)
         self.min_pulse = min_pulse
         self.max_pulse = max_pulse
+        self.pwm_frequency = frequency
+        self._count_frequency = actual_frequency(frequency)
+        if active_channels is None:
+            active_channels = range(self.channels)
+        self.active_channels = sorted(active_channels)
+        self.simulate = simulate
+        if bus is None and block_writes:
+            bus = self._open_buses()
+        # Commanded angle, target and velocity of every channel
+        self.state = JointStateStore(self.channels, state_path)
+        self.loop = ControlLoop(rate)
+        # Drops writes that would leave the PWM registers unchanged. Block
+        # writes send the counts computed here; ServoKit turns angles into
+        # duty cycles with its own truncation, so through it only repeats
+        # of the same angle are dropped
+        if bus is not None:
+            self.coalescer = WriteCoalescer(self.channels, self.angle_to_count)
+        else:
+            self.coalescer = WriteCoalescer(self.channels, lambda angle: angle)
+        # Per-channel velocity/acceleration limits for profiled moves
+        self.joint_limits = {}
+        self.default_limits = JointLimits()
+        # Where each servo horn really is, from its calibrated slew rate
+        self.settle = SettleModel(self.state)
+        # Keeps the estimated supply current of moves in budget (see set_power_budget())
+        self.power = None
+        # Seconds a servo holds still before its PWM is released (see set_idle_timeout())
+        self.idle_timeout = None
+        # Channels released while idle; they keep their last commanded angle
+        self.released = set()
+        self._kits = None
+        self._configured = set()
+        # Writer thread of each I2C bus after the first, created on first use
+        self._writers = {}
+        
+        # Double-buffered frames for the I/O thread: producers merge into the
+        # back buffer, the I/O thread swaps it with the front and writes that
+        self.io_thread = io_thread
+        self._back = {}
+        self._front = {}
+        self._frames = threading.Condition()
+        self._io = None
+        self._io_busy = False
+        self._closing = False
+        # Called with (frame, time.monotonic()) for every frame written
+        self._frame_listeners = []
+        
+        if bus is not None:
+            buses = bus if isinstance(bus, (list, tuple)) else [bus]
+            if len(buses) != len(boards):
+                raise ValueError(f"Got {len(buses)} bus backends for {len(boards)} boards")
+            self.pcas = [PCA9685(backend, frequency) for backend in buses]
+            for pca in self.pcas:
+                pca.configure()
+            self.pca = self.pcas[0]
+        else:
+            self.pcas = None
+            self.pca = None
+    
+    @property
+    def kits(self):
+        """
+        ServoKit driver of every board, imported and initialized on first use
+        
+        Deferring this keeps startup free of hardware work until the first
+        servo write. Returns None in block-write mode.
+        """
+        if self._kits is None and self.pca is None:
+            self._open_kits()
+        return self._kits
+    
+    def _open_kits(self):
+        """Create a ServoKit for every board, sharing one I2C object per bus"""
+        if self.simulate:
+            from sim_servokit import SimServoKit as ServoKit
+        else:
+            from adafruit_servokit import ServoKit
         
-        # Set pulse width ranges for all servos
-        for i in range(channels):
-            self.kit.servo[i].set_pulse_width_range(min_pulse, max_pulse)
+        i2c_buses = {}
+        kits = []
+        for board in self.boards:
+            if board.bus not in i2c_buses:
+                i2c_buses[board.bus] = None if self.simulate else self._open_i2c(board.bus)
+            kits.append(ServoKit(channels=self.board_channels, i2c=i2c_buses[board.bus],
+                                 address=board.address, frequency=self.pwm_frequency))
+        self._kits = kits
+        
+        # Set pulse width ranges for the wired servos only
+        for i in self.active_channels:
+            self._configure_channel(i)
+    
+    @property
+    def kit(self):
+        """ServoKit driver of the first board (None in block-write mode)"""
+        kits = self.kits
+        return kits[0] if kits else None
+    
+    def _open_buses(self):
+        """Open a block-write bus backend for every board, sharing one I2C object per bus"""
+        if self.simulate:
+            from sim_servokit import SimulatedPCA9685
+            return [SimulatedPCA9685() for _ in self.boards]
+        
+        i2c_buses = {}
+        buses = []
+        for board in self.boards:
+            if board.bus not in i2c_buses:
+                i2c_buses[board.bus] = self._open_i2c(board.bus)
+            buses.append(PCA9685Bus(i2c_buses[board.bus], board.address))
+        return buses
+    
+    @staticmethod
+    def _open_i2c(bus):
+        """Open an I2C bus by number (None = the board's default bus, opened by ServoKit)"""
+        if bus is None:
+            return None
+        from adafruit_extended_bus import ExtendedI2C
+        return ExtendedI2C(bus)
+    
+    def _configure_channel(self, channel):
+        """Set the pulse width range of a ServoKit channel"""
+        board, local = divmod(channel, self.board_channels)
+        self._kits[board].servo[local].set_pulse_width_range(self.min_pulse, self.max_pulse)
+        self._configured.add(channel)
     
     def move_servo(self, channel, angle, speed=None):
         """
@@ -37,50 +201,540 @@ class ServoController:
         """
         if 0 <= channel < self.channels and 0 <= angle <= 180:
             if speed is None:
-                self.kit.servo[channel].angle = angle
+                self.write_frame({channel: angle})
             else:
                 self._smooth_move(channel, angle, speed)
         else:
-            print(f"Invalid channel ({channel}) or angle ({angle})")
+            logger.warning("Invalid channel (%s) or angle (%s)", channel, angle)
     
-    def _smooth_move(self, channel, target_angle, speed):
+    def move_frame(self, targets, speed=None, start=None, max_duration=None, profile=None):
         """
-        Move servo smoothly to target angle
+        Move several servos together as one synchronized motion
+        
+        All channels advance in the same fixed-rate control loop, so every
+        joint starts and finishes at the same moment. The channel with the
+        longest travel moves at `speed`; the others are scaled to arrive with it.
+        
+        Args:
+            targets: Dictionary mapping servo channel to target angle
+                Example: {0: 45, 1: 120, 2: 90}
+            speed: Movement speed in degrees per 50 ms (if None, moves immediately)
+            start: Absolute time.monotonic() deadline to start the motion
+                   (default: now)
+            max_duration: Longest the motion may take in seconds; slower
+                          moves are sped up to finish in time (optional)
+            profile: 'trapezoidal' or 'minimum_jerk' to make the fastest move
+                     that stays within each joint's velocity and acceleration
+                     limits (see set_joint_limits()). Replaces `speed`, and is
+                     never sped up past the limits to meet `max_duration`.
+        
+        Returns:
+            LoopStats with the timing of the motion (stats.end is the
+            absolute time the motion was scheduled to finish)
+        """
+        tick, duration = self._plan_frame(targets, speed, max_duration, profile)
+        return self.loop.run(tick, duration, start)
+    
+    async def move_frame_async(self, targets, speed=None, start=None, max_duration=None,
+                               profile=None):
+        """
+        Asyncio version of move_frame()
+        
+        Awaits each control tick instead of sleeping, so other arms and
+        sequences sharing this controller can move at the same time.
+        Cancelling the task stops the motion where it is.
+        """
+        tick, duration = self._plan_frame(targets, speed, max_duration, profile)
+        return await self.loop.run_async(tick, duration, start)
+    
+    def set_joint_limits(self, channel, limits):
+        """
+        Set the physical limits used for profiled moves of a channel
         
         Args:
             channel: Servo channel
-            target_angle: Target angle
-            speed: Movement speed (degrees per step)
+            limits: JointLimits with max_velocity (deg/s) and max_acceleration (deg/s²)
+        """
+        self.joint_limits[channel] = limits
+    
+    def get_joint_limits(self, channel):
+        """Get the physical limits of a channel (defaults if none were set)"""
+        return self.joint_limits.get(channel, self.default_limits)
+    
+    def set_calibration(self, channel, calibration):
+        """
+        Set the measured slew rate and settle time of a channel's servo
+        
+        Args:
+            channel: Servo channel
+            calibration: ServoCalibration with slew_rate (deg/s under load)
+                         and settle_time (s)
+        """
+        self.settle.set_calibration(channel, calibration)
+    
+    def set_power_budget(self, budget):
+        """
+        Limit the estimated current all servos draw from the supply
+        
+        Moves planned by move_frame() that would exceed the budget are
+        staggered and slowed as little as possible to stay under it, using
+        each servo's calibrated slew rate and load class (see
+        ServoCalibration). Timelines, blended and compiled sequences are
+        played as planned.
+        
+        Args:
+            budget: Supply current in amps (None = no limit)
+        """
+        if budget is None:
+            self.power = None
+        else:
+            self.power = PowerBudget(budget, self.loop.rate, self.settle.get_calibration,
+                                     self.active_channels)
+    
+    def set_idle_timeout(self, timeout):
+        """
+        Release the PWM of servos that have held still for `timeout` seconds
+        
+        Holding torque heats servos and draws current between cues. Only
+        servos whose calibration allows it (ServoCalibration.relax) are
+        released. A released servo keeps its last commanded angle, so the
+        next frame that includes it re-engages it there: a move starts from
+        that angle without a jump or homing. The I/O thread releases servos
+        by itself; without it, call release_idle() periodically.
+        
+        Args:
+            timeout: Seconds without a write before release (None = never)
+        """
+        with self._frames:
+            self.idle_timeout = timeout
+            # Let the I/O thread recompute when the next servo is due
+            self._frames.notify_all()
+        if timeout is not None and self.io_thread and self._io is None:
+            self._start_io()
+    
+    def release_idle(self):
+        """
+        Release every servo that has been idle for the idle timeout now
+        
+        Returns:
+            List of the channels released
+        """
+        with self._frames:
+            due, _ = self._release_idle(time.monotonic())
+            if due and not self.io_thread:
+                self._write_now(dict.fromkeys(due))
+            self._frames.notify_all()
+        return due
+    
+    def _release_idle(self, now):
+        """
+        Mark the servos due for release as released (with self._frames held)
+        
+        With the I/O thread the releases are merged into the back buffer, so
+        a frame written later still wins.
+        
+        Returns:
+            (channels released, time.monotonic() the next one is due or None)
+        """
+        if self.idle_timeout is None:
+            return [], None
+        due = []
+        wake = None
+        for channel in self.active_channels:
+            if channel in self.released or self.state.get_angle(channel) is None:
+                continue
+            if not self.settle.get_calibration(channel).relax:
+                continue
+            # Idle from the last write, or from when the horn stops if later
+            deadline = max(self.state.updated[channel],
+                           self.settle.settled_at[channel]) + self.idle_timeout
+            if deadline <= now:
+                due.append(channel)
+            elif wake is None or deadline < wake:
+                wake = deadline
+        
+        if due:
+            self.released.update(due)
+            if self.io_thread:
+                self._back.update(dict.fromkeys(due))
+            METRICS.inc('puppet_servo_releases_total', len(due))
+            logger.debug("Released %d idle servos: %s", len(due), due)
+        return due, wake
+    
+    def wait_until_settled(self, channels=None):
+        """
+        Sleep until the given servos (default: all) should physically be at rest
+        
+        Waits only for the travel still left on the joints that moved, so a
+        1° nudge returns almost at once and a 150° swing waits for the horn.
+        
+        Returns:
+            How long we waited in seconds
+        """
+        deadline = self.settle_deadline(channels)
+        waited = deadline - time.monotonic()
+        self.loop.hold(deadline)
+        return max(0.0, waited)
+    
+    async def wait_until_settled_async(self, channels=None):
+        """Asyncio version of wait_until_settled()"""
+        deadline = self.settle_deadline(channels)
+        waited = deadline - time.monotonic()
+        await self.loop.hold_async(deadline)
+        return max(0.0, waited)
+    
+    def settle_deadline(self, channels=None):
+        """Get the time.monotonic() at which the given servos (default: all) should be at rest"""
+        if channels is None:
+            channels = self.active_channels
+        return self.settle.settle_deadline(channels)
+    
+    def _plan_frame(self, targets, speed, max_duration, profile=None):
         """
-        current_angle = self.kit.servo[channel].angle or 90  # Default to 90 if None
+        Plan a synchronized move from the current angles to a target frame
         
-        if current_angle < target_angle:
-            step = speed
+        Returns:
+            (tick, duration) where tick(t) writes the frame for time t
+        """
+        frame = {}
+        for channel, angle in targets.items():
+            if 0 <= channel < self.channels and 0 <= angle <= 180:
+                frame[channel] = angle
+            else:
+                logger.warning("Invalid channel (%s) or angle (%s)", channel, angle)
+        
+        origin = {}
+        for channel in frame:
+            current_angle = self.get_servo_angle(channel)
+            origin[channel] = 90 if current_angle is None else current_angle
+        
+        duration, profiles = plan_move(origin, frame, self.get_joint_limits,
+                                       speed, max_duration, profile)
+        if self.power is not None:
+            duration, profiles = self.power.schedule(origin, frame, duration, profiles)
+        
+        for channel, target_angle in frame.items():
+            self.state.set_target(channel, target_angle)
+        
+        def tick(t):
+            self.write_frame({
+                channel: origin[channel]
+                + (target_angle - origin[channel]) * profiles[channel].fraction(t)
+                for channel, target_angle in frame.items()
+            })
+            if t >= duration:
+                for channel in frame:
+                    self.state.stop(channel)
+        
+        return tick, duration
+    
+    def write_frame(self, frame):
+        """
+        Write a set of channel angles to the hardware
+        
+        With the I/O thread (the default) this only merges the frame into
+        the back buffer and returns; the I/O thread swaps the buffers and
+        writes the latest complete frame, so frames from several arms,
+        sequences or threads never interleave on the bus and the caller
+        never waits for I2C. Use flush() to wait until it has been written.
+        Without it the frame is written before returning.
+        
+        A servo released while idle (see set_idle_timeout()) is re-engaged
+        by the first frame that includes it.
+        
+        Channels whose PCA9685 count would not change are not written again.
+        In block-write mode the remaining channels of each board are converted
+        to 12-bit counts and sent as one auto-increment transfer to its LED
+        registers. Boards on different I2C buses are written in parallel, so
+        adding a bus does not make the frame take longer.
+        
+        Angles outside 0-180 are clamped; NaN or infinite angles and unknown
+        channels are dropped, with a warning.
+        
+        Args:
+            frame: Dictionary mapping servo channel to angle (None = disable)
+        """
+        frame = self._check_frame(frame)
+        now = time.monotonic()
+        with self._frames:
+            # Together with the write, so _release_idle() never sees a servo
+            # written but not yet marked as commanded
+            for channel, angle in frame.items():
+                # The settle model reads the previous command from the store
+                self.settle.command(channel, angle, now)
+                self.state.set_commanded(channel, angle, now)
+            self.released.difference_update(frame)
+            if self.io_thread:
+                self._back.update(frame)
+                self._frames.notify_all()
+            else:
+                self._write_now(frame)
+        if self.io_thread and self._io is None:
+            self._start_io()
+        
+        for listener in self._frame_listeners:
+            listener(frame, now)
+    
+    def _check_frame(self, frame):
+        """Clamp a frame's angles to 0-180 and drop invalid entries (see write_frame())"""
+        for channel, angle in frame.items():
+            if not (0 <= channel < self.channels and (angle is None or 0 <= angle <= 180)):
+                break
         else:
-            step = -speed
+            # The usual case: nothing to fix, so no copy
+            return frame
+        
+        checked = {}
+        for channel, angle in frame.items():
+            if not 0 <= channel < self.channels:
+                logger.warning("Invalid channel (%s)", channel)
+                continue
+            if angle is not None:
+                if not math.isfinite(angle):
+                    logger.warning("Invalid angle (%s) for channel %s", angle, channel)
+                    continue
+                if not 0 <= angle <= 180:
+                    logger.warning("Angle %s for channel %s clamped to 0-180", angle, channel)
+                    angle = min(180, max(0, angle))
+            checked[channel] = angle
+        return checked
+    
+    def add_frame_listener(self, listener):
+        """
+        Call `listener(frame, now)` for every frame passed to write_frame()
+        
+        Listeners run in the producer's thread and must be quick.
+        """
+        self._frame_listeners.append(listener)
+    
+    def remove_frame_listener(self, listener):
+        """Stop calling a listener added with add_frame_listener()"""
+        self._frame_listeners.remove(listener)
+    
+    def flush(self, timeout=None):
+        """
+        Wait until every frame passed to write_frame() has been written
+        
+        Returns:
+            False if the timeout ran out first
+        """
+        with self._frames:
+            return self._frames.wait_for(
+                lambda: self._io is None or not (self._back or self._io_busy), timeout)
+    
+    def close(self):
+        """Write the pending frame, stop the I/O thread and the bus writers"""
+        io = self._io
+        if io is not None:
+            with self._frames:
+                self._closing = True
+                self._frames.notify_all()
+            io.join()
+            self._io = None
+            self._closing = False
+        for writer in self._writers.values():
+            writer.shutdown()
+        self._writers = {}
+    
+    def _start_io(self):
+        """Start the I/O thread"""
+        with self._frames:
+            if self._io is None:
+                self._io = threading.Thread(target=self._io_loop, name='servo-io', daemon=True)
+                self._io.start()
+    
+    def _io_loop(self):
+        """Swap in the latest frame and write it, releasing idle servos, until closed"""
+        try:
+            while self._io_step():
+                pass
+        finally:
+            with self._frames:
+                # Whatever ended the thread, flush() must not wait on it and
+                # the next write_frame() starts a new one
+                self._io_busy = False
+                self._io = None
+                self._frames.notify_all()
+    
+    def _io_step(self):
+        """
+        Wait for a frame and write it
+        
+        Returns:
+            False once the controller is closing and nothing is left to write
+        """
+        with self._frames:
+            self._io_busy = False
+            self._frames.notify_all()
+            while not (self._back or self._closing):
+                due, wake = self._release_idle(time.monotonic())
+                if due:
+                    break
+                self._frames.wait(None if wake is None else wake - time.monotonic())
+            if not self._back:
+                return False
+            # Producers carry on filling the other buffer during the bus I/O
+            self._front, self._back = self._back, self._front
+            self._io_busy = True
         
-        angle = current_angle
-        while abs(angle - target_angle) > abs(step):
-            angle += step
-            self.kit.servo[channel].angle = angle
-            time.sleep(0.05)  # Small delay for smooth movement
+        try:
+            self._write_now(self._front)
+        except OSError as e:
+            logger.error("Servo write failed: %s", e)
+        except Exception:
+            # Keep the thread alive, or every later frame would wait forever
+            logger.exception("Servo write failed")
+        finally:
+            self._front.clear()
+        return True
+    
+    def _write_now(self, frame):
+        """Write a frame to the hardware from the calling thread"""
+        changed = self.coalescer.filter(frame)
+        try:
+            if changed:
+                self._write_buses(changed)
+        except Exception as e:
+            # The registers may or may not have changed; write them again next time
+            for channel in changed:
+                self.coalescer.forget(channel)
+            if isinstance(e, OSError):
+                METRICS.inc('puppet_i2c_errors_total')
+            raise
+        
+        if changed:
+            METRICS.inc('puppet_servo_writes_total', len(changed))
+        if len(changed) < len(frame):
+            METRICS.inc('puppet_servo_writes_suppressed_total', len(frame) - len(changed))
+    
+    def _write_buses(self, changed):
+        """
+        Write changed channels, one writer per I2C bus
+        
+        The first bus is written from the calling thread while the writer
+        threads of the others run; returns once every bus is done.
+        """
+        if self._kits is None and self.pca is None:
+            # Open the boards here rather than from several writer threads at once
+            self._open_kits()
+        
+        buses = {}
+        for channel in changed:
+            board = channel // self.board_channels
+            buses.setdefault(self.boards[board].bus, {}).setdefault(board, []).append(channel)
+        
+        groups = iter(buses.items())
+        _, first = next(groups)
+        futures = [self._writer(bus).submit(self._write_boards, boards, changed)
+                   for bus, boards in groups]
+        try:
+            self._write_boards(first, changed)
+        finally:
+            wait(futures)
+        for future in futures:
+            # Raises the writer's error, if any
+            future.result()
+    
+    def _writer(self, bus):
+        """Get the writer thread of an I2C bus"""
+        if bus not in self._writers:
+            self._writers[bus] = ThreadPoolExecutor(max_workers=1,
+                                                    thread_name_prefix=f'i2c-{bus}')
+        return self._writers[bus]
+    
+    def _write_boards(self, boards, changed):
+        """
+        Write changed channels to the boards of one bus
+        
+        Args:
+            boards: Dictionary mapping board index to its changed channels
+            changed: Dictionary mapping servo channel to angle
+        """
+        for board, channels in boards.items():
+            offset = board * self.board_channels
+            if self.pcas is not None:
+                # The coalescer already holds the quantized count of each channel
+                self.pcas[board].write_channels({
+                    channel - offset: self.coalescer.last_counts[channel] for channel in channels
+                })
+            else:
+                servos = self._kits[board].servo
+                for channel in channels:
+                    if channel not in self._configured:
+                        self._configure_channel(channel)
+                    servos[channel - offset].angle = changed[channel]
+    
+    def angle_to_count(self, angle):
+        """Convert an angle to the 12-bit PCA9685 OFF count it produces"""
+        pulse = self.min_pulse + (self.max_pulse - self.min_pulse) * angle / 180
+        return pulse_to_count(pulse, self._count_frequency)
+    
+    def _smooth_move(self, channel, target_angle, speed):
+        """
+        Move servo smoothly to target angle
         
-        # Final position
-        self.kit.servo[channel].angle = target_angle
+        Args:
+            channel: Servo channel
+            target_angle: Target angle
+            speed: Movement speed (degrees per step)
+        """
+        self.move_frame({channel: target_angle}, speed)
     
     def get_servo_angle(self, channel):
-        """Get current angle of a servo"""
+        """Get current angle of a servo (the last angle commanded, no bus read)"""
         if 0 <= channel < self.channels:
-            return self.kit.servo[channel].angle
+            return self.state.get_angle(channel)
         return None
     
+    def restore_angles(self, angles):
+        """
+        Trust previously saved angles as the current servo positions
+        
+        Nothing is written to the hardware; the next move starts from these
+        angles instead of homing first.
+        
+        Args:
+            angles: Dictionary mapping servo channel to angle
+        """
+        for channel, angle in angles.items():
+            if 0 <= channel < self.channels:
+                self.state.set_commanded(channel, angle)
+                self.state.set_target(channel, angle)
+                self.settle.assume_at(channel, angle)
+    
+    def freeze(self):
+        """
+        Emergency stop: hold every servo at its last commanded angle
+        
+        Stops any motion in progress on the control loop at its next tick
+        (from any thread) and makes the commanded angles the new targets.
+        Moves, holds and sequences started afterwards do nothing until
+        resume(). Nothing is written; the PCA9685 keeps driving the last
+        pulses, and a frame still waiting for the I/O thread is dropped.
+        """
+        self.loop.cancel()
+        with self._frames:
+            # Idle releases and disabled servos are not motion; keep those
+            self._back = {channel: angle for channel, angle in self._back.items()
+                          if angle is None}
+        for channel in range(self.channels):
+            angle = self.state.get_angle(channel)
+            if angle is not None:
+                self.state.set_target(channel, angle)
+                self.state.stop(channel)
+        METRICS.inc('puppet_emergency_stops_total')
+    
+    def resume(self):
+        """Allow motion again after freeze()"""
+        self.loop.resume()
+    
     def set_all_servos_to_center(self):
         """Set all servos to center position (90 degrees)"""
         for i in range(self.channels):
-            self.kit.servo[i].angle = 90
+            self.write_frame({i: 90})
             time.sleep(0.1)  # Small delay between servos
     
     def disable_servo(self, channel):
         """Disable a servo (stop sending PWM signal)"""
         if 0 <= channel < self.channels:
-            self.kit.servo[channel].angle = None
+            self.write_frame({channel: None})
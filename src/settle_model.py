@@ -0,0 +1,152 @@
+"""
+Servo Settle Model
+Estimates when each servo physically reaches its commanded angle, from calibrated slew rates
+"""
+
+import math
+import time
+
+# Travel assumed for a servo whose position is unknown (e.g. at power-on)
+UNKNOWN_TRAVEL = 180.0
+
+# Estimated supply current in amps of a servo by load class:
+# (turning at its full slew rate, holding still)
+LOAD_CLASSES = {
+    'light': (0.4, 0.02),
+    'medium': (0.8, 0.08),
+    'heavy': (1.5, 0.2),
+}
+
+
+class ServoCalibration:
+    def __init__(self, slew_rate=250.0, settle_time=0.05, load='medium', moving_current=None,
+                 hold_current=None, relax=None):
+        """
+        Measured behaviour of one servo under load
+
+        Args:
+            slew_rate: Fastest the horn really turns in degrees per second
+            settle_time: Time to stop oscillating after reaching the angle, in seconds
+            load: Load class from LOAD_CLASSES giving the current estimates
+            moving_current: Current in amps when turning at the full slew
+                            rate (overrides the load class)
+            hold_current: Current in amps when holding still (overrides the
+                          load class)
+            relax: Whether the servo may go limp when idle without its joint
+                   sagging (default: unless the load is heavy)
+        """
+        self.slew_rate = slew_rate
+        self.settle_time = settle_time
+        if load not in LOAD_CLASSES:
+            raise ValueError(f"Unknown load class '{load}'")
+        self.load = load
+        default_moving, default_hold = LOAD_CLASSES[load]
+        self.moving_current = default_moving if moving_current is None else moving_current
+        self.hold_current = default_hold if hold_current is None else hold_current
+        self.relax = load != 'heavy' if relax is None else relax
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a calibration from a joint config dictionary, using defaults for missing keys"""
+        defaults = cls()
+        return cls(config.get('slew_rate', defaults.slew_rate),
+                   config.get('settle_time', defaults.settle_time),
+                   config.get('load', defaults.load),
+                   config.get('moving_current'),
+                   config.get('hold_current'),
+                   config.get('relax'))
+
+    def current(self, velocity):
+        """
+        Estimate the supply current in amps while turning at `velocity` deg/s
+
+        Grows linearly from the holding current at rest to the moving
+        current at the full slew rate, which the servo cannot exceed.
+        """
+        share = min(1.0, abs(velocity) / self.slew_rate)
+        return self.hold_current + (self.moving_current - self.hold_current) * share
+
+
+class SettleModel:
+    def __init__(self, state):
+        """
+        Track where each servo horn is expected to be
+
+        The horn follows the commanded angle at no more than its slew rate,
+        so a fast commanded move finishes on the wire before the servo does.
+        Commanded angles are read from the joint state store, so command()
+        must see each write before the store records it.
+
+        Args:
+            state: JointStateStore holding the commanded angles
+        """
+        self.state = state
+        self.calibration = {}
+        self.default_calibration = ServoCalibration()
+        # Estimated horn angle and time of the estimate per channel
+        self.position = [math.nan] * state.channels
+        self.updated = [0.0] * state.channels
+        # time.monotonic() at which each channel is expected to be at rest
+        self.settled_at = [0.0] * state.channels
+
+    def set_calibration(self, channel, calibration):
+        """Set the ServoCalibration of a channel"""
+        self.calibration[channel] = calibration
+
+    def get_calibration(self, channel):
+        """Get the ServoCalibration of a channel (defaults if none was set)"""
+        return self.calibration.get(channel, self.default_calibration)
+
+    def command(self, channel, angle, now):
+        """
+        Record a new commanded angle, before it goes into the state store
+
+        Args:
+            channel: Servo channel
+            angle: Commanded angle (None = output disabled)
+            now: time.monotonic() of the write
+        """
+        if angle is None:
+            # A disabled servo is limp; its position is no longer known
+            self.position[channel] = math.nan
+            self.settled_at[channel] = now
+            return
+
+        calibration = self.get_calibration(channel)
+        previous = self.state.commanded[channel]
+        if math.isnan(self.position[channel]):
+            # Unknown start (e.g. power-on): assume the longest travel, after
+            # which the horn is at the commanded angle
+            start = now + UNKNOWN_TRAVEL / calibration.slew_rate
+            position = angle
+        else:
+            # Advance the horn towards the previous command since the last estimate
+            start = max(now, self.updated[channel])
+            position = self.position[channel]
+            reach = calibration.slew_rate * (start - self.updated[channel])
+            if abs(previous - position) <= reach:
+                position = previous
+            else:
+                position += math.copysign(reach, previous - position)
+
+        resting = position == angle == previous
+        self.position[channel] = position
+        self.updated[channel] = start
+        if not resting:
+            travel = abs(angle - position)
+            self.settled_at[channel] = (start + travel / calibration.slew_rate
+                                        + calibration.settle_time)
+
+    def assume_at(self, channel, angle):
+        """Trust that a servo is already at rest at an angle (also set in the state store)"""
+        self.position[channel] = angle
+        self.updated[channel] = time.monotonic()
+        self.settled_at[channel] = 0.0
+
+    def settle_deadline(self, channels):
+        """
+        Get the time.monotonic() at which all the given channels should be at rest
+
+        Returns the current time if they already are.
+        """
+        return max([time.monotonic()] + [self.settled_at[channel] for channel in channels])
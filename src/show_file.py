@@ -0,0 +1,262 @@
+"""
+Binary Show Files
+Fixed-width, memory-mapped keyframe records for long recorded performances
+"""
+
+import json
+import math
+import os
+import struct
+
+import numpy as np
+
+from timeline import linear_track_steps
+
+MAGIC = b'PSHW'
+VERSION = 1
+# Magic, format version, number of joints, length of the JSON metadata
+HEADER = struct.Struct('<4sHHI')
+# Records start on an 8-byte boundary so timestamps are aligned
+RECORD_ALIGNMENT = 8
+
+
+def record_dtype(joint_count):
+    """Get the NumPy dtype of one record: a timestamp and one angle per joint"""
+    return np.dtype([('t', '<f8'), ('angles', '<f4', (joint_count,))])
+
+
+class ShowWriter:
+    def __init__(self, path, joints, description=''):
+        """
+        Open a show file for writing
+
+        Records are appended as they come, so a show of any length is
+        written without holding it in memory. Use as a context manager.
+
+        Args:
+            path: File to write
+            joints: "arm.joint" name of each angle column
+            description: Free text stored in the header
+        """
+        self.path = path
+        self.joints = list(joints)
+        self.dtype = record_dtype(len(self.joints))
+        self.count = 0
+        self.last_time = -math.inf
+
+        meta = json.dumps({'joints': self.joints, 'description': description}).encode()
+        header = HEADER.pack(MAGIC, VERSION, len(self.joints), len(meta)) + meta
+        padding = -len(header) % RECORD_ALIGNMENT
+        self.file = open(path, 'wb')
+        self.file.write(header + b' ' * padding)
+
+    def write(self, t, angles):
+        """
+        Append one record
+
+        Args:
+            t: Time in seconds from the start of the show (must not go back)
+            angles: One angle per joint (NaN = leave the joint alone)
+        """
+        self.write_many([t], [angles])
+
+    def write_many(self, times, angles):
+        """
+        Append many records
+
+        Args:
+            times: Sequence of times in seconds, ascending
+            angles: Array-like of shape (len(times), number of joints)
+        """
+        records = np.empty(len(times), dtype=self.dtype)
+        records['t'] = times
+        records['angles'] = angles
+        if len(records):
+            if records['t'][0] < self.last_time or np.any(np.diff(records['t']) < 0):
+                raise ValueError("Record times must not go backwards")
+            self.last_time = records['t'][-1]
+        records.tofile(self.file)
+        self.count += len(records)
+
+    def close(self):
+        """Finish the file"""
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ShowFile:
+    def __init__(self, path):
+        """
+        Open a show file for playback
+
+        Only the header is read; the records are memory-mapped, so opening a
+        20-minute show takes as long as a 6-step one and pages are read
+        from disk only as playback reaches them.
+
+        Args:
+            path: Show file to open
+
+        Raises:
+            ValueError: If the file is not a show file
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path} is not a show file")
+            magic, version, joint_count, meta_length = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a show file")
+            if version != VERSION:
+                raise ValueError(f"Unsupported show file version {version}")
+            meta = json.loads(f.read(meta_length))
+
+        self.joints = meta['joints']
+        self.description = meta.get('description', '')
+        if len(self.joints) != joint_count:
+            raise ValueError(f"{path} has a corrupt header")
+
+        offset = HEADER.size + meta_length
+        offset += -offset % RECORD_ALIGNMENT
+        dtype = record_dtype(joint_count)
+        # A record cut short by an interrupted recording is ignored
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=dtype)
+        self.times = self.records['t']
+        self.angles = self.records['angles']
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        """Time of the last record in seconds"""
+        return float(self.times[-1]) if len(self.records) else 0.0
+
+    def sample(self, t):
+        """
+        Get the angles at time t, interpolated between the records around it
+
+        A binary search over the memory-mapped times touches only a few
+        pages, so this costs the same anywhere in the show.
+
+        Returns:
+            List of angles, one per joint (NaN where a joint is left alone,
+            which is every joint of a show without records)
+        """
+        if not len(self.records):
+            return [math.nan] * len(self.joints)
+        index = int(np.searchsorted(self.times, t, side='right'))
+        if index == 0:
+            return self.angles[0].tolist()
+        if index == len(self.records):
+            return self.angles[-1].tolist()
+
+        t0 = self.times[index - 1]
+        t1 = self.times[index]
+        before = self.angles[index - 1]
+        after = self.angles[index]
+        fraction = (t - t0) / (t1 - t0)
+        return (before + (after - before) * fraction).tolist()
+
+    def play(self, servo_controller, channels, start=None):
+        """
+        Stream the show to the servos on the servo controller's control loop
+
+        Args:
+            servo_controller: ServoController to drive
+            channels: Servo channel of each joint (see PuppetController.joint_channels())
+            start: Absolute time.monotonic() deadline to start (default: now)
+
+        Returns:
+            LoopStats with the timing of the run
+        """
+        return servo_controller.loop.run(
+            self._tick(servo_controller, channels), self.duration, start)
+
+    async def play_async(self, servo_controller, channels, start=None):
+        """Asyncio version of play()"""
+        return await servo_controller.loop.run_async(
+            self._tick(servo_controller, channels), self.duration, start)
+
+    def _tick(self, servo_controller, channels):
+        """Build the control loop tick that writes the angles for time t"""
+        def tick(t):
+            servo_controller.write_frame({
+                channel: angle for channel, angle in zip(channels, self.sample(t))
+                if not math.isnan(angle)
+            })
+
+        return tick
+
+
+def sequence_to_show(compiler, sequence_name, path, origin=None):
+    """
+    Convert a sequence from movement_sequences.json into a show file
+
+    Every moment where any channel has a keyframe becomes a record, so
+    playback follows the same path as the sequence.
+
+    Args:
+        compiler: TrajectoryCompiler with the poses, sequences and arm configs
+        sequence_name: Sequence to convert
+        path: Show file to write
+        origin: Dictionary mapping channel to its angle before the sequence
+                (default: every channel at 90)
+
+    Returns:
+        Number of records written
+    """
+    keyframes = compiler.keyframes(sequence_name, origin or {})
+    times = np.unique(np.concatenate([times for times, _ in keyframes.values()]))
+
+    joints = []
+    columns = []
+    for arm_name, config in compiler.arm_configs.items():
+        for joint, channel in config.items():
+            joints.append(f"{arm_name}.{joint}")
+            key_times, key_angles = keyframes[channel]
+            columns.append(np.interp(times, key_times, key_angles))
+
+    description = compiler.sequences[sequence_name].get('description', '')
+    with ShowWriter(path, joints, description) as writer:
+        writer.write_many(times, np.column_stack(columns))
+    return len(times)
+
+
+def show_to_sequence(show):
+    """
+    Convert a show file into a sequence for movement_sequences.json
+
+    Each arm gets a track with one step per record. A step's speed is set
+    so that its joints move in a straight line and arrive as the step ends,
+    matching the show's interpolation.
+
+    Args:
+        show: ShowFile to convert
+
+    Returns:
+        Sequence dictionary with "description" and "tracks"
+    """
+    arms = {}
+    for column, name in enumerate(show.joints):
+        arm_name, _, joint = name.partition('.')
+        arms.setdefault(arm_name, []).append((joint, column))
+
+    times = show.times.tolist()
+    rows = show.angles.tolist()
+    tracks = {}
+    for arm_name, joints in arms.items():
+        poses = [{joint: angles[column] for joint, column in joints
+                  if not math.isnan(angles[column])} for angles in rows]
+        tracks[arm_name] = linear_track_steps(times, poses)
+
+    return {'description': show.description, 'tracks': tracks}
@@ -0,0 +1,117 @@
+"""
+Simulated Servo Hardware
+Drop-in ServoKit / PCA9685 stand-ins that record every register write with a timestamp
+"""
+
+import time
+
+from pca9685_bus import (FakePCA9685, PCA9685, LED0_ON_L, FULL_OFF, actual_frequency,
+                         pulse_to_count)
+
+# Stop releasing the GIL this close to the end of an emulated transfer
+YIELD_MARGIN = 0.00005
+
+
+class SimulatedPCA9685(FakePCA9685):
+    def __init__(self, transaction_time=0.0, byte_time=0.0):
+        """
+        In-memory PCA9685 that logs every write and can emulate bus timing
+
+        Args:
+            transaction_time: Seconds each I2C transaction takes (address,
+                              start/stop overhead)
+            byte_time: Additional seconds per data byte (about 22.5 us at 400 kHz)
+        """
+        super().__init__()
+        self.transaction_time = transaction_time
+        self.byte_time = byte_time
+        # (time.monotonic(), register, data) for every write
+        self.log = []
+
+    def write_registers(self, register, data):
+        """Write consecutive bytes, logging the transaction"""
+        data = bytes(data)
+        self._wait(len(data))
+        self.log.append((time.monotonic(), register, data))
+        super().write_registers(register, data)
+
+    def read_register(self, register):
+        """Read a single register"""
+        self._wait(1)
+        return super().read_register(register)
+
+    def _wait(self, num_bytes):
+        """
+        Spin for the emulated bus time (sleep is too coarse for microseconds)
+
+        Until the last few microseconds each turn releases the GIL, as a
+        real I2C transfer does, so boards on other buses can be written
+        meanwhile.
+        """
+        delay = self.transaction_time + self.byte_time * num_bytes
+        if delay > 0:
+            end = time.perf_counter() + delay
+            while end - time.perf_counter() > YIELD_MARGIN:
+                time.sleep(0)
+            while time.perf_counter() < end:
+                pass
+
+    def clear_log(self):
+        """Forget the recorded writes and reset the counters"""
+        self.log = []
+        self.transactions = 0
+        self.bytes_written = 0
+
+
+class SimulatedServo:
+    def __init__(self, pca, channel, frequency):
+        """A ServoKit servo that writes its pulse to a simulated PCA9685"""
+        self._pca = pca
+        self._channel = channel
+        self._frequency = actual_frequency(frequency)
+        self._angle = None
+        self.actuation_range = 180
+        self.set_pulse_width_range()
+
+    def set_pulse_width_range(self, min_pulse=750, max_pulse=2250):
+        """Set the pulse widths for 0 and actuation_range degrees"""
+        self._min_pulse = min_pulse
+        self._max_pulse = max_pulse
+
+    @property
+    def angle(self):
+        """Last angle written (None when the output is off)"""
+        return self._angle
+
+    @angle.setter
+    def angle(self, value):
+        if value is None:
+            off = FULL_OFF
+        else:
+            if not 0 <= value <= self.actuation_range:
+                raise ValueError("Angle out of range")
+            pulse = self._min_pulse + (self._max_pulse - self._min_pulse) * value / self.actuation_range
+            off = pulse_to_count(pulse, self._frequency)
+        # ServoKit writes the channel's four LED registers in one transaction
+        self._pca.write_registers(LED0_ON_L + 4 * self._channel, [0, 0, off & 0xFF, off >> 8])
+        self._angle = value
+
+
+class SimServoKit:
+    def __init__(self, channels=16, i2c=None, address=0x40, frequency=50, pca=None):
+        """
+        Drop-in replacement for adafruit_servokit.ServoKit
+
+        Args:
+            channels: Number of servo channels
+            i2c: Ignored; every simulated board has its own register file
+            address: I2C address the board would have
+            frequency: PWM frequency in Hz
+            pca: SimulatedPCA9685 to write to (default: a new one)
+        """
+        self.address = address
+        self.pca = pca if pca is not None else SimulatedPCA9685()
+        # Like ServoKit, set the PWM frequency, which also turns on register
+        # auto-increment so each servo's four LED registers take one write
+        PCA9685(self.pca, frequency).configure()
+        self.servo = [SimulatedServo(self.pca, i, frequency) for i in range(channels)]
@@ -0,0 +1,170 @@
+"""
+Multi-track Timeline
+Plays independent per-arm choreography tracks together on one control loop
+"""
+
+from motion_profiles import SPEED_STEP_TIME, plan_move
+
+
+def linear_track_steps(times, poses):
+    """
+    Build track steps that pass through timed poses in straight lines
+
+    Each step moves to its pose over the time since the previous pose, at
+    the speed that arrives exactly as the step ends, so playback follows
+    the same piecewise-linear path. The first pose is jumped to.
+
+    Args:
+        times: Time of each pose in seconds, ascending
+        poses: Dictionary of joint angles for each time
+
+    Returns:
+        List of step dictionaries for a sequence track
+    """
+    steps = []
+    previous_time = 0.0
+    previous = None
+    for t, pose in zip(times, poses):
+        # Not rounded: that would add error on top of the keyframe reduction
+        duration = t - previous_time
+        step = {'pose': dict(pose), 'duration': duration}
+        if previous is not None and duration > 0:
+            travel = max((abs(angle - previous[joint]) for joint, angle in pose.items()
+                          if joint in previous), default=0)
+            speed = travel * SPEED_STEP_TIME / duration
+            if speed > 0:
+                step['speed'] = speed
+        steps.append(step)
+        previous_time = t
+        previous = pose
+    return steps
+
+
+class Track:
+    def __init__(self, arm, steps):
+        """
+        Initialize a track for one arm
+
+        Args:
+            arm: PuppetArm the track drives
+            steps: List of step dictionaries, each with:
+                pose: Dictionary with joint angles for this arm
+                duration: Length of the step's time slot in seconds
+                speed: Movement speed in degrees per 50 ms (optional)
+                profile: 'trapezoidal' or 'minimum_jerk' (optional, replaces speed)
+        """
+        self.arm = arm
+        self.steps = steps
+        self.segments = []
+        self._index = 0
+
+    @property
+    def duration(self):
+        """Total length of the track in seconds (known exactly once compiled)"""
+        if self.segments:
+            last_start, last_end = self.segments[-1][:2]
+            return max(last_start + self.steps[-1].get('duration', 1.0), last_end)
+        return sum(step.get('duration', 1.0) for step in self.steps)
+
+    def compile(self, servo_controller):
+        """
+        Turn the steps into timed motion segments starting from the current angles
+
+        Each segment is (start, end, origin, target, profiles) with times
+        relative to the start of the timeline, frames mapping channel to
+        angle and profiles mapping channel to its motion profile.
+        """
+        position = {}
+        for channel in self.arm.config.values():
+            angle = servo_controller.get_servo_angle(channel)
+            position[channel] = 90 if angle is None else angle
+
+        self.segments = []
+        self._index = 0
+        t = 0.0
+        for step in self.steps:
+            duration = step.get('duration', 1.0)
+            target = dict(position)
+            target.update(self.arm.pose_to_frame(step['pose']))
+
+            move_time, profiles = plan_move(position, target, servo_controller.get_joint_limits,
+                                            step.get('speed'), duration, step.get('profile'))
+            self.segments.append((t, t + move_time, position, target, profiles))
+            # Profiled moves are never sped up, so a short slot is lengthened
+            t += max(duration, move_time)
+            position = target
+
+    def sample(self, t):
+        """
+        Get the frame of channel angles at time t
+
+        Times must not go backwards between calls.
+        """
+        if not self.segments:
+            return {}
+
+        while (self._index + 1 < len(self.segments)
+               and self.segments[self._index + 1][0] <= t):
+            self._index += 1
+
+        start, end, origin, target, profiles = self.segments[self._index]
+        if t >= end:
+            return target
+        return {
+            channel: origin[channel]
+            + (target[channel] - origin[channel]) * profiles[channel].fraction(t - start)
+            for channel in target
+        }
+
+
+class Timeline:
+    def __init__(self):
+        """Initialize an empty timeline"""
+        self.tracks = []
+
+    def add_track(self, arm, steps):
+        """
+        Add a track of steps for one arm
+
+        Args:
+            arm: PuppetArm the track drives
+            steps: List of step dictionaries (see Track)
+        """
+        self.tracks.append(Track(arm, steps))
+
+    @property
+    def duration(self):
+        """Length of the timeline: the length of its longest track"""
+        return max((track.duration for track in self.tracks), default=0.0)
+
+    def play(self, servo_controller, start=None):
+        """
+        Play all tracks together on the servo controller's control loop
+
+        Args:
+            servo_controller: ServoController to drive
+            start: Absolute time.monotonic() deadline to start (default: now)
+
+        Returns:
+            LoopStats with the timing of the run
+        """
+        tick = self._prepare(servo_controller)
+        return servo_controller.loop.run(tick, self.duration, start)
+
+    async def play_async(self, servo_controller, start=None):
+        """Asyncio version of play()"""
+        tick = self._prepare(servo_controller)
+        return await servo_controller.loop.run_async(tick, self.duration, start)
+
+    def _prepare(self, servo_controller):
+        """Compile every track and build the control loop tick"""
+        for track in self.tracks:
+            track.compile(servo_controller)
+
+        def tick(t):
+            frame = {}
+            for track in self.tracks:
+                frame.update(track.sample(t))
+            servo_controller.write_frame(frame)
+
+        return tick
@@ -0,0 +1,304 @@
+"""
+Precompiled Trajectories
+Compiles sequences into dense per-tick channel target arrays, cached on disk
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from motion_profiles import JointLimits, LinearProfile, plan_move
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '.cache', 'trajectories')
+# Most trajectories kept in the cache; the least recently used go first
+CACHE_LIMIT = 64
+# Servos this close (degrees) to a trajectory's first row skip the lead-in move
+LEAD_IN_TOLERANCE = 0.01
+
+
+class CompiledTrajectory:
+    def __init__(self, channels, frames, rate):
+        """
+        A sequence compiled to one row of channel targets per control tick
+
+        Args:
+            channels: Servo channel of each column
+            frames: Array of shape (ticks, len(channels)) with target angles
+            rate: Tick rate in Hz the rows were sampled at
+        """
+        self.channels = [int(channel) for channel in channels]
+        self.frames = frames
+        self.rate = rate
+
+    @property
+    def duration(self):
+        """Length of the trajectory in seconds"""
+        return (len(self.frames) - 1) / self.rate
+
+    def play(self, servo_controller, start=None):
+        """
+        Stream the rows to the servos on the servo controller's control loop
+
+        Servos that are not at the first row are first moved there as
+        smoothly as their joint limits allow (see lead_in()).
+
+        Returns:
+            LoopStats with the timing of the run
+        """
+        frame = self.lead_in(servo_controller)
+        if frame:
+            servo_controller.move_frame(frame, profile='minimum_jerk')
+        return servo_controller.loop.run(self._tick(servo_controller), self.duration, start)
+
+    async def play_async(self, servo_controller, start=None):
+        """Asyncio version of play()"""
+        frame = self.lead_in(servo_controller)
+        if frame:
+            await servo_controller.move_frame_async(frame, profile='minimum_jerk')
+        return await servo_controller.loop.run_async(
+            self._tick(servo_controller), self.duration, start)
+
+    def lead_in(self, servo_controller):
+        """
+        Get the frame that brings the servos to the first row
+
+        Trajectories start from their sequence's first pose, not from
+        wherever the servos happen to be, so they can be cached.
+
+        Returns:
+            Dictionary mapping channel to angle for the servos not already there
+        """
+        if not len(self.frames):
+            return {}
+        frame = {}
+        for channel, angle in zip(self.channels, self.frames[0].tolist()):
+            current = servo_controller.get_servo_angle(channel)
+            if current is None or abs(current - angle) > LEAD_IN_TOLERANCE:
+                frame[channel] = angle
+        return frame
+
+    def _tick(self, servo_controller):
+        """Build the control loop tick that writes the row for time t"""
+        rows = self.frames.tolist()
+        last = len(rows) - 1
+
+        def tick(t):
+            row = rows[min(round(t * self.rate), last)]
+            servo_controller.write_frame(dict(zip(self.channels, row)))
+
+        return tick
+
+
+class TrajectoryCompiler:
+    def __init__(self, poses, sequences, arm_configs, rate=50, cache_dir=CACHE_DIR,
+                 joint_limits=None):
+        """
+        Initialize the compiler
+
+        Args:
+            poses: Pose dictionary as loaded from basic_poses.json
+            sequences: Sequence dictionary as loaded from movement_sequences.json
+            arm_configs: Dictionary mapping arm name to joint channel mapping
+            rate: Tick rate in Hz to sample the trajectories at
+            cache_dir: Directory for cached trajectories (None disables the cache)
+            joint_limits: Dictionary mapping channel to JointLimits for steps
+                          with a motion profile (missing channels use defaults)
+        """
+        self.poses = poses
+        self.sequences = sequences
+        self.arm_configs = arm_configs
+        self.rate = rate
+        self.cache_dir = cache_dir
+        self.joint_limits = joint_limits or {}
+        self.default_limits = JointLimits()
+        self.channels = sorted({channel for config in arm_configs.values()
+                                for channel in config.values()})
+
+    def cache_key(self, sequence_name):
+        """
+        Hash everything a compiled trajectory depends on
+
+        Args:
+            sequence_name: Name of the sequence
+        """
+        digest = hashlib.sha256()
+        limits = sorted((channel, limits.max_velocity, limits.max_acceleration)
+                        for channel, limits in self.joint_limits.items())
+        for part in (self.poses, self.sequences, self.arm_configs, self.rate,
+                     sequence_name, limits):
+            digest.update(json.dumps(part, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def compile(self, sequence_name):
+        """
+        Compile a sequence, using the on-disk cache when possible
+
+        The trajectory covers only the channels the sequence moves, and
+        starts with each of them at its first target, so it does not depend
+        on where the servos are; CompiledTrajectory.play() moves them there
+        first.
+
+        Args:
+            sequence_name: Name of the sequence
+
+        Returns:
+            CompiledTrajectory
+        """
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, self.cache_key(sequence_name) + '.npz')
+            if os.path.exists(path):
+                # Mark it recently used, so pruning keeps it
+                os.utime(path)
+                with np.load(path) as cached:
+                    return CompiledTrajectory(cached['channels'], cached['frames'], self.rate)
+
+        start = self.start_pose(sequence_name)
+        channels = [channel for channel in self.channels if channel in start]
+        keyframes = self.keyframes(sequence_name, start)
+        trajectory = CompiledTrajectory(
+            channels, self._interpolate(keyframes, channels), self.rate)
+
+        if path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename so a concurrent reader never sees a partial file
+            temp_path = path + '.tmp.npz'
+            np.savez(temp_path, channels=np.array(channels, dtype=int),
+                     frames=trajectory.frames)
+            os.replace(temp_path, path)
+            self._prune()
+        return trajectory
+
+    def _prune(self):
+        """Delete the least recently used trajectories past CACHE_LIMIT"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz') and not name.endswith('.tmp.npz'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except FileNotFoundError:
+                    continue
+        entries.sort(reverse=True)
+        for _, path in entries[CACHE_LIMIT:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def start_pose(self, sequence_name):
+        """
+        Get the first target of every channel a sequence moves
+
+        Returns:
+            Dictionary mapping channel to angle
+        """
+        start = {}
+        for steps in self._resolve_tracks(sequence_name):
+            for target, _ in steps:
+                for channel, angle in target.items():
+                    start.setdefault(channel, angle)
+        return start
+
+    def keyframes(self, sequence_name, origin):
+        """
+        Get the keyframes of every channel
+
+        Angles move linearly between keyframes; profiled moves are sampled
+        at every tick.
+
+        Returns:
+            Dictionary mapping channel to (times, angles) lists
+        """
+        keyframes = {channel: ([0.0], [origin.get(channel, 90)]) for channel in self.channels}
+        for steps in self._resolve_tracks(sequence_name):
+            self._add_keyframes(keyframes, steps)
+        return keyframes
+
+    def _resolve_tracks(self, sequence_name):
+        """
+        Resolve a sequence's steps to channel targets
+
+        Returns:
+            List of tracks, each a list of (channel targets, step) pairs
+        """
+        sequence_data = self.sequences[sequence_name]
+        if 'tracks' in sequence_data:
+            tracks = []
+            for arm_name, steps in sequence_data['tracks'].items():
+                config = self.arm_configs.get(arm_name, {})
+                tracks.append([(self._resolve_pose(step.get('pose', {}), arm_name, config), step)
+                               for step in steps])
+            return tracks
+
+        resolved = []
+        for step in sequence_data.get('steps', []):
+            pose = {}
+            for arm_name, config in self.arm_configs.items():
+                pose.update(self._resolve_pose(step.get('pose'), arm_name, config))
+            resolved.append((pose, step))
+        return [resolved]
+
+    def _interpolate(self, keyframes, channels):
+        """Sample the keyframes of the given channels at the tick rate"""
+        end = max(times[-1] for times, _ in keyframes.values())
+        ticks = np.arange(int(round(end * self.rate)) + 1) / self.rate
+        frames = np.empty((len(ticks), len(channels)), dtype=np.float32)
+        for column, channel in enumerate(channels):
+            times, angles = keyframes[channel]
+            frames[:, column] = np.interp(ticks, times, angles)
+        return frames
+
+    def _resolve_pose(self, pose, arm_name, config):
+        """Map a pose name or joint dictionary for one arm to channel targets"""
+        if isinstance(pose, str):
+            pose = self.poses.get(pose, {}).get(arm_name, {})
+        return {config[joint]: angle for joint, angle in (pose or {}).items() if joint in config}
+
+    def _limits_for(self, channel):
+        """Get the physical limits of a channel"""
+        return self.joint_limits.get(channel, self.default_limits)
+
+    def _add_keyframes(self, keyframes, steps):
+        """
+        Append the keyframes of a list of (channel targets, step) pairs
+
+        Each step starts a synchronized move at the beginning of its slot
+        and holds the target for the rest of it, matching
+        SequenceController.execute_sequence(). Linear moves need only their
+        end points; profiled moves are sampled at every tick.
+        """
+        channels = {channel for pose, _ in steps for channel in pose}
+        position = {channel: keyframes[channel][1][-1] for channel in channels}
+        t = 0.0
+        for target, step in steps:
+            duration = step.get('duration', 1.0)
+            move_time, profiles = plan_move(
+                {channel: position[channel] for channel in target}, target,
+                self._limits_for, step.get('speed'), duration, step.get('profile'))
+            # Instant moves still need the target strictly after the hold keyframe
+            move_time = max(move_time, 1e-6)
+            samples = np.arange(1, int(move_time * self.rate)) / self.rate
+
+            for channel, angle in target.items():
+                times, angles = keyframes[channel]
+                times.append(t)
+                angles.append(position[channel])
+                profile = profiles[channel]
+                if not isinstance(profile, LinearProfile):
+                    for sample in samples.tolist():
+                        times.append(t + sample)
+                        angles.append(position[channel]
+                                      + (angle - position[channel]) * profile.fraction(sample))
+                times.append(t + move_time)
+                angles.append(angle)
+                position[channel] = angle
+            # Profiled moves are never sped up, so a short slot is lengthened
+            t += max(duration, move_time)
+
+        for channel in channels:
+            times, angles = keyframes[channel]
+            times.append(t)
+            angles.append(position[channel])
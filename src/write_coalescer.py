@@ -0,0 +1,63 @@
+"""
+Write Coalescing
+Drops servo writes that would not change what the PCA9685 registers hold
+"""
+
+# Marker for a channel whose register contents are not known
+UNKNOWN = object()
+
+
+class WriteCoalescer:
+    def __init__(self, channels, angle_to_count):
+        """
+        Initialize the coalescer
+
+        Args:
+            channels: Number of servo channels
+            angle_to_count: Callable converting an angle to the 12-bit
+                            PCA9685 OFF count it produces; a write is
+                            dropped when this gives the same value as the
+                            last one (pass an identity function to drop
+                            only repeats of the same angle)
+        """
+        self.angle_to_count = angle_to_count
+        self.last_counts = [UNKNOWN] * channels
+        self.issued = 0
+        self.suppressed = 0
+
+    def filter(self, frame):
+        """
+        Keep only the channels whose register value would change
+
+        Args:
+            frame: Dictionary mapping servo channel to angle (None = disable)
+
+        Returns:
+            Dictionary with the channels that still need writing
+        """
+        changed = {}
+        for channel, angle in frame.items():
+            count = None if angle is None else self.angle_to_count(angle)
+            last = self.last_counts[channel]
+            if last is not UNKNOWN and last == count:
+                self.suppressed += 1
+            else:
+                self.last_counts[channel] = count
+                changed[channel] = angle
+                self.issued += 1
+        return changed
+
+    def forget(self, channel=None):
+        """
+        Forget what a channel (or every channel) holds, so the next write goes through
+
+        Use after the hardware may have been changed behind our back, e.g. a reset.
+        """
+        if channel is None:
+            self.last_counts = [UNKNOWN] * len(self.last_counts)
+        else:
+            self.last_counts[channel] = UNKNOWN
+
+    def get_stats(self):
+        """Get the issued and suppressed write counters"""
+        return {'issued': self.issued, 'suppressed': self.suppressed}
@@ -0,0 +1,64 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from arm_kinematics import ArmKinematics, Link
+
+ARM_CONFIG = {
+    'shoulder': {'channel': 0, 'length': 100},
+    'elbow': {'channel': 1, 'length': 80, 'reverse': True},
+    'wrist': {'channel': 2, 'length': 40},
+}
+
+
+def test_two_link_solution_reaches_the_target():
+    kinematics = ArmKinematics([Link('shoulder', 100), Link('elbow', 80)], cache_dir=None)
+    angles = kinematics.solve(np.array([120.0, 0.0]), np.array([50.0, 150.0]))
+    x, y = kinematics.forward(angles)
+    np.testing.assert_allclose(x, [120, 0], atol=1e-6)
+    np.testing.assert_allclose(y, [50, 150], atol=1e-6)
+    assert np.all((angles >= 0) & (angles <= 180))
+
+
+def test_out_of_reach_is_nan_or_none():
+    kinematics = ArmKinematics.from_arm_config(ARM_CONFIG, grid_size=41, cache_dir=None)
+    assert kinematics.joints == ['shoulder', 'elbow', 'wrist']
+    assert np.isnan(kinematics.solve(300.0, 0.0)).all()
+    assert kinematics.lookup(300.0, 0.0) is None
+    assert kinematics.lookup(math.nan, 0.0) is None
+
+
+def test_grid_lookup_lands_near_the_target():
+    kinematics = ArmKinematics.from_arm_config(ARM_CONFIG, grid_size=41, cache_dir=None)
+    targets = [(150.0, 20.0), (60.0, 100.0), (-40.0, 120.0), (0.0, 219.0)]
+    for x, y in targets:
+        angles = kinematics.lookup(x, y)
+        assert angles is not None
+        hand = kinematics.forward(angles)
+        assert math.dist(hand, (x, y)) < 2.0
+
+    x, y = np.array(targets).T
+    many = kinematics.lookup_many(x, y)
+    np.testing.assert_allclose(many, [kinematics.lookup(*target) for target in targets],
+                               atol=1e-3)
+
+
+def test_grid_is_cached_by_link_geometry(tmp_path):
+    cache_dir = str(tmp_path)
+    first = ArmKinematics.from_arm_config(ARM_CONFIG, grid_size=21, cache_dir=cache_dir)
+    first.load()
+    assert os.listdir(cache_dir) == [first.cache_key() + '.npz']
+
+    cached = ArmKinematics.from_arm_config(ARM_CONFIG, grid_size=21, cache_dir=cache_dir)
+    np.testing.assert_array_equal(cached.grid, first.grid)
+    longer = dict(ARM_CONFIG, wrist={'channel': 2, 'length': 50})
+    assert (ArmKinematics.from_arm_config(longer, grid_size=21).cache_key()
+            != first.cache_key())
+
+
+def test_chain_length_is_checked():
+    with pytest.raises(ValueError):
+        ArmKinematics([Link('shoulder', 100)], cache_dir=None)
+    assert ArmKinematics.from_arm_config({'shoulder': 0, 'elbow': 1}) is None
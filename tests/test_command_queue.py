@@ -0,0 +1,199 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from command_queue import CommandQueue
+from pca9685_bus import FakePCA9685
+from puppet_arm import PuppetController
+from sequence_controller import SequenceController
+from servo_controller import ServoController
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+@pytest.fixture
+def sequencer():
+    sequencer = SequenceController(PuppetController(home=False, simulate=True))
+    sequencer.load_poses(os.path.join(ROOT, 'poses', 'basic_poses.json'))
+    sequencer.load_sequences(os.path.join(ROOT, 'sequences', 'movement_sequences.json'))
+    yield sequencer
+    sequencer.puppet.servo_controller.close()
+
+
+def run_queue(sequencer, body):
+    """Run `body(queue)` with the queue's worker going in the background"""
+    async def main():
+        queue = CommandQueue(sequencer)
+        worker = asyncio.ensure_future(queue.run())
+        try:
+            return await body(queue)
+        finally:
+            worker.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await worker
+    return asyncio.run(main())
+
+
+def test_commands_run_in_priority_order(sequencer):
+    async def body(queue):
+        # All queued before the worker picks one
+        first = queue.submit('pose', 'arms_out', speed=30)
+        low = queue.submit('pose', 'rest', speed=30)
+        high = queue.submit('pose', 'thinking', priority=5, speed=30)
+        finished = []
+        for command in (first, low, high):
+            command.result.add_done_callback(lambda _, name=command.name: finished.append(name))
+        await asyncio.gather(first.result, low.result, high.result)
+        return finished
+
+    assert run_queue(sequencer, body) == ['thinking', 'arms_out', 'rest']
+
+
+def test_preempt_cancels_running_command(sequencer):
+    async def body(queue):
+        sequence = queue.submit('sequence', 'greeting')
+        await asyncio.sleep(0.2)
+        pose = queue.submit('pose', 'arms_out', mode='preempt', speed=30)
+        return await sequence.result, await pose.result
+
+    assert run_queue(sequencer, body) == ('cancelled', 'done')
+
+
+def test_preempt_waits_for_higher_priority(sequencer):
+    async def body(queue):
+        sequence = queue.submit('sequence', 'greeting', priority=5)
+        await asyncio.sleep(0.2)
+        pose = queue.submit('pose', 'arms_out', mode='preempt', speed=30)
+        await asyncio.sleep(0.2)
+        running = queue.current is sequence and not pose.result.done()
+        queue.stop()
+        return running, await sequence.result, await pose.result
+
+    assert run_queue(sequencer, body) == (True, 'cancelled', 'cancelled')
+
+
+def test_replace_drops_queued_commands(sequencer):
+    async def body(queue):
+        running = queue.submit('pose', 'arms_out', speed=30)
+        await asyncio.sleep(0.05)
+        queued = queue.submit('pose', 'rest', speed=30)
+        replacement = queue.submit('pose', 'thinking', mode='replace', speed=30)
+        return await running.result, await queued.result, await replacement.result
+
+    assert run_queue(sequencer, body) == ('done', 'cancelled', 'done')
+
+
+def test_cancelling_worker_stops_running_command(sequencer):
+    async def main():
+        queue = CommandQueue(sequencer)
+        worker = asyncio.ensure_future(queue.run())
+        sequence = queue.submit('sequence', 'greeting')
+        await asyncio.sleep(0.2)
+        worker.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await worker
+        return await sequence.result, queue.current
+
+    assert asyncio.run(main()) == ('cancelled', None)
+
+
+def test_failed_command_reports_error(sequencer):
+    async def body(queue):
+        command = queue.submit('dance', 'greeting')
+        after = queue.submit('pose', 'rest', speed=30)
+        return await command.result, command.error, await after.result
+
+    assert run_queue(sequencer, body) == ('failed', "Unknown command 'dance'", 'done')
+
+
+def freeze_after(controller, delay):
+    """Freeze the controller from another thread after `delay` seconds"""
+    timer = threading.Timer(delay, controller.freeze)
+    timer.start()
+    return timer
+
+
+@pytest.mark.parametrize('sequence, compiled, blend', [
+    ('greeting', False, None),
+    ('greeting', True, None),
+    ('greeting', False, 5.0),
+    ('asymmetric_dance', False, None),
+])
+def test_freeze_stops_sequence(sequencer, sequence, compiled, blend):
+    controller = sequencer.puppet.servo_controller
+    writes = []
+    controller.add_frame_listener(lambda frame, now: writes.append(now))
+    began = time.monotonic()
+    frozen = freeze_after(controller, 0.9)
+
+    assert not sequencer.execute_sequence(sequence, compiled, blend)
+    frozen.join()
+    assert time.monotonic() - began < 1.2
+    # Nothing written after the freeze, not even a frame already queued
+    assert controller.flush(timeout=1.0)
+    assert max(writes) < began + 1.0
+
+
+def test_freeze_during_hold(sequencer):
+    controller = sequencer.puppet.servo_controller
+    # greeting's first step finishes well before its 1 s slot ends
+    sequencer.execute_pose('rest', 30)
+    began = time.monotonic()
+    frozen = freeze_after(controller, 0.5)
+    assert not sequencer.execute_sequence('greeting')
+    frozen.join()
+    assert time.monotonic() - began < 0.7
+
+
+def test_freeze_holds_until_resume(sequencer):
+    controller = sequencer.puppet.servo_controller
+    controller.restore_angles({0: 90})
+    controller.freeze()
+
+    stats = controller.move_frame({0: 120}, speed=10)
+    assert stats.cancelled
+    assert controller.get_servo_angle(0) == 90
+    assert not sequencer.execute_sequence('greeting')
+
+    controller.resume()
+    assert not controller.move_frame({0: 120}, speed=10).cancelled
+    assert controller.get_servo_angle(0) == 120
+
+
+def test_freeze_drops_pending_frame():
+    class SlowBus(FakePCA9685):
+        def write_registers(self, register, data):
+            time.sleep(0.1)
+            super().write_registers(register, data)
+
+    bus = SlowBus()
+    controller = ServoController(bus=bus)
+    try:
+        controller.write_frame({0: 30})
+        time.sleep(0.05)
+        # Waits in the back buffer while the first frame is on the bus
+        controller.write_frame({0: 60})
+        controller.freeze()
+        assert controller.flush(timeout=1.0)
+        assert bus.channel_counts(0) == (0, controller.angle_to_count(30))
+    finally:
+        controller.close()
+
+
+def test_emergency_stop_until_next_command(sequencer):
+    async def body(queue):
+        sequence = queue.submit('sequence', 'greeting')
+        await asyncio.sleep(0.9)
+        began = time.monotonic()
+        queue.emergency_stop()
+        result = await sequence.result
+        stopped = time.monotonic() - began
+        # The next command lifts the stop
+        pose = queue.submit('pose', 'arms_out', speed=30)
+        return result, stopped < 0.1, await pose.result
+
+    assert run_queue(sequencer, body) == ('cancelled', True, 'done')
+    assert sequencer.puppet.get_arm('left_arm').current_pose == sequencer.poses['arms_out']['left_arm']
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from command_server import CommandServer, parse_command
+from puppet_arm import PuppetController
+from sequence_controller import SequenceController
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+@pytest.fixture
+def sequencer():
+    sequencer = SequenceController(PuppetController(home=False, simulate=True))
+    sequencer.load_poses(os.path.join(ROOT, 'poses', 'basic_poses.json'))
+    sequencer.load_sequences(os.path.join(ROOT, 'sequences', 'movement_sequences.json'))
+    yield sequencer
+    sequencer.puppet.servo_controller.close()
+
+
+def test_parse_command_forms():
+    assert parse_command('sequence greeting\n') == {'cmd': 'sequence', 'name': 'greeting'}
+    assert parse_command('{"id": 3, "cmd": "ping"}') == {'id': 3, 'cmd': 'ping'}
+    for line in ('', '{"name": "rest"}', '{"cmd": '):
+        with pytest.raises(ValueError):
+            parse_command(line)
+
+
+def test_bad_commands_are_refused(sequencer):
+    server = CommandServer(sequencer, socket_path=None, port=None)
+    assert server.handle_line('  \n') is None
+    assert server.handle_line('{"cmd": ')['ok'] is False
+    assert server.handle_line('dance') == {
+        'id': None, 'cmd': 'dance', 'ok': False, 'error': "Unknown command 'dance'"}
+    assert server.handle_line('pose nowhere')['error'] == "Pose 'nowhere' not found"
+    assert server.handle_line('{"cmd": "sequence", "name": 5}')['ok'] is False
+
+
+def test_commands_are_acked_then_done(sequencer, tmp_path):
+    socket_path = str(tmp_path / 'puppet.sock')
+
+    async def main():
+        server = CommandServer(sequencer, socket_path=socket_path, port=None)
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+
+            async def send(message):
+                writer.write(json.dumps(message).encode() + b'\n')
+                await writer.drain()
+
+            async def receive():
+                return json.loads(await asyncio.wait_for(reader.readline(), 5))
+
+            await send({'id': 1, 'cmd': 'pose', 'name': 'arms_out', 'speed': 30})
+            ack = await receive()
+            await send({'id': 2, 'cmd': 'pose', 'name': 'rest', 'mode': 'bogus'})
+            refused = await receive()
+            done = await receive()
+            await send({'id': 3, 'cmd': 'ping'})
+            pong = await receive()
+            writer.close()
+            return ack, refused, done, pong
+        finally:
+            await server.close()
+
+    ack, refused, done, pong = asyncio.run(main())
+    assert ack == {'id': 1, 'cmd': 'pose', 'ok': True}
+    assert refused == {'id': 2, 'cmd': 'pose', 'ok': False, 'error': "Unknown mode 'bogus'"}
+    assert done == {'id': 1, 'cmd': 'pose', 'event': 'done'}
+    assert pong == {'id': 3, 'cmd': 'ping', 'ok': True}
+    assert not os.path.exists(socket_path)
+    arms_out = sequencer.poses['arms_out']['left_arm']
+    assert sequencer.puppet.get_arm('left_arm').current_pose == arms_out
+
+
+def test_new_motion_preempts_the_running_one(sequencer, tmp_path):
+    socket_path = str(tmp_path / 'puppet.sock')
+
+    async def main():
+        server = CommandServer(sequencer, socket_path=socket_path, port=None)
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            events = []
+            writer.write(b'sequence greeting\n')
+            await asyncio.sleep(0.2)
+            writer.write(b'{"id": 2, "cmd": "pose", "name": "rest", "speed": 30}\n')
+            while len(events) < 4:
+                events.append(json.loads(await asyncio.wait_for(reader.readline(), 10)))
+            writer.close()
+            return events
+        finally:
+            await server.close()
+
+    events = asyncio.run(main())
+    assert [event.get('event', event.get('ok')) for event in events] == [
+        True, True, 'cancelled', 'done']
+    assert events[2]['cmd'] == 'sequence'
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from hot_reload import WatchedFile
+from puppet_arm import PuppetController
+from sequence_controller import SequenceController
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def edit(path, change):
+    """Apply `change` to a JSON file's contents and write it back"""
+    with open(path) as f:
+        data = json.load(f)
+    change(data)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+@pytest.fixture
+def sequencer(tmp_path):
+    poses_file = tmp_path / 'poses.json'
+    sequences_file = tmp_path / 'sequences.json'
+    shutil.copy(os.path.join(ROOT, 'poses', 'basic_poses.json'), poses_file)
+    shutil.copy(os.path.join(ROOT, 'sequences', 'movement_sequences.json'), sequences_file)
+    sequencer = SequenceController(PuppetController(home=False, simulate=True))
+    sequencer.load_poses(str(poses_file))
+    sequencer.load_sequences(str(sequences_file))
+    sequencer.watch()
+    yield sequencer
+    sequencer.puppet.servo_controller.close()
+
+
+def test_unchanged_file_is_not_reloaded(sequencer):
+    assert not sequencer.watcher.poll(force=True)
+    os.utime(sequencer.poses_file)
+    assert not sequencer.watcher.poll(force=True)
+
+
+def test_edits_and_removals_are_merged(sequencer):
+    arms_out = sequencer.poses['arms_out']
+
+    def change(data):
+        data['poses']['rest']['left_arm']['shoulder'] = 80
+        del data['poses']['thinking']
+        data['poses']['shrug'] = {'left_arm': {'shoulder': 60}, 'right_arm': {'shoulder': 60}}
+
+    edit(sequencer.poses_file, change)
+    assert sequencer.watcher.poll(force=True)
+
+    assert sequencer.poses['rest']['left_arm']['shoulder'] == 80
+    assert 'thinking' not in sequencer.poses
+    assert sequencer.poses['shrug']['left_arm'] == {'shoulder': 60}
+    # Untouched entries keep their objects
+    assert sequencer.poses['arms_out'] is arms_out
+
+
+def test_custom_poses_survive_reload(sequencer):
+    sequencer.create_custom_pose('wave_hello', {'shoulder': 20}, {'shoulder': 160})
+
+    edit(sequencer.poses_file,
+         lambda data: data['poses']['rest']['right_arm'].update(elbow=100))
+    assert sequencer.watcher.poll(force=True)
+
+    assert sequencer.poses['wave_hello']['left_arm'] == {'shoulder': 20}
+    assert sequencer.poses['rest']['right_arm']['elbow'] == 100
+
+
+def test_sequences_are_reloaded(sequencer):
+    def change(data):
+        data['sequences']['greeting']['steps'][0]['duration'] = 2.0
+        del data['sequences']['exercise_routine']
+
+    edit(sequencer.sequences_file, change)
+    assert sequencer.watcher.poll(force=True)
+
+    assert sequencer.sequences['greeting']['steps'][0]['duration'] == 2.0
+    assert 'exercise_routine' not in sequencer.sequences
+    assert 'celebration_dance' in sequencer.sequences
+
+
+def test_broken_file_keeps_previous_version(sequencer):
+    poses = sequencer.poses
+    with open(sequencer.poses_file, 'w') as f:
+        f.write('{"poses": {')
+    assert not sequencer.watcher.poll(force=True)
+    assert sequencer.poses is poses
+
+
+def test_poll_honours_interval(sequencer):
+    sequencer.watcher.interval = 60
+    edit(sequencer.poses_file, lambda data: data['poses'].pop('rest'))
+    assert not sequencer.watcher.poll()
+    assert 'rest' in sequencer.poses
+    assert sequencer.watcher.poll(force=True)
+    assert 'rest' not in sequencer.poses
+
+
+def test_watched_file_diffs_against_last_read(tmp_path):
+    path = tmp_path / 'poses.json'
+    path.write_text(json.dumps({'poses': {'a': 1, 'b': 2}}))
+    watched = WatchedFile(str(path), 'poses')
+
+    path.write_text(json.dumps({'poses': {'a': 1, 'c': 3}}))
+    entries, changed, removed = watched.reload({'a': 1, 'b': 2, 'custom': 4})
+    assert entries == {'a': 1, 'c': 3, 'custom': 4}
+    assert changed == ['c']
+    assert removed == ['b']
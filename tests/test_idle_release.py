@@ -0,0 +1,82 @@
+import time
+
+from pca9685_bus import FULL_OFF, FakePCA9685
+from servo_controller import ServoController
+from settle_model import ServoCalibration
+
+
+def make_controller(timeout, **kwargs):
+    """Block-write controller with servo 0 at rest at 90 degrees"""
+    bus = FakePCA9685()
+    controller = ServoController(bus=bus, **kwargs)
+    controller.restore_angles({0: 90, 1: 90})
+    controller.write_frame({0: 90, 1: 90})
+    controller.set_idle_timeout(timeout)
+    return controller, bus
+
+
+def test_release_idle_turns_output_off():
+    controller, bus = make_controller(0.05, io_thread=False)
+    assert controller.release_idle() == []
+    time.sleep(0.06)
+
+    assert sorted(controller.release_idle()) == [0, 1]
+    assert bus.channel_counts(0) == (0, FULL_OFF)
+    # Still known, so the next move starts from there
+    assert controller.get_servo_angle(0) == 90
+    assert controller.released == {0, 1}
+
+
+def test_write_re_engages_released_servo():
+    controller, bus = make_controller(0.05, io_thread=False)
+    time.sleep(0.06)
+    controller.release_idle()
+
+    controller.write_frame({0: 90})
+    assert bus.channel_counts(0) == (0, controller.angle_to_count(90))
+    assert controller.released == {1}
+
+
+def test_heavy_servo_is_not_released():
+    controller, _ = make_controller(0.05, io_thread=False)
+    controller.set_calibration(0, ServoCalibration(load='heavy'))
+    time.sleep(0.06)
+    assert controller.release_idle() == [1]
+
+
+def test_write_at_idle_deadline_is_not_released():
+    controller, bus = make_controller(0.05, io_thread=False)
+    time.sleep(0.06)
+    released = []
+    write_registers = bus.write_registers
+
+    def write_then_check(register, data):
+        write_registers(register, data)
+        # An idle check landing right after the bus write, as the I/O
+        # thread's can
+        released.extend(controller.release_idle())
+
+    bus.write_registers = write_then_check
+    controller.write_frame({0: 100})
+    assert 0 not in released
+    assert bus.channel_counts(0) == (0, controller.angle_to_count(100))
+
+
+def test_io_thread_releases_idle_servos():
+    controller, bus = make_controller(0.05)
+    try:
+        deadline = time.monotonic() + 1.0
+        while bus.channel_counts(0)[1] != FULL_OFF and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert bus.channel_counts(0) == (0, FULL_OFF)
+
+        # Commanded right as the I/O thread checks for idle servos
+        for _ in range(20):
+            controller.write_frame({0: 100})
+            controller.write_frame({0: 90})
+            assert controller.flush(timeout=1.0)
+            assert 0 not in controller.released
+            assert bus.channel_counts(0) == (0, controller.angle_to_count(90))
+            time.sleep(0.05)
+    finally:
+        controller.close()
@@ -0,0 +1,48 @@
+import math
+
+from joint_state import JointStateStore
+from puppet_arm import PuppetController
+from servo_controller import ServoController
+
+
+def test_store_tracks_commanded_angle_and_velocity():
+    state = JointStateStore(4)
+    assert state.get_angle(0) is None
+    state.set_commanded(0, 90, now=10.0)
+    state.set_commanded(0, 100, now=10.5)
+    assert state.get_angle(0) == 100
+    assert state.velocity[0] == 20.0
+    state.set_commanded(0, None, now=11.0)
+    assert state.get_angle(0) is None
+    assert state.velocity[0] == 0.0
+
+
+def test_other_process_reads_live_state(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    puppet = PuppetController(home=False, simulate=True, state_path=path)
+    controller = puppet.servo_controller
+    try:
+        reader = JointStateStore.attach(path)
+        assert reader.channels == controller.channels
+        assert reader.get_angle(0) is None
+
+        controller.write_frame({0: 45})
+        assert reader.get_angle(0) == 45
+        assert reader.get_angle(1) is None
+        reader.close()
+    finally:
+        controller.close()
+
+
+def test_settle_model_reads_commanded_angles_from_store():
+    controller = ServoController(simulate=True, io_thread=False)
+    controller.restore_angles({0: 90})
+
+    controller.write_frame({0: 90})
+    # Already there: nothing to wait for
+    assert controller.wait_until_settled([0]) == 0.0
+
+    controller.write_frame({0: 140})
+    calibration = controller.settle.get_calibration(0)
+    expected = 50 / calibration.slew_rate + calibration.settle_time
+    assert math.isclose(controller.settle.settled_at[0] - controller.settle.updated[0], expected)
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from joint_stream import JitterBuffer, JointStream, parse_frame
+from puppet_arm import PuppetController
+
+
+@pytest.fixture
+def puppet():
+    puppet = PuppetController(home=False, simulate=True)
+    puppet.servo_controller.restore_angles({channel: 90 for channel in range(6)})
+    yield puppet
+    puppet.servo_controller.close()
+
+
+def test_parse_frame_formats():
+    assert parse_frame('{"joints": ["left_arm.elbow"]}') == ('joints', ['left_arm.elbow'])
+    assert parse_frame('{"t": 1.5, "angles": [45, 120]}') == ('frame', (1.5, [45.0, 120.0]))
+    assert parse_frame('2.0 10 20\n') == ('frame', (2.0, [10.0, 20.0]))
+    with pytest.raises(ValueError):
+        parse_frame('2.0')
+
+
+def test_jitter_buffer_plays_at_a_fixed_delay():
+    buffer = JitterBuffer(delay=0.1)
+    # Sender clock starts at 50; the second frame arrives late
+    buffer.push(50.0, [0.0], now=10.0)
+    buffer.push(50.1, [10.0], now=10.18)
+    assert buffer.offset == pytest.approx(-40.0)
+
+    assert buffer.sample(10.1) == [0.0]
+    assert buffer.sample(10.15) == pytest.approx([5.0])
+    assert not buffer.drained(10.15)
+    assert buffer.sample(10.25) == [10.0]
+    assert buffer.underruns == 1
+    assert buffer.drained(10.25)
+
+
+def test_jitter_buffer_drops_late_frames():
+    buffer = JitterBuffer()
+    assert buffer.push(1.0, [0.0], now=5.0)
+    assert not buffer.push(1.0, [1.0], now=5.1)
+    assert not buffer.push(0.5, [1.0], now=5.1)
+    assert (buffer.received, buffer.late) == (1, 2)
+
+
+def test_layout_header_maps_columns(puppet):
+    stream = JointStream(puppet)
+    assert stream.channels == [0, 1, 2, 3, 4, 5]
+    stream.feed('{"joints": ["right_arm.wrist", "left_arm.shoulder"]}\n'
+                '0.0 30 150\n'
+                'not a frame\n'
+                '0.1 30\n', now=1.0)
+    assert stream.channels == [5, 0]
+    assert len(stream.buffer.frames) == 1
+    with pytest.raises(ValueError):
+        stream.set_layout(['left_arm.knee'])
+
+
+def test_stream_plays_until_drained(puppet):
+    stream = JointStream(puppet, delay=0.02)
+    stream.set_layout(['left_arm.shoulder', 'left_arm.elbow'])
+    stream.feed('0.0 90 90\n0.05 110 nan\n0.1 200 60\n')
+    stream.closed = True
+
+    stats = asyncio.run(stream.play())
+    assert stats.ticks > 0
+    controller = puppet.servo_controller
+    # Clamped to the servo range
+    assert controller.get_servo_angle(0) == 180
+    assert controller.get_servo_angle(1) == 60
+
+
+def test_stream_reads_a_named_pipe(puppet, tmp_path):
+    path = str(tmp_path / 'joints')
+    stream = JointStream(puppet, delay=0.01)
+
+    def send():
+        # Wait for the stream to create the pipe
+        while not os.path.exists(path):
+            threading.Event().wait(0.01)
+        with open(path, 'w') as pipe:
+            pipe.write('{"joints": ["left_arm.wrist"]}\n0.0 90\n0.05 120\n')
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    asyncio.run(asyncio.wait_for(stream.run(path), 5))
+    sender.join()
+    assert stream.buffer.received == 2
+    assert puppet.servo_controller.get_servo_angle(2) == 120
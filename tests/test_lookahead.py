@@ -0,0 +1,58 @@
+import pytest
+
+from lookahead import BlendedSequence
+from servo_controller import ServoController
+
+
+@pytest.fixture
+def controller():
+    controller = ServoController(simulate=True, io_thread=False)
+    controller.restore_angles({0: 90, 1: 90})
+    yield controller
+    controller.close()
+
+
+def test_next_move_starts_within_tolerance(controller):
+    path = BlendedSequence(blend_tolerance=5.0)
+    path.add_step({0: 130}, {'speed': 5, 'duration': 1.0})
+    path.add_step({0: 50}, {'speed': 5, 'duration': 1.0})
+    path.compile(controller)
+
+    # 40 degrees at 100 deg/s: within 5 degrees after 0.35 s
+    first, second = path.segments
+    assert first[1] == pytest.approx(0.4)
+    assert second[0] == pytest.approx(0.35)
+    assert path.duration == pytest.approx(0.35 + 0.8)
+
+    samples = [path.sample(k * 0.01)[0] for k in range(int(path.duration * 100) + 1)]
+    # Passes the first pose within the tolerance and never stops on the way
+    assert max(samples) >= 125
+    assert samples[-1] == pytest.approx(50)
+
+
+def test_zero_tolerance_waits_for_each_move(controller):
+    path = BlendedSequence(blend_tolerance=0)
+    path.add_step({0: 130}, {'speed': 5})
+    path.add_step({1: 130}, {'speed': 5})
+    path.compile(controller)
+    assert path.segments[1][0] == pytest.approx(0.4)
+
+
+def test_hold_and_instant_steps_keep_their_slot(controller):
+    path = BlendedSequence(blend_tolerance=5.0)
+    path.add_step({0: 130}, {'speed': 5, 'duration': 1.0, 'hold': True})
+    path.add_step({1: 40}, {'duration': 0.5})
+    path.add_step({1: 60}, {'speed': 5})
+    path.compile(controller)
+    assert [segment[0] for segment in path.segments] == [0.0, 1.0, 1.5]
+    assert path.sample(0.9) == {0: 130, 1: 90}
+    assert path.sample(1.2) == {0: 130, 1: 40}
+
+
+def test_blended_play_ends_at_the_last_pose(controller):
+    path = BlendedSequence(blend_tolerance=10.0)
+    path.add_step({0: 120, 1: 60}, {'speed': 10})
+    path.add_step({0: 100}, {'speed': 10})
+    path.play(controller)
+    assert controller.get_servo_angle(0) == pytest.approx(100)
+    assert controller.get_servo_angle(1) == pytest.approx(60)
@@ -0,0 +1,74 @@
+import pytest
+
+from motion_profiles import (JointLimits, LinearProfile, MinimumJerkProfile,
+                             TrapezoidalProfile, plan_move, plan_synchronized)
+
+LIMITS = JointLimits(max_velocity=200.0, max_acceleration=1000.0)
+
+
+def velocities(profile, distance, duration, steps=1000):
+    dt = duration / steps
+    return [(profile.fraction((k + 1) * dt) - profile.fraction(k * dt)) * distance / dt
+            for k in range(steps)]
+
+
+def test_trapezoidal_profile_stays_within_limits():
+    distance = 150.0
+    duration = TrapezoidalProfile.min_duration(distance, LIMITS)
+    # Reaches full speed: 150/200 + 200/1000
+    assert duration == pytest.approx(0.95)
+    profile = TrapezoidalProfile(distance, duration, LIMITS.max_acceleration)
+    assert profile.fraction(0) == 0.0
+    assert profile.fraction(duration / 2) == pytest.approx(0.5)
+    assert profile.fraction(duration) == 1.0
+    assert max(velocities(profile, distance, duration)) <= LIMITS.max_velocity * 1.001
+
+
+def test_short_trapezoidal_move_is_triangular():
+    distance = 10.0
+    duration = TrapezoidalProfile.min_duration(distance, LIMITS)
+    assert duration == pytest.approx(2 * (distance / LIMITS.max_acceleration) ** 0.5)
+    profile = TrapezoidalProfile(distance, duration, LIMITS.max_acceleration)
+    assert profile.ramp_time == pytest.approx(duration / 2)
+
+
+def test_minimum_jerk_profile_is_symmetric_and_limited():
+    distance = 120.0
+    duration = MinimumJerkProfile.min_duration(distance, LIMITS)
+    profile = MinimumJerkProfile(distance, duration)
+    assert profile.fraction(duration / 2) == pytest.approx(0.5)
+    assert profile.fraction(duration * 0.25) == pytest.approx(1 - profile.fraction(duration * 0.75))
+    assert max(velocities(profile, distance, duration)) <= LIMITS.max_velocity * 1.001
+
+
+def test_synchronized_joints_finish_together():
+    duration, profiles = plan_synchronized({0: (180.0, LIMITS), 1: (-20.0, LIMITS)})
+    assert duration == pytest.approx(TrapezoidalProfile.min_duration(180.0, LIMITS))
+    for profile in profiles.values():
+        assert profile.fraction(duration) == 1.0
+        assert profile.fraction(duration * 0.99) < 1.0
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        plan_synchronized({0: (10.0, LIMITS)}, 'cubic')
+
+
+def test_speed_move_keeps_legacy_timing():
+    # 90 degrees at 5 degrees per 50 ms
+    duration, profiles = plan_move({0: 0, 1: 0}, {0: 90, 1: 45}, lambda channel: LIMITS, speed=5)
+    assert duration == pytest.approx(0.9)
+    assert isinstance(profiles[0], LinearProfile)
+    assert profiles[1].fraction(0.45) == pytest.approx(0.5)
+
+    duration, _ = plan_move({0: 0}, {0: 90}, lambda channel: LIMITS, speed=5, max_duration=0.5)
+    assert duration == 0.5
+    duration, _ = plan_move({0: 0}, {0: 90}, lambda channel: LIMITS)
+    assert duration == 0.0
+
+
+def test_profile_move_ignores_speed():
+    duration, profiles = plan_move({0: 0}, {0: 150}, lambda channel: LIMITS, speed=50,
+                                   profile='trapezoidal')
+    assert duration == pytest.approx(0.95)
+    assert isinstance(profiles[0], TrapezoidalProfile)
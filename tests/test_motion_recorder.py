@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from motion_recorder import MotionRecorder, simplify
+from puppet_arm import PuppetController
+from timeline import Track, linear_track_steps
+
+
+@pytest.fixture
+def puppet():
+    puppet = PuppetController(home=False, simulate=True)
+    puppet.servo_controller.restore_angles({channel: 90 for channel in range(6)})
+    yield puppet
+    puppet.servo_controller.close()
+
+
+def test_simplify_keeps_line_endpoints():
+    times = np.linspace(0, 1, 51)
+    assert simplify(times, 30 + 60 * times, 0.1).tolist() == [0, 50]
+
+
+def test_simplify_stays_within_tolerance():
+    times = np.linspace(0, 2, 201)
+    angles = 90 + 40 * np.sin(3 * times)
+    keep = simplify(times, angles, 0.5)
+    assert len(keep) < 30
+    error = np.abs(np.interp(times, times[keep], angles[keep]) - angles)
+    assert error.max() <= 0.5
+
+
+def test_linear_track_steps_are_exact():
+    steps = linear_track_steps([0.0, 0.3, 0.7], [{'shoulder': 90.123456},
+                                                 {'shoulder': 100.987654},
+                                                 {'shoulder': 95.5}])
+    assert [step['duration'] for step in steps] == [0.0, 0.3, 0.7 - 0.3]
+    assert steps[1]['pose'] == {'shoulder': 100.987654}
+    # Arrives exactly as the step ends: degrees per 50 ms
+    assert steps[1]['speed'] == pytest.approx((100.987654 - 90.123456) * 0.05 / 0.3)
+
+
+def test_recording_replays_within_tolerance(puppet):
+    controller = puppet.servo_controller
+    recorder = MotionRecorder(puppet)
+    recorder.start()
+    controller.move_frame({0: 150, 1: 30}, speed=6)
+    controller.move_frame({0: 60, 1: 120}, profile='minimum_jerk')
+    recorder.stop()
+
+    tolerance = 0.5
+    sequence = recorder.to_sequence(tolerance)
+    assert list(sequence['tracks']) == ['left_arm']
+    steps = sequence['tracks']['left_arm']
+    assert len(steps) < recorder.sample_count / 4
+
+    offset = min(times[0] for times, _ in recorder.samples.values())
+    arm = puppet.get_arm('left_arm')
+    for channel in (0, 1):
+        track = Track(arm, steps)
+        track.compile(controller)
+        times, angles = recorder.samples[channel]
+        for t, angle in zip(times, angles):
+            assert abs(track.sample(t - offset)[channel] - angle) <= tolerance + 1e-9
+
+
+def test_recording_captures_every_writer(puppet):
+    recorder = MotionRecorder(puppet)
+    recorder.start()
+    puppet.servo_controller.write_frame({3: 80})
+    puppet.get_arm('left_arm').move_to_pose({'wrist': 100}, speed=30)
+    recorder.stop()
+    puppet.servo_controller.write_frame({3: 70})
+
+    assert set(recorder.samples) == {2, 3}
+    assert recorder.samples[3][1] == [80]
+    assert recorder.samples[2][1][-1] == 100
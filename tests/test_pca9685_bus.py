@@ -0,0 +1,130 @@
+import math
+
+from pca9685_bus import FULL_OFF, LED0_ON_L, MODE1, MODE1_AI, FakePCA9685, PCA9685
+from puppet_arm import PuppetController
+from servo_controller import ServoController
+
+
+def make_controller():
+    """Block-write controller on a fake bus, writing from the caller's thread"""
+    bus = FakePCA9685()
+    return ServoController(bus=bus, io_thread=False), bus
+
+
+def test_configure_enables_auto_increment():
+    bus = FakePCA9685()
+    PCA9685(bus).configure()
+    assert bus.registers[MODE1] & MODE1_AI
+
+
+def test_block_write_registers():
+    controller, bus = make_controller()
+    controller.write_frame({0: 45, 1: 90, 2: 120})
+    bus.transactions = 0
+    controller.write_frame({0: 50, 2: 125})
+
+    # One transfer covering channels 0-2, channel 1 rewritten as it was
+    assert bus.transactions == 1
+    assert bus.channel_counts(0) == (0, controller.angle_to_count(50))
+    assert bus.channel_counts(1) == (0, controller.angle_to_count(90))
+    assert bus.channel_counts(2) == (0, controller.angle_to_count(125))
+    assert bus.channel_counts(3) == (0, FULL_OFF)
+
+
+def test_block_write_skips_unwritten_channels():
+    bus = FakePCA9685()
+    pca = PCA9685(bus)
+    pca.configure()
+    # Channel 6 holds a servo set up before this driver started
+    pca.bus.write_registers(LED0_ON_L + 4 * 6, [0, 0, 50, 1])
+    bus.transactions = 0
+    bus.bytes_written = 0
+    pca.write_channels({5: 300, 7: 400})
+
+    # One transfer per side of the unknown channel
+    assert bus.transactions == 2
+    assert bus.bytes_written == 2 * 4
+    assert bus.registers[LED0_ON_L + 4 * 5 + 2] == 300 & 0xFF
+    assert bus.channel_counts(6) == (0, 306)
+    assert bus.channel_counts(7) == (0, 400)
+
+
+def test_restored_servos_keep_their_pulses():
+    controller, bus = make_controller()
+    held = controller.angle_to_count(60)
+    bus.write_registers(LED0_ON_L + 4 * 1, [0, 0, held & 0xFF, held >> 8])
+    controller.restore_angles({1: 60})
+
+    controller.write_frame({0: 45, 2: 120})
+    assert bus.channel_counts(1) == (0, held)
+
+
+def test_block_write_disables_channel():
+    controller, bus = make_controller()
+    controller.write_frame({3: 90})
+    controller.write_frame({3: None})
+    assert bus.channel_counts(3) == (0, FULL_OFF)
+
+
+def test_coalescer_suppresses_unchanged_counts():
+    controller, bus = make_controller()
+    controller.write_frame({0: 90, 1: 90})
+    transactions = bus.transactions
+
+    # Same angle, and an angle too close to change the 12-bit count
+    controller.write_frame({0: 90})
+    controller.write_frame({1: 90.01})
+    assert controller.angle_to_count(90.01) == controller.angle_to_count(90)
+    assert bus.transactions == transactions
+    assert controller.coalescer.get_stats() == {'issued': 2, 'suppressed': 2}
+
+    controller.write_frame({0: 91})
+    assert bus.transactions == transactions + 1
+    assert bus.channel_counts(0) == (0, controller.angle_to_count(91))
+
+
+def test_coalescer_forget_rewrites():
+    controller, bus = make_controller()
+    controller.write_frame({0: 90})
+    controller.coalescer.forget(0)
+    transactions = bus.transactions
+    controller.write_frame({0: 90})
+    assert bus.transactions == transactions + 1
+
+
+def test_write_frame_clamps_and_drops_invalid_angles():
+    controller, bus = make_controller()
+    controller.write_frame({0: 200, 1: -5, 2: math.nan, 3: math.inf, 99: 90})
+
+    assert bus.channel_counts(0) == (0, controller.angle_to_count(180))
+    assert bus.channel_counts(1) == (0, controller.angle_to_count(0))
+    assert bus.channel_counts(2) == (0, FULL_OFF)
+    assert bus.channel_counts(3) == (0, FULL_OFF)
+    assert controller.get_servo_angle(0) == 180
+    assert controller.get_servo_angle(2) is None
+
+
+def test_io_thread_writes_latest_frame():
+    bus = FakePCA9685()
+    controller = ServoController(bus=bus)
+    try:
+        controller.write_frame({0: 30})
+        controller.write_frame({0: 60, 1: 120})
+        assert controller.flush(timeout=1.0)
+        assert bus.channel_counts(0) == (0, controller.angle_to_count(60))
+        assert bus.channel_counts(1) == (0, controller.angle_to_count(120))
+    finally:
+        controller.close()
+
+
+def test_puppet_controller_block_writes():
+    puppet = PuppetController(home=False, simulate=True, block_writes=True)
+    controller = puppet.servo_controller
+    try:
+        assert controller.kits is None
+        assert len(controller.pcas) == len(puppet.boards)
+        puppet.move_arms_to_poses({'left_arm': {'shoulder': 45}})
+        assert controller.flush(timeout=1.0)
+        assert controller.pca.bus.channel_counts(0) == (0, controller.angle_to_count(45))
+    finally:
+        controller.close()
@@ -0,0 +1,73 @@
+import pytest
+
+from motion_profiles import LinearProfile
+from power_budget import PowerBudget, ScheduledProfile
+from settle_model import ServoCalibration
+
+RATE = 50
+CALIBRATION = ServoCalibration(slew_rate=200.0, moving_current=1.0, hold_current=0.1)
+
+
+def budget_for(budget, channels):
+    return PowerBudget(budget, RATE, lambda channel: CALIBRATION, channels)
+
+
+def peak_current(budget, origin, frame, duration, profiles):
+    """Highest estimated supply current over the ticks of a scheduled move"""
+    period = 1.0 / RATE
+    ticks = int(duration * RATE + 0.999999)
+    peak = 0.0
+    for k in range(ticks):
+        total = budget.idle_current()
+        for channel, target in frame.items():
+            distance = abs(target - origin[channel])
+            moved = (profiles[channel].fraction((k + 1) * period)
+                     - profiles[channel].fraction(k * period)) * distance
+            total += CALIBRATION.current(moved / period) - CALIBRATION.hold_current
+        peak = max(peak, total)
+    return peak
+
+
+def test_move_under_budget_is_unchanged():
+    budget = budget_for(10.0, range(3))
+    profiles = {channel: LinearProfile(1.0) for channel in range(3)}
+    origin = {0: 0, 1: 0, 2: 0}
+    frame = {0: 90, 1: 90, 2: 90}
+    assert budget.schedule(origin, frame, 1.0, profiles) == (1.0, profiles)
+
+
+def test_move_over_budget_is_staggered_or_slowed_to_fit():
+    channels = range(4)
+    budget = budget_for(2.0, channels)
+    origin = {channel: 0 for channel in channels}
+    frame = {channel: 180 for channel in channels}
+    profiles = {channel: LinearProfile(0.9) for channel in channels}
+    # Four servos at full slew rate would draw 4 A
+    assert peak_current(budget, origin, frame, 0.9, profiles) > 2.0
+
+    duration, scheduled = budget.schedule(origin, frame, 0.9, profiles)
+    assert duration > 0.9
+    assert all(isinstance(scheduled[channel], ScheduledProfile) for channel in channels)
+    assert peak_current(budget, origin, frame, duration, scheduled) <= 2.0 + 1e-9
+    # Every move still arrives by the end
+    assert all(scheduled[channel].fraction(duration) == 1.0 for channel in channels)
+
+
+def test_instant_move_is_spread_at_the_slew_rate():
+    channels = range(4)
+    budget = budget_for(2.0, channels)
+    origin = {channel: 0 for channel in channels}
+    frame = {channel: 100 for channel in channels}
+    profiles = {channel: LinearProfile(0.0) for channel in channels}
+
+    duration, scheduled = budget.schedule(origin, frame, 0.0, profiles)
+    # A single 100 degree move takes 0.5 s at 200 deg/s
+    assert duration >= 0.5
+    assert peak_current(budget, origin, frame, duration, scheduled) <= 2.0 + 1e-9
+
+
+def test_holding_current_over_budget_leaves_plan_alone():
+    budget = budget_for(0.5, range(8))
+    assert budget.idle_current() == pytest.approx(0.8)
+    profiles = {0: LinearProfile(0.2)}
+    assert budget.schedule({0: 0}, {0: 180}, 0.2, profiles) == (0.2, profiles)
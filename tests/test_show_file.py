@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+import pytest
+
+from servo_controller import ServoController
+from show_file import ShowFile, ShowWriter, sequence_to_show, show_to_sequence
+from trajectory_cache import TrajectoryCompiler
+
+JOINTS = ['left_arm.shoulder', 'left_arm.elbow']
+
+
+def write_show(path):
+    with ShowWriter(path, JOINTS, 'test show') as writer:
+        writer.write(0.0, [90, 90])
+        writer.write_many([0.5, 1.0], [[120, math.nan], [60, 30]])
+    return ShowFile(path)
+
+
+def test_show_round_trips_through_file(tmp_path):
+    show = write_show(str(tmp_path / 'a.show'))
+    assert show.joints == JOINTS
+    assert show.description == 'test show'
+    assert len(show) == 3
+    assert show.duration == 1.0
+    # A joint left alone in either record around t is left alone in between
+    assert show.sample(0.25) == pytest.approx([105, math.nan], nan_ok=True)
+    assert show.sample(0.75) == pytest.approx([90, math.nan], nan_ok=True)
+    assert show.sample(-1) == [90, 90]
+    assert show.sample(5) == [60, 30]
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    path = str(tmp_path / 'a.show')
+    write_show(path)
+    with open(path, 'ab') as f:
+        f.write(b'\0' * 5)
+    assert len(ShowFile(path)) == 3
+
+
+def test_times_must_not_go_backwards(tmp_path):
+    with ShowWriter(str(tmp_path / 'a.show'), JOINTS) as writer:
+        writer.write(1.0, [90, 90])
+        with pytest.raises(ValueError):
+            writer.write(0.5, [90, 90])
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'poses.json'
+    path.write_text('{"neutral": {}}')
+    with pytest.raises(ValueError):
+        ShowFile(str(path))
+
+
+def test_play_skips_joints_left_alone(tmp_path):
+    show = write_show(str(tmp_path / 'a.show'))
+    controller = ServoController(simulate=True, io_thread=False)
+    try:
+        frames = []
+        controller.add_frame_listener(lambda frame, now: frames.append(frame))
+        show.play(controller, [0, 1])
+        assert controller.get_servo_angle(0) == 60
+        assert controller.get_servo_angle(1) == 30
+        assert any(set(frame) == {0} for frame in frames)
+    finally:
+        controller.close()
+
+
+def test_sequence_converts_to_show_and_back(tmp_path):
+    compiler = TrajectoryCompiler(
+        {'raised': {'left_arm': {'shoulder': 150, 'elbow': 60}}},
+        {'lift': {'description': 'lift', 'steps': [
+            {'pose': 'raised', 'speed': 6, 'duration': 0.8}]}},
+        {'left_arm': {'shoulder': 0, 'elbow': 1}}, cache_dir=None)
+    path = str(tmp_path / 'lift.show')
+    assert sequence_to_show(compiler, 'lift', path) == 3
+
+    show = ShowFile(path)
+    assert show.joints == JOINTS
+    assert show.sample(0.25) == pytest.approx([120, 75])
+    sequence = show_to_sequence(show)
+    assert sequence['description'] == 'lift'
+    steps = sequence['tracks']['left_arm']
+    assert [step['duration'] for step in steps] == pytest.approx([0.0, 0.5, 0.3])
+    assert steps[1]['pose'] == {'shoulder': 150, 'elbow': 60}
+    assert np.isclose(steps[1]['speed'], 6)
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from pca9685_bus import FULL_OFF
+from servo_controller import ServoController
+from sim_servokit import SimServoKit
+
+
+def make_controller(**kwargs):
+    """ServoKit-path controller on the simulator, writing from the caller's thread"""
+    controller = ServoController(simulate=True, io_thread=False, **kwargs)
+    return controller, controller.kit.pca
+
+
+def test_servokit_writes_channel_registers():
+    kit = SimServoKit()
+    kit.servo[4].angle = 90
+    on, off = kit.pca.channel_counts(4)
+    assert on == 0
+    assert off == kit.pca.log[-1][2][2] | (kit.pca.log[-1][2][3] << 8)
+    kit.servo[4].angle = None
+    assert kit.pca.channel_counts(4) == (0, FULL_OFF)
+
+
+def test_servokit_rejects_out_of_range_angle():
+    kit = SimServoKit()
+    with pytest.raises(ValueError):
+        kit.servo[0].angle = 181
+
+
+def test_servokit_counts_match_block_writes():
+    controller, pca = make_controller()
+    for angle in (0, 45, 90, 135, 180):
+        controller.write_frame({0: angle})
+        assert pca.channel_counts(0) == (0, controller.angle_to_count(angle))
+
+
+def test_coalescer_drops_only_repeated_angles():
+    controller, pca = make_controller()
+    # Forget the frequency setup writes
+    pca.clear_log()
+    for angle in (90, 90, 90.01, 90.01):
+        controller.write_frame({0: angle})
+    # ServoKit may truncate 90.01 differently, so it is written once
+    assert len(pca.log) == 2
+    assert controller.coalescer.get_stats() == {'issued': 2, 'suppressed': 2}
+
+
+def test_move_frame_is_synchronized():
+    controller, _ = make_controller()
+    controller.restore_angles({0: 90, 1: 90, 2: 90})
+    frames = []
+    controller.add_frame_listener(lambda frame, now: frames.append((dict(frame), now)))
+
+    targets = {0: 120, 1: 100, 2: 60}
+    controller.move_frame(targets, speed=10)
+
+    # Every channel covers the same fraction of its travel at every tick
+    for frame, _ in frames:
+        fractions = [(frame[channel] - 90) / (target - 90) for channel, target in targets.items()]
+        assert max(fractions) - min(fractions) == pytest.approx(0, abs=1e-9)
+    # ...and all arrive together on the last tick
+    assert frames[-1][0] == targets
+    assert all(frame != targets for frame, _ in frames[:-1])
+
+
+def test_move_frame_timing():
+    controller, _ = make_controller()
+    controller.restore_angles({0: 90})
+    began = time.monotonic()
+    # 60 degrees at 10 degrees per 50 ms
+    stats = controller.move_frame({0: 150}, speed=10)
+    elapsed = time.monotonic() - began
+
+    assert stats.end - stats.start == pytest.approx(0.3, abs=1e-6)
+    assert 0.3 <= elapsed < 0.4
+    assert not stats.cancelled
+    assert controller.get_servo_angle(0) == 150
+
+
+def test_move_frame_max_duration():
+    controller, _ = make_controller()
+    controller.restore_angles({0: 90})
+    stats = controller.move_frame({0: 150}, speed=1, max_duration=0.2)
+    assert stats.end - stats.start == pytest.approx(0.2, abs=1e-6)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from puppet_arm import PuppetController
+from timeline import Timeline, Track
+
+
+@pytest.fixture
+def puppet():
+    puppet = PuppetController(home=False, simulate=True)
+    puppet.servo_controller.restore_angles({channel: 90 for channel in range(6)})
+    yield puppet
+    puppet.servo_controller.close()
+
+
+def test_track_segments_follow_steps(puppet):
+    track = Track(puppet.get_arm('left_arm'), [
+        {'pose': {'shoulder': 130}, 'duration': 0.4, 'speed': 5},
+        {'pose': {'elbow': 50}, 'duration': 0.5},
+    ])
+    track.compile(puppet.servo_controller)
+    assert [segment[:2] for segment in track.segments] == [
+        (0.0, pytest.approx(0.4)), (pytest.approx(0.4), pytest.approx(0.4))]
+    assert track.duration == pytest.approx(0.9)
+
+    # 40 degrees at 5 per 50 ms would take 0.4 s, the whole slot
+    assert track.sample(0.2)[0] == pytest.approx(110)
+    assert track.sample(0.2)[1] == 90
+    # An instant move holds its target for the rest of the slot
+    assert track.sample(0.6) == {0: 130, 1: 50, 2: 90}
+
+
+def test_profiled_step_lengthens_a_short_slot(puppet):
+    track = Track(puppet.get_arm('left_arm'), [
+        {'pose': {'shoulder': 0}, 'duration': 0.1, 'profile': 'trapezoidal'},
+        {'pose': {'shoulder': 90}, 'duration': 0.1},
+    ])
+    track.compile(puppet.servo_controller)
+    move_end = track.segments[0][1]
+    assert move_end > 0.1
+    assert track.segments[1][0] == move_end
+
+
+def test_tracks_play_together(puppet):
+    timeline = Timeline()
+    timeline.add_track(puppet.get_arm('left_arm'), [
+        {'pose': {'shoulder': 120}, 'duration': 0.2, 'speed': 10}])
+    timeline.add_track(puppet.get_arm('right_arm'), [
+        {'pose': {'shoulder': 60}, 'duration': 0.1},
+        {'pose': {'wrist': 45}, 'duration': 0.2, 'speed': 10}])
+    assert timeline.duration == pytest.approx(0.3)
+
+    stats = timeline.play(puppet.servo_controller)
+    assert stats.ticks > 0
+    assert puppet.get_arm('left_arm').current_pose['shoulder'] == 120
+    assert puppet.get_arm('right_arm').current_pose == {
+        'shoulder': 60, 'elbow': 90, 'wrist': 45}
+
+
+def test_timeline_plays_async(puppet):
+    timeline = Timeline()
+    timeline.add_track(puppet.get_arm('left_arm'), [
+        {'pose': {'elbow': 30}, 'duration': 0.1, 'speed': 20}])
+    asyncio.run(timeline.play_async(puppet.servo_controller))
+    assert puppet.servo_controller.get_servo_angle(1) == 30
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+from servo_controller import ServoController
+from trajectory_cache import CompiledTrajectory, TrajectoryCompiler
+
+POSES = {
+    'neutral': {'left_arm': {'shoulder': 90, 'elbow': 90}},
+    'raised': {'left_arm': {'shoulder': 150, 'elbow': 60}},
+}
+SEQUENCES = {
+    'lift': {'steps': [
+        {'pose': 'neutral', 'duration': 0.2},
+        {'pose': 'raised', 'speed': 6, 'duration': 0.6},
+    ]},
+    'smooth': {'steps': [
+        {'pose': 'neutral', 'duration': 0.1},
+        {'pose': 'raised', 'profile': 'minimum_jerk', 'duration': 0.1},
+    ]},
+}
+ARM_CONFIGS = {'left_arm': {'shoulder': 0, 'elbow': 1}}
+
+
+def compiler(cache_dir=None):
+    return TrajectoryCompiler(POSES, SEQUENCES, ARM_CONFIGS, rate=50, cache_dir=cache_dir)
+
+
+def test_steps_compile_to_rows_per_tick():
+    trajectory = compiler().compile('lift')
+    assert trajectory.channels == [0, 1]
+    assert trajectory.duration == pytest.approx(0.8)
+    # The shoulder travels 60 degrees at 6 per 50 ms: 0.5 s from 0.2 s,
+    # with the elbow keeping pace
+    assert trajectory.frames[10].tolist() == [90, 90]
+    assert trajectory.frames[20].tolist() == pytest.approx([114, 78])
+    assert trajectory.frames[35].tolist() == [150, 60]
+    assert trajectory.frames[-1].tolist() == [150, 60]
+
+
+def test_profiled_step_is_sampled_every_tick():
+    trajectory = compiler().compile('smooth')
+    shoulder = trajectory.frames[:, 0]
+    assert np.all(np.diff(shoulder) >= 0)
+    # Minimum jerk starts slowly, unlike a straight line
+    assert shoulder[6] - shoulder[5] < shoulder[9] - shoulder[8]
+    assert shoulder[-1] == 150
+
+
+def test_cache_is_keyed_by_content(tmp_path):
+    cache_dir = str(tmp_path)
+    first = compiler(cache_dir).compile('lift')
+    assert len(os.listdir(cache_dir)) == 1
+    cached = compiler(cache_dir).compile('lift')
+    np.testing.assert_array_equal(cached.frames, first.frames)
+    assert cached.channels == first.channels
+
+    changed = TrajectoryCompiler(POSES, SEQUENCES, ARM_CONFIGS, rate=25, cache_dir=cache_dir)
+    assert changed.cache_key('lift') != compiler().cache_key('lift')
+    changed.compile('lift')
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_play_leads_in_to_the_first_row():
+    controller = ServoController(simulate=True, io_thread=False)
+    try:
+        controller.restore_angles({0: 90, 1: 30})
+        frames = np.array([[90, 40], [100, 50], [110, 60]], dtype=np.float32)
+        trajectory = CompiledTrajectory([0, 1], frames, rate=50)
+        assert trajectory.lead_in(controller) == {1: 40}
+
+        trajectory.play(controller)
+        assert controller.get_servo_angle(0) == 110
+        assert controller.get_servo_angle(1) == 60
+    finally:
+        controller.close()